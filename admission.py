@@ -0,0 +1,168 @@
+"""
+Admission control for the submission endpoints
+
+Each endpoint class in Config.ADMISSION_ROUTES gets
+- a global token bucket (rate/burst shared by all clients),
+- per-client token buckets (clients hashed into a fixed table of slots;
+  a collision only makes two clients share a budget),
+- a bound on requests in flight.
+
+A request that does not fit is answered at once with 429 and Retry-After,
+before any upload is parsed or any database work is done. WhatsApp
+messages that only overflow the global rate are accepted in degraded
+mode instead (still within the in-flight bound): the complaint is stored
+immediately with the 'Pending' category (helpers.PENDING_CATEGORY) and
+classified later by a background thread.
+
+Clients are keyed by request.remote_addr, so behind a reverse proxy set
+TRUSTED_PROXIES to the number of proxies in front of the app (create_app
+then applies werkzeug's ProxyFix).
+
+The counters live in shared memory created by init_app. With the pre-fork
+server (preload_app) that happens in the master, so every worker sees the
+same buckets and in-flight counts.
+"""
+
+import hashlib
+import math
+import multiprocessing
+import threading
+import time
+from flask import g, jsonify, request
+from config import Config
+
+# Doubles per bucket: tokens, last refill (monotonic seconds)
+_BUCKET = 2
+
+
+class SharedLimits:
+    """Token buckets and in-flight counters in fork-shared memory"""
+
+    def __init__(self, limits, client_slots):
+        self.classes = list(limits)
+        self.limits = limits
+        self.client_slots = client_slots
+        per_class = _BUCKET + client_slots * _BUCKET + 1
+        self.values = multiprocessing.RawArray('d', per_class * len(self.classes))
+        self.lock = multiprocessing.Lock()
+        self.offsets = {name: i * per_class for i, name in enumerate(self.classes)}
+
+        now = time.monotonic()
+        for name, limit in limits.items():
+            base = self.offsets[name]
+            self.values[base], self.values[base + 1] = limit['global_burst'], now
+            for slot in range(client_slots):
+                index = base + _BUCKET + slot * _BUCKET
+                self.values[index], self.values[index + 1] = limit['client_burst'], now
+
+    def _slot(self, client):
+        digest = hashlib.blake2b(client.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') % self.client_slots
+
+    def _refill(self, index, rate, burst, now):
+        tokens = min(burst, self.values[index] + (now - self.values[index + 1]) * rate)
+        self.values[index], self.values[index + 1] = tokens, now
+        return tokens
+
+    def acquire(self, name, client, allow_degraded=False):
+        """
+        Try to admit one request
+        Returns (admitted, reason, retry_after_seconds); reason is 'client',
+        'global' or 'in_flight' when not admitted. With `allow_degraded`, a
+        request that only lacks a global token is admitted with reason
+        'degraded'; it still takes a client token and an in-flight slot.
+        """
+        limit = self.limits[name]
+        base = self.offsets[name]
+        client_index = base + _BUCKET + self._slot(client) * _BUCKET
+        in_flight_index = base + _BUCKET + self.client_slots * _BUCKET
+        now = time.monotonic()
+
+        with self.lock:
+            client_tokens = self._refill(client_index, limit['client_rate'], limit['client_burst'], now)
+            global_tokens = self._refill(base, limit['global_rate'], limit['global_burst'], now)
+            if client_tokens < 1:
+                return False, 'client', (1 - client_tokens) / limit['client_rate']
+            if self.values[in_flight_index] >= limit['max_in_flight']:
+                return False, 'in_flight', 1.0
+            reason = None
+            if global_tokens < 1:
+                if not allow_degraded:
+                    return False, 'global', (1 - global_tokens) / limit['global_rate']
+                reason = 'degraded'
+            else:
+                self.values[base] = global_tokens - 1
+            self.values[client_index] = client_tokens - 1
+            self.values[in_flight_index] += 1
+        return True, reason, 0.0
+
+    def release(self, name):
+        in_flight_index = self.offsets[name] + _BUCKET + self.client_slots * _BUCKET
+        with self.lock:
+            self.values[in_flight_index] = max(0.0, self.values[in_flight_index] - 1)
+
+
+def _client_key(endpoint_class):
+    if endpoint_class == 'whatsapp':
+        return request.form.get('From') or request.remote_addr or ''
+    return request.remote_addr or ''
+
+
+def is_degraded():
+    """True when the current WhatsApp request was admitted in degraded mode"""
+    return g.get('admission_degraded', False)
+
+
+def _too_many_requests(retry_after):
+    response = jsonify({'success': False, 'message': 'Too many requests, please retry later'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def init_app(app):
+    """Create the shared limits and install the request hooks"""
+    if not app.config['ADMISSION_ENABLED']:
+        return
+    routes = app.config['ADMISSION_ROUTES']
+    limits = SharedLimits(app.config['ADMISSION_LIMITS'], app.config['ADMISSION_CLIENT_SLOTS'])
+    app.extensions['admission'] = limits
+
+    @app.before_request
+    def admit():
+        endpoint_class = routes.get((request.method, request.path))
+        if endpoint_class is None:
+            return None
+        admitted, reason, retry_after = limits.acquire(
+            endpoint_class, _client_key(endpoint_class), allow_degraded=endpoint_class == 'whatsapp'
+        )
+        if not admitted:
+            return _too_many_requests(retry_after)
+        g.admission_class = endpoint_class
+        g.admission_degraded = reason == 'degraded'
+        return None
+
+    @app.teardown_request
+    def release(exc):
+        endpoint_class = g.pop('admission_class', None)
+        if endpoint_class is not None:
+            limits.release(endpoint_class)
+
+
+def start_deferred_classifier(interval=None):
+    """Classify complaints accepted in degraded mode, in a daemon thread"""
+    from helpers import classify_pending
+
+    interval = interval or Config.DEFERRED_CLASSIFICATION_INTERVAL_SECONDS
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            try:
+                while classify_pending():
+                    pass
+            except Exception as e:
+                print(f"Error classifying pending complaints: {str(e)}")
+
+    threading.Thread(target=loop, name='deferred-classifier', daemon=True).start()
+    return stop
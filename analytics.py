@@ -0,0 +1,249 @@
+"""
+Pre-aggregated time-series analytics
+
+save_complaint and update_complaint_status keep two rollup tables current
+inside their own transactions:
+
+- rollup_daily: complaints created/resolved per day, category and department
+- resolution_times: one compact row per resolved complaint (department,
+  ISO week, hours to resolve) used for weekly percentiles
+
+Dashboard queries read only these tables, never the complaint partitions.
+While `python analytics.py` rebuilds them, complaints in months it has not
+reached yet are left to the rebuild.
+"""
+
+from datetime import timedelta
+import numpy as np
+from database import get_department_by_category, PENDING_CATEGORY
+from partitions import rebuild_by_partition, rebuild_pending, unshadowed
+from replica import get_read_connection
+
+ROLLUP_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS rollup_daily (
+        day TEXT NOT NULL,
+        category TEXT NOT NULL,
+        department TEXT NOT NULL,
+        created INTEGER NOT NULL DEFAULT 0,
+        resolved INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, category, department)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS resolution_times (
+        complaint_id TEXT PRIMARY KEY,
+        department TEXT NOT NULL,
+        week TEXT NOT NULL,
+        hours REAL NOT NULL
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_resolution_times_department_week
+    ON resolution_times (department, week, hours)
+    ''',
+]
+
+# SQLite expression for the Monday starting the week of a datetime column
+_WEEK_SQL = "date({column}, 'weekday 0', '-6 days')"
+
+# partition_rebuilds target of rebuild_rollups
+REBUILD_TARGET = 'rollups'
+
+
+def _bump(cursor, day, category, department, created=0, resolved=0):
+    cursor.execute('''
+        INSERT INTO rollup_daily (day, category, department, created, resolved)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (day, category, department) DO UPDATE SET
+            created = created + excluded.created,
+            resolved = resolved + excluded.resolved
+    ''', (day, category or 'Uncategorized', department, created, resolved))
+
+
+def record_created(cursor, table, timestamp, category, department):
+    """Count a new complaint of partition `table` in the daily rollup"""
+    if rebuild_pending(cursor, REBUILD_TARGET, table):
+        return
+    _bump(cursor, timestamp.strftime('%Y-%m-%d'), category, department, created=1)
+
+
+def record_status_change(cursor, table, complaint_id, old_status, new_status):
+    """
+    Maintain rollups after a status update in `table`
+    Must run after the complaint row itself was updated.
+    """
+    if (old_status == 'Resolved') == (new_status == 'Resolved'):
+        return
+    if rebuild_pending(cursor, REBUILD_TARGET, table):
+        return
+
+    if new_status == 'Resolved':
+        cursor.execute(f'''
+            SELECT category, date(resolved_at) AS day, {_WEEK_SQL.format(column='resolved_at')} AS week,
+                   (julianday(resolved_at) - julianday(timestamp)) * 24 AS hours
+            FROM {table} WHERE id = ?
+        ''', (complaint_id,))
+        row = cursor.fetchone()
+        department = get_department_by_category(row['category'])
+        _bump(cursor, row['day'], row['category'], department, resolved=1)
+        cursor.execute('''
+            INSERT OR REPLACE INTO resolution_times (complaint_id, department, week, hours)
+            VALUES (?, ?, ?, ?)
+        ''', (complaint_id, department, row['week'], max(row['hours'] or 0.0, 0.0)))
+    else:
+        # Reopened: undo the resolution counted on the day it happened
+        cursor.execute(f'SELECT category, date(resolved_at) AS day FROM {table} WHERE id = ?',
+                       (complaint_id,))
+        row = cursor.fetchone()
+        if row['day']:
+            department = get_department_by_category(row['category'])
+            _bump(cursor, row['day'], row['category'], department, resolved=-1)
+        cursor.execute('DELETE FROM resolution_times WHERE complaint_id = ?', (complaint_id,))
+
+
+def _reset_rollups(cursor):
+    cursor.connection.create_function('department_of', 1, get_department_by_category, deterministic=True)
+    cursor.execute('DELETE FROM rollup_daily')
+    cursor.execute('DELETE FROM resolution_times')
+
+
+def _rebuild_partition(cursor, tables):
+    week = _WEEK_SQL.format(column='resolved_at')
+    for table in tables:
+        live = unshadowed(cursor, table)
+        # Like record_created: deferred complaints count once classified
+        cursor.execute(f'''
+            INSERT INTO rollup_daily (day, category, department, created, resolved)
+            SELECT date(timestamp), IFNULL(category, 'Uncategorized'), department_of(category), COUNT(*), 0
+            FROM {table} WHERE category IS NOT ? AND {live} GROUP BY 1, 2
+            ON CONFLICT (day, category, department) DO UPDATE SET created = created + excluded.created
+        ''', (PENDING_CATEGORY,))
+        cursor.execute(f'''
+            INSERT INTO rollup_daily (day, category, department, created, resolved)
+            SELECT date(resolved_at), IFNULL(category, 'Uncategorized'), department_of(category), 0, COUNT(*)
+            FROM {table} WHERE status = 'Resolved' AND resolved_at IS NOT NULL AND {live} GROUP BY 1, 2
+            ON CONFLICT (day, category, department) DO UPDATE SET resolved = resolved + excluded.resolved
+        ''')
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO resolution_times (complaint_id, department, week, hours)
+            SELECT id, department_of(category), {week},
+                   MAX((julianday(resolved_at) - julianday(timestamp)) * 24, 0)
+            FROM {table} WHERE status = 'Resolved' AND resolved_at IS NOT NULL AND {live}
+        ''')
+
+
+def rebuild_rollups(conn=None):
+    """Recompute every rollup from the complaint partitions, one month per transaction"""
+    rebuild_by_partition(conn, REBUILD_TARGET, _reset_rollups, _rebuild_partition)
+    print("📈 Analytics rollups rebuilt")
+
+
+# ==================== QUERIES ====================
+
+def _day_range(start, end):
+    """WHERE clause over `day` for a [start, end) datetime range"""
+    clauses, params = [], []
+    if start is not None:
+        clauses.append('day >= ?')
+        params.append(start.strftime('%Y-%m-%d'))
+    if end is not None:
+        clauses.append('day < ?')
+        params.append(end.strftime('%Y-%m-%d'))
+    return (' AND '.join(clauses) or '1'), params
+
+
+def daily_counts(start=None, end=None, group_by='category'):
+    """Complaints created/resolved per day, grouped by category or department"""
+    if group_by not in ('category', 'department'):
+        raise ValueError("group_by must be 'category' or 'department'")
+    where, params = _day_range(start, end)
+
+    conn = get_read_connection()
+    rows = conn.execute(f'''
+        SELECT day, {group_by}, SUM(created) AS created, SUM(resolved) AS resolved
+        FROM rollup_daily WHERE {where}
+        GROUP BY day, {group_by} ORDER BY day, {group_by}
+    ''', params).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def backlog_series(start=None, end=None, department=None):
+    """Open complaints at the end of each day (created minus resolved, cumulative)"""
+    where, params = _day_range(None, end)
+    if department:
+        where += ' AND department = ?'
+        params.append(department)
+
+    conn = get_read_connection()
+    rows = conn.execute(f'''
+        SELECT day, SUM(created) - SUM(resolved) AS delta
+        FROM rollup_daily WHERE {where} GROUP BY day ORDER BY day
+    ''', params).fetchall()
+    conn.close()
+    if not rows:
+        return []
+
+    days = np.array([row['day'] for row in rows])
+    backlog = np.cumsum(np.fromiter((row['delta'] for row in rows), dtype=np.int64, count=len(rows)))
+    if start is not None:
+        keep = days >= start.strftime('%Y-%m-%d')
+        days, backlog = days[keep], backlog[keep]
+    return [{'day': str(day), 'backlog': int(count)} for day, count in zip(days, backlog)]
+
+
+def _grouped_percentile(values, starts, counts, q):
+    """Linear-interpolated percentile of each sorted group, vectorised"""
+    position = starts + q * (counts - 1)
+    low = np.floor(position).astype(np.int64)
+    high = np.ceil(position).astype(np.int64)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def resolution_percentiles(start=None, end=None, department=None):
+    """Median and p90 hours-to-resolve per department per week"""
+    clauses, params = [], []
+    if start is not None:
+        clauses.append('week >= ?')
+        params.append((start - timedelta(days=start.weekday())).strftime('%Y-%m-%d'))
+    if end is not None:
+        clauses.append('week < ?')
+        params.append(end.strftime('%Y-%m-%d'))
+    if department:
+        clauses.append('department = ?')
+        params.append(department)
+    where = ' AND '.join(clauses) or '1'
+
+    conn = get_read_connection()
+    cursor = conn.execute(f'''
+        SELECT department, week, hours FROM resolution_times
+        WHERE {where} ORDER BY department, week, hours
+    ''', params)
+    rows = cursor.fetchall()
+    conn.close()
+    if not rows:
+        return []
+
+    keys = np.array([f"{row[0]}\x00{row[1]}" for row in rows])
+    hours = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[starts, len(keys)])
+
+    median = _grouped_percentile(hours, starts, counts, 0.5)
+    p90 = _grouped_percentile(hours, starts, counts, 0.9)
+    result = []
+    for index, first in enumerate(starts):
+        department_name, week = keys[first].split('\x00')
+        result.append({
+            'department': department_name,
+            'week': week,
+            'resolved': int(counts[index]),
+            'median_hours': round(float(median[index]), 2),
+            'p90_hours': round(float(p90[index]), 2),
+        })
+    return result
+
+
+if __name__ == '__main__':
+    rebuild_rollups()
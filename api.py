@@ -1,10 +1,12 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from helpers import (
     categorize_image, 
+    categorize_text,
     detect_priority, 
     generate_complaint_id,
     save_complaint,
@@ -12,49 +14,201 @@ from helpers import (
     get_leaderboard_data,
     send_whatsapp_reply,
     update_complaint_status,
-    get_all_complaints
+    get_all_complaints,
+    get_complaint_stats,
+    iter_complaints,
+    PENDING_CATEGORY
 )
-from database import init_db
+from export import EXPORT_FORMATS, export_stream
+from partitions import COMPLAINT_COLUMNS
+import responses
+import random
+import tempfile
+import admission
+import analytics
+import database
+import events
+import heatmap
+import images
+import profiling
+import replica
+import sla
+import triage
+import wards
+from migrations import ensure_schema
+from config import config
 
-app = Flask(__name__, static_folder='client/build', static_url_path='')
-CORS(app)  # Enable CORS for React frontend
+bp = Blueprint('api', __name__)
 
-app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-init_db()
+def create_app(config_name=None):
+    """
+    Application factory
+    config_name selects an entry of config.config (defaults to FLASK_CONFIG)
+    """
+    config_name = config_name or os.environ.get('FLASK_CONFIG', 'default')
+    app = Flask(__name__, static_folder='client/build', static_url_path='')
+    app.config.from_object(config[config_name])
+    
+    if not app.config.get('SECRET_KEY'):
+        raise RuntimeError(f"SECRET_KEY must be set for the '{config_name}' configuration")
+    
+    if app.config['TRUSTED_PROXIES']:
+        # Real client addresses for admission control and logs
+        proxies = app.config['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
+    
+    CORS(app)  # Enable CORS for React frontend
+    admission.init_app(app)
+    responses.init_app(app)
+    profiling.init_app(app)
+    replica.init_app(app)
+    database.configure(app.config['DATABASE_NAME'], app.config['ARCHIVE_DATABASE_NAME'])
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    
+    app.register_blueprint(bp)
+    return app
+
+
+def init_worker(app):
+    """
+    Per-process setup, run in each worker after fork
+    Workers inherit the master's RNG state, so reseed it to keep
+    generate_complaint_id from producing the same IDs in every worker.
+    Background threads do not survive fork, so they are started here.
+    """
+    random.seed()
+    if app.config['SLA_ENABLED']:
+        sla.start_scheduler(app.config['SLA_SCAN_INTERVAL_SECONDS'])
+    if app.config['ADMISSION_ENABLED']:
+        admission.start_deferred_classifier(app.config['DEFERRED_CLASSIFICATION_INTERVAL_SECONDS'])
+    if app.config['READ_REPLICA_ENABLED']:
+        replica.start_refresher(app.config['READ_REPLICA_REFRESH_SECONDS'])
 
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    allowed = current_app.config['ALLOWED_EXTENSIONS']
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed
+
+
+def parse_date_range(args):
+    """Read optional ?from=YYYY-MM-DD&to=YYYY-MM-DD (to is inclusive)"""
+    start = args.get('from')
+    end = args.get('to')
+    start = datetime.strptime(start, '%Y-%m-%d') if start else None
+    end = datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1) if end else None
+    return start, end
+
+
+def parse_fields(args):
+    """Read an optional ?fields=id,status,... projection"""
+    fields = args.get('fields')
+    if not fields:
+        return None
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in COMPLAINT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def parse_complaint_filters(args):
+    """Filters shared by the list and export endpoints"""
+    start, end = parse_date_range(args)
+    include_archive = args.get('archived', 'true') != 'false'
+    return start, end, include_archive
 
 
 # Serve React App
-@app.route('/')
+@bp.route('/')
 def serve():
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_from_directory(current_app.static_folder, 'index.html')
+
+
+@bp.route('/static/uploads/<path:filename>')
+def serve_upload(filename):
+    """
+    Uploaded complaint images (?w=<width> for a resized variant)
+    Content-addressed files never change, so they are cached as immutable;
+    Range and conditional requests are handled by send_from_directory.
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    immutable = images.is_content_addressed(filename)
+    directory, name = upload_folder, filename
+    
+    # Legacy flat uploads have no variants and are served as they are
+    width = request.args.get('w', type=int)
+    if width is not None and immutable:
+        if width not in images.VARIANT_WIDTHS:
+            return jsonify({'success': False, 'message': f'w must be one of {images.VARIANT_WIDTHS}'}), 400
+        if not os.path.isfile(os.path.join(upload_folder, filename)):
+            return jsonify({'success': False, 'message': 'Image not found'}), 404
+        variant = images.variant_path(upload_folder, filename, width)
+        # Not a decodable image: serve the original as it is
+        if variant is not None:
+            directory, name = os.path.dirname(variant), os.path.basename(variant)
+    
+    response = send_from_directory(
+        os.path.abspath(directory), name, conditional=True,
+        max_age=images.IMMUTABLE_MAX_AGE if immutable else images.LEGACY_MAX_AGE
+    )
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
 
 
 # ==================== REST API ENDPOINTS ====================
 
-@app.route('/api/complaints', methods=['GET'])
+@bp.route('/api/complaints', methods=['GET'])
 def get_complaints():
-    """Get all complaints"""
+    """Get all complaints, optionally limited to a date range"""
     try:
-        complaints = get_all_complaints()
+        try:
+            start, end, include_archive = parse_complaint_filters(request.args)
+            fields = parse_fields(request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        complaints = get_all_complaints(start, end, include_archive, fields)
         return jsonify({'success': True, 'complaints': complaints})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
-@app.route('/api/complaints/<complaint_id>', methods=['GET'])
+@bp.route('/api/complaints/export', methods=['GET'])
+def export_complaints():
+    """Stream complaints as CSV or NDJSON (?format=csv|ndjson&gzip=true)"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': 'format must be csv or ndjson'}), 400
+    try:
+        start, end, include_archive = parse_complaint_filters(request.args)
+        fields = parse_fields(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    gzip = request.args.get('gzip') == 'true'
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    filename = f'complaints.{extension}'
+    if gzip:
+        mimetype, filename = 'application/gzip', f'{filename}.gz'
+    
+    chunks = iter_complaints(start, end, include_archive, fields)
+    # Keep the request context (and its read routing) until the stream ends
+    response = Response(stream_with_context(export_stream(chunks, fmt, gzip, fields)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+
+@bp.route('/api/complaints/<complaint_id>', methods=['GET'])
 def get_complaint(complaint_id):
     """Get complaint by ID"""
     try:
-        complaint = get_complaint_by_id(complaint_id)
+        try:
+            fields = parse_fields(request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        complaint = get_complaint_by_id(complaint_id, fields)
         if complaint:
             return jsonify({'success': True, 'complaint': complaint})
         return jsonify({'success': False, 'message': 'Complaint not found'}), 404
@@ -62,7 +216,19 @@ def get_complaint(complaint_id):
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
-@app.route('/api/complaints', methods=['POST'])
+@bp.route('/api/complaints/<complaint_id>/history', methods=['GET'])
+def get_complaint_history(complaint_id):
+    """Status transitions of a complaint"""
+    try:
+        history = events.complaint_history(complaint_id)
+        if history:
+            return jsonify({'success': True, 'history': history})
+        return jsonify({'success': False, 'message': 'Complaint not found'}), 404
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@bp.route('/api/complaints', methods=['POST'])
 def create_complaint():
     """Create new complaint"""
     try:
@@ -78,16 +244,15 @@ def create_complaint():
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                filename = f"{timestamp}_{filename}"
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
-                image_path = f"uploads/{filename}"
+                image_path, filepath = images.store_upload(file, current_app.config['UPLOAD_FOLDER'])
                 category = categorize_image(filepath)
         
+        if image_path is None:
+            category = categorize_text(description)
+        
         priority = detect_priority(description)
-        complaint_id = generate_complaint_id()
+        now = datetime.now()
+        complaint_id = generate_complaint_id(now)
         
         complaint_data = {
             'id': complaint_id,
@@ -97,17 +262,23 @@ def create_complaint():
             'priority': priority,
             'location': f"{latitude},{longitude}" if latitude and longitude else location,
             'status': 'Submitted',
-            'timestamp': datetime.now(),
+            'timestamp': now,
             'anonymous': anonymous
         }
+        complaint_data['ward'] = wards.ward_for_location(complaint_data['location'])
         
-        save_complaint(complaint_data)
+        if not save_complaint(complaint_data):
+            return jsonify({
+                'success': False,
+                'message': 'Complaint could not be saved, please try again'
+            }), 503
         
         return jsonify({
             'success': True,
             'complaint_id': complaint_id,
             'category': category,
             'priority': priority,
+            'ward': complaint_data['ward'],
             'message': 'Complaint submitted successfully!'
         })
         
@@ -115,7 +286,7 @@ def create_complaint():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
-@app.route('/api/complaints/<complaint_id>/status', methods=['PUT'])
+@bp.route('/api/complaints/<complaint_id>/status', methods=['PUT'])
 def update_status(complaint_id):
     """Update complaint status"""
     try:
@@ -129,13 +300,15 @@ def update_status(complaint_id):
         
         if success:
             return jsonify({'success': True, 'message': 'Status updated successfully'})
+        if success is None:
+            return jsonify({'success': False, 'message': 'Complaint not found'}), 404
         return jsonify({'success': False, 'message': 'Failed to update status'}), 500
             
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
-@app.route('/api/leaderboard', methods=['GET'])
+@bp.route('/api/leaderboard', methods=['GET'])
 def get_leaderboard():
     """Get department leaderboard"""
     try:
@@ -145,7 +318,7 @@ def get_leaderboard():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
-@app.route('/api/analyze-image', methods=['POST'])
+@bp.route('/api/analyze-image', methods=['POST'])
 def analyze_image():
     """AI image analysis"""
     try:
@@ -154,13 +327,12 @@ def analyze_image():
         
         file = request.files['image']
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"temp_{timestamp}_{filename}"
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            
-            category = categorize_image(filepath)
+            # Analysis only: keep the upload out of the image store
+            suffix = '.' + secure_filename(file.filename).rsplit('.', 1)[1]
+            with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+                file.save(tmp)
+                tmp.flush()
+                category = categorize_image(tmp.name)
             return jsonify({'success': True, 'category': category})
         
         return jsonify({'success': False, 'message': 'Invalid file type'}), 400
@@ -168,23 +340,137 @@ def analyze_image():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
-@app.route('/api/stats', methods=['GET'])
+@bp.route('/api/stats', methods=['GET'])
 def get_stats():
     """Get dashboard statistics"""
     try:
-        complaints = get_all_complaints()
-        stats = {
-            'total': len(complaints),
-            'submitted': len([c for c in complaints if c['status'] == 'Submitted']),
-            'in_progress': len([c for c in complaints if c['status'] == 'In Progress']),
-            'resolved': len([c for c in complaints if c['status'] == 'Resolved']),
-        }
+        stats = get_complaint_stats()
         return jsonify({'success': True, 'stats': stats})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
-@app.route('/api/whatsapp', methods=['POST'])
+@bp.route('/api/analytics/daily', methods=['GET'])
+def analytics_daily():
+    """Complaints created/resolved per day by category or department"""
+    try:
+        start, end = parse_date_range(request.args)
+        group_by = request.args.get('group_by', 'category')
+        data = analytics.daily_counts(start, end, group_by)
+        return jsonify({'success': True, 'series': data})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@bp.route('/api/analytics/backlog', methods=['GET'])
+def analytics_backlog():
+    """Open complaints at the end of each day"""
+    try:
+        start, end = parse_date_range(request.args)
+        data = analytics.backlog_series(start, end, request.args.get('department'))
+        return jsonify({'success': True, 'series': data})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@bp.route('/api/analytics/resolution', methods=['GET'])
+def analytics_resolution():
+    """Median and p90 resolution time per department per week"""
+    try:
+        start, end = parse_date_range(request.args)
+        data = analytics.resolution_percentiles(start, end, request.args.get('department'))
+        return jsonify({'success': True, 'series': data})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@bp.route('/api/analytics/stages', methods=['GET'])
+def analytics_stages():
+    """Average hours per stage (Submitted -> In Progress -> Resolved) per department"""
+    try:
+        data = events.stage_durations(request.args.get('department'))
+        return jsonify({'success': True, 'stages': data})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@bp.route('/api/heatmap/<int:z>/<int:x>/<int:y>', methods=['GET'])
+def get_heatmap_tile(z, x, y):
+    """Open-complaint counts of a map tile, optionally for one ?category="""
+    try:
+        tile = heatmap.get_tile(z, x, y, request.args.get('category'))
+        response = jsonify({'success': True, 'tile': tile})
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['HEATMAP_MAX_AGE_SECONDS']
+        return response
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@bp.route('/api/queue/next', methods=['POST'])
+def claim_next_complaints():
+    """Lease the next most urgent Submitted complaints to an officer"""
+    try:
+        data = request.get_json(silent=True) or {}
+        officer = data.get('officer')
+        if not officer:
+            return jsonify({'success': False, 'message': 'officer is required'}), 400
+        try:
+            limit = min(int(data.get('limit', 5)), current_app.config['TRIAGE_MAX_CLAIM'])
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'limit must be a number'}), 400
+        if limit < 1:
+            return jsonify({'success': False, 'message': 'limit must be positive'}), 400
+        
+        claimed = triage.claim(officer, limit, current_app.config['TRIAGE_LEASE_SECONDS'])
+        complaints = []
+        for entry in claimed:
+            complaint = get_complaint_by_id(entry['id'])
+            if complaint:
+                complaints.append({**complaint, **entry})
+        return jsonify({'success': True, 'complaints': complaints})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@bp.route('/api/queue/release', methods=['POST'])
+def release_claimed_complaints():
+    """Give back an officer's leases (all, or the listed ids)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        officer = data.get('officer')
+        if not officer:
+            return jsonify({'success': False, 'message': 'officer is required'}), 400
+        ids = data.get('ids')
+        if ids is not None and not isinstance(ids, list):
+            return jsonify({'success': False, 'message': 'ids must be a list'}), 400
+        released = triage.release(officer, ids)
+        return jsonify({'success': True, 'released': released})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@bp.route('/api/escalations', methods=['GET'])
+def get_escalations():
+    """Most recent SLA escalations"""
+    try:
+        limit = min(int(request.args.get('limit', 100)), 1000)
+        return jsonify({'success': True, 'escalations': sla.get_escalations(limit)})
+    except ValueError:
+        return jsonify({'success': False, 'message': 'limit must be a number'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@bp.route('/api/whatsapp', methods=['POST'])
 def whatsapp_webhook():
     """WhatsApp webhook"""
     try:
@@ -192,21 +478,26 @@ def whatsapp_webhook():
         message_body = request.form.get('Body', '')
         
         priority = detect_priority(message_body)
-        complaint_id = generate_complaint_id()
+        now = datetime.now()
+        complaint_id = generate_complaint_id(now)
         
         complaint_data = {
             'id': complaint_id,
             'description': message_body,
             'image_path': None,
-            'category': 'Uncategorized',
+            # Under overload, accept now and classify in the background
+            'category': PENDING_CATEGORY if admission.is_degraded() else categorize_text(message_body),
             'priority': priority,
             'location': 'WhatsApp',
             'status': 'Submitted',
-            'timestamp': datetime.now(),
+            'timestamp': now,
             'anonymous': False
         }
         
-        save_complaint(complaint_data)
+        if not save_complaint(complaint_data):
+            send_whatsapp_reply(from_number, "❌ Sorry, we could not register your complaint. Please try again.")
+            return jsonify({'success': False}), 503
+        
         reply = f"✅ Complaint registered! ID: {complaint_id}"
         send_whatsapp_reply(from_number, reply)
         
@@ -216,4 +507,9 @@ def whatsapp_webhook():
 
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app = create_app()
+    ensure_schema()
+    # With the debug reloader only the serving child runs workers' setup
+    if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        init_worker(app)
+    app.run(debug=app.config['DEBUG'], host=app.config['HOST'], port=app.config['PORT'])
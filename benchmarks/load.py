@@ -0,0 +1,402 @@
+"""
+Load-testing benchmark for the REST API
+
+    python benchmarks/load.py run --complaints 2000 --concurrency 16 --duration 30 -o baseline.json
+    python benchmarks/load.py run ... -o current.json
+    python benchmarks/load.py compare baseline.json current.json --threshold 0.15
+
+`run` boots api.py in a subprocess against a scratch complaints.db, seeds it
+with synthetic complaints (a share of them with images), then drives a
+weighted mix of citizen submits, TrackComplaint lookups, Admin list/stats
+polling and leaderboard reads. Workloads are reproducible for a given
+--seed. Everything runs offline on the local machine.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_MIX = 'submit=10,track=40,admin_list=10,admin_stats=20,leaderboard=20'
+
+DESCRIPTIONS = [
+    'Large pothole on main road causing accidents',
+    'Garbage not collected for a week, severe smell',
+    'Streetlight broken near the bus stop, dangerous at night',
+    'Water supply pipe leaking, needs repair',
+    'Drainage blocked after rain, urgent',
+    'Minor crack on the footpath, small issue',
+    'Request for maintenance of the park lights',
+]
+STATUSES = ['Submitted', 'In Progress', 'Resolved']
+
+
+def scratch_env(workdir):
+    """Environment pointing the app at files inside workdir"""
+    env = dict(os.environ)
+    env.update({
+        'SECRET_KEY': env.get('SECRET_KEY', 'benchmark'),
+        'DATABASE_NAME': os.path.join(workdir, 'complaints.db'),
+        'ARCHIVE_DATABASE_NAME': os.path.join(workdir, 'complaints_archive.db'),
+        'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+        'TEXT_MODEL_PATH': os.path.join(workdir, 'models', 'text_classifier.npy'),
+    })
+    return env
+
+
+def synthetic_image(rng, size=64):
+    """Small JPEG with random content"""
+    from PIL import Image
+
+    image = Image.new('RGB', (size, size), tuple(rng.randrange(256) for _ in range(3)))
+    for _ in range(20):
+        image.putpixel((rng.randrange(size), rng.randrange(size)),
+                       tuple(rng.randrange(256) for _ in range(3)))
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def seed_database(env, count, image_ratio, days, rng):
+    """
+    Fill the scratch database through the helpers.py write path so every
+    derived table is populated exactly as in production
+    Returns the seeded complaint IDs.
+    """
+    os.environ.update(env)
+    import database
+    from helpers import detect_priority, save_complaint, update_complaint_status
+
+    database.configure(env['DATABASE_NAME'], env['ARCHIVE_DATABASE_NAME'])
+    database.init_db()
+    os.makedirs(env['UPLOAD_FOLDER'], exist_ok=True)
+
+    categories = ['Pothole', 'Garbage', 'Streetlight', 'Road Damage', 'Water', 'Drainage']
+    now = datetime.now()
+    ids = []
+    for n in range(count):
+        when = now - timedelta(seconds=rng.randrange(days * 86400))
+        complaint_id = f"CMP{when.strftime('%Y%m%d')}{n:08d}"
+        image_path = None
+        if rng.random() < image_ratio:
+            filename = f'seed_{n}.jpg'
+            with open(os.path.join(env['UPLOAD_FOLDER'], filename), 'wb') as f:
+                f.write(synthetic_image(rng))
+            image_path = f'uploads/{filename}'
+        description = rng.choice(DESCRIPTIONS)
+        save_complaint({
+            'id': complaint_id,
+            'description': description,
+            'image_path': image_path,
+            'category': rng.choice(categories),
+            'priority': detect_priority(description),
+            'location': f'{12.9 + rng.random() * 0.2:.6f},{77.5 + rng.random() * 0.2:.6f}',
+            'status': 'Submitted',
+            'timestamp': when,
+            'anonymous': rng.random() < 0.2,
+        })
+        status = rng.choice(STATUSES)
+        if status != 'Submitted':
+            update_complaint_status(complaint_id, status)
+        ids.append(complaint_id)
+    return ids
+
+
+def multipart(fields, files):
+    """Encode a multipart/form-data body"""
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content, mime) in files.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+                   f'filename="{filename}"\r\nContent-Type: {mime}\r\n\r\n'.encode())
+        body.write(content)
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+class Workload:
+    """Builds requests for each endpoint class of the mix"""
+
+    def __init__(self, base_url, ids, image_ratio, rng):
+        self.base_url = base_url
+        self.ids = ids
+        self.image_ratio = image_ratio
+        self.image = synthetic_image(rng)
+        self.lock = threading.Lock()
+
+    def request(self, kind, rng):
+        if kind == 'submit':
+            fields = {
+                'description': rng.choice(DESCRIPTIONS),
+                'latitude': f'{12.9 + rng.random() * 0.2:.6f}',
+                'longitude': f'{77.5 + rng.random() * 0.2:.6f}',
+                'anonymous': 'false',
+            }
+            files = {}
+            if rng.random() < self.image_ratio:
+                files['image'] = ('photo.jpg', self.image, 'image/jpeg')
+            body, content_type = multipart(fields, files)
+            return urllib.request.Request(f'{self.base_url}/api/complaints', data=body,
+                                          headers={'Content-Type': content_type}, method='POST')
+        if kind == 'track':
+            with self.lock:
+                complaint_id = rng.choice(self.ids)
+            return urllib.request.Request(f'{self.base_url}/api/complaints/{complaint_id}')
+        if kind == 'admin_list':
+            return urllib.request.Request(f'{self.base_url}/api/complaints')
+        if kind == 'admin_list_compact':
+            return urllib.request.Request(
+                f'{self.base_url}/api/complaints?fields=id,category,priority,status,timestamp',
+                headers={'Accept-Encoding': 'gzip'})
+        if kind == 'admin_stats':
+            return urllib.request.Request(f'{self.base_url}/api/stats')
+        if kind == 'leaderboard':
+            return urllib.request.Request(f'{self.base_url}/api/leaderboard')
+        raise ValueError(f'Unknown workload kind: {kind}')
+
+    def record_submit(self, payload):
+        complaint_id = payload.get('complaint_id')
+        if complaint_id:
+            with self.lock:
+                self.ids.append(complaint_id)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(samples, errors, elapsed):
+    """Per-endpoint throughput and latency percentiles (ms)"""
+    report = {}
+    for kind in sorted(set(samples) | set(errors)):
+        latencies = sorted(samples.get(kind, []))
+        report[kind] = {
+            'requests': len(latencies),
+            'errors': errors.get(kind, 0),
+            'throughput_rps': round(len(latencies) / elapsed, 2),
+            'p50_ms': _ms(percentile(latencies, 0.50)),
+            'p95_ms': _ms(percentile(latencies, 0.95)),
+            'p99_ms': _ms(percentile(latencies, 0.99)),
+        }
+    return report
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def drive(workload, mix, concurrency, duration, seed):
+    """Run the mix from `concurrency` threads for `duration` seconds"""
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    samples = {kind: [] for kind in kinds}
+    errors = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        local = {kind: [] for kind in kinds}
+        local_errors = {}
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            request = workload.request(kind, rng)
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    body = response.read()
+                local[kind].append(time.perf_counter() - started)
+                if kind == 'submit':
+                    workload.record_submit(json.loads(body))
+            except (urllib.error.URLError, OSError, ValueError):
+                local_errors[kind] = local_errors.get(kind, 0) + 1
+        with lock:
+            for kind, values in local.items():
+                samples[kind].extend(values)
+            for kind, count in local_errors.items():
+                errors[kind] = errors.get(kind, 0) + count
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    report = summarize(samples, errors, elapsed)
+    total = sum(len(values) for values in samples.values())
+    report['_total'] = {
+        'requests': total,
+        'errors': sum(errors.values()),
+        'throughput_rps': round(total / elapsed, 2),
+        'elapsed_s': round(elapsed, 3),
+    }
+    return report
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+def start_server(args, env):
+    """Boot the API in a subprocess and wait until it answers"""
+    if args.server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app',
+                   '--workers', str(args.workers), '--bind', f'127.0.0.1:{args.port}']
+    else:
+        command = [sys.executable, os.path.abspath(__file__), 'serve', '--port', str(args.port)]
+    server = subprocess.Popen(command, cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{args.port}/api/stats', timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise SystemExit('API server did not start')
+
+
+def command_run(args):
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        env = scratch_env(workdir)
+        seed_started = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            ids = seed_database(env, args.complaints, args.image_ratio, args.days, rng)
+        seed_elapsed = time.perf_counter() - seed_started
+
+        if args.read_replica:
+            env.update({'READ_REPLICA_ENABLED': 'true', 'READ_REPLICA_REFRESH_SECONDS': str(args.read_replica)})
+        server = start_server(args, env)
+        try:
+            workload = Workload(f'http://127.0.0.1:{args.port}', ids, args.image_ratio, rng)
+            report = drive(workload, parse_mix(args.mix), args.concurrency, args.duration, args.seed)
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    report['_config'] = {
+        'complaints': args.complaints,
+        'image_ratio': args.image_ratio,
+        'concurrency': args.concurrency,
+        'duration_s': args.duration,
+        'mix': args.mix,
+        'server': args.server,
+        'read_replica': args.read_replica,
+        'seed': args.seed,
+        'seed_s': round(seed_elapsed, 3),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+def compare(baseline, current, threshold):
+    """Regressions of current against baseline (latency up or throughput down)"""
+    regressions = []
+    for kind, base in baseline.items():
+        if kind.startswith('_config') or kind not in current:
+            continue
+        now = current[kind]
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if base.get(metric) and now.get(metric) and now[metric] > base[metric] * (1 + threshold):
+                regressions.append(f'{kind}.{metric}: {base[metric]} -> {now[metric]}')
+        if base.get('throughput_rps') and now.get('throughput_rps', 0) < base['throughput_rps'] * (1 - threshold):
+            regressions.append(f"{kind}.throughput_rps: {base['throughput_rps']} -> {now.get('throughput_rps')}")
+        if now.get('errors', 0) > base.get('errors', 0):
+            regressions.append(f"{kind}.errors: {base.get('errors', 0)} -> {now['errors']}")
+    return regressions
+
+
+def command_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    for line in regressions:
+        print(f'❌ REGRESSION {line}')
+    if not regressions:
+        print(f'✅ No regressions beyond {args.threshold:.0%}')
+    sys.exit(1 if regressions else 0)
+
+
+def command_serve(args):
+    """Threaded development server used by `run --server werkzeug`"""
+    from werkzeug.serving import run_simple
+    from api import create_app, init_worker
+    from migrations import ensure_schema
+
+    app = create_app('production')
+    ensure_schema()
+    init_worker(app)
+    run_simple('127.0.0.1', args.port, app, threaded=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='REST API load benchmark')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='seed a scratch database and drive the mix')
+    run.add_argument('--complaints', type=int, default=1000)
+    run.add_argument('--image-ratio', type=float, default=0.3)
+    run.add_argument('--days', type=int, default=120, help='spread seeded complaints over this many days')
+    run.add_argument('--concurrency', type=int, default=8)
+    run.add_argument('--duration', type=float, default=20)
+    run.add_argument('--mix', default=DEFAULT_MIX)
+    run.add_argument('--server', choices=['werkzeug', 'gunicorn'], default='werkzeug')
+    run.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    run.add_argument('--port', type=int, default=5098)
+    run.add_argument('--read-replica', type=int, default=0, metavar='SECONDS',
+                     help='serve admin reads from a replica refreshed this often (0: off)')
+    run.add_argument('--seed', type=int, default=42)
+    run.add_argument('--workdir', default=None, help='parent directory for the scratch database')
+    run.add_argument('-o', '--output', help='write the JSON report to this file')
+    run.set_defaults(func=command_run)
+
+    cmp = commands.add_parser('compare', help='flag regressions against a saved baseline')
+    cmp.add_argument('baseline')
+    cmp.add_argument('current')
+    cmp.add_argument('--threshold', type=float, default=0.10)
+    cmp.set_defaults(func=command_compare)
+
+    serve = commands.add_parser('serve', help=argparse.SUPPRESS)
+    serve.add_argument('--port', type=int, default=5098)
+    serve.set_defaults(func=command_serve)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Payload size and serialization time of the list endpoints
+
+    python benchmarks/payload.py --complaints 20000 -o payload.json
+
+Seeds a scratch database (see load.py) and requests GET /api/complaints
+in-process with the Flask test client, comparing the original response
+(every column, stdlib JSON, uncompressed) against field projection, the
+orjson encoder and gzip/br compression.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import scratch_env, seed_database
+
+COMPACT_FIELDS = 'id,category,priority,status,timestamp'
+
+VARIANTS = [
+    # name, query string, Accept-Encoding, use orjson
+    ('full_stdlib_identity', '', None, False),
+    ('full_orjson_identity', '', None, True),
+    ('full_orjson_gzip', '', 'gzip', True),
+    ('full_orjson_br', '', 'br', True),
+    ('compact_orjson_identity', f'?fields={COMPACT_FIELDS}', None, True),
+    ('compact_orjson_gzip', f'?fields={COMPACT_FIELDS}', 'gzip', True),
+]
+
+
+def measure(client, responses, path, encoding, use_orjson, repeat):
+    saved = responses.orjson
+    if not use_orjson:
+        responses.orjson = None
+    try:
+        headers = {'Accept-Encoding': encoding} if encoding else {}
+        timings = []
+        size = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = client.get(path, headers=headers)
+            timings.append(time.perf_counter() - started)
+            size = len(response.data)
+        return {
+            'bytes': size,
+            'content_encoding': response.headers.get('Content-Encoding'),
+            'median_ms': round(statistics.median(timings) * 1000, 3),
+        }
+    finally:
+        responses.orjson = saved
+
+
+def run(args):
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        env = scratch_env(workdir)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            seed_database(env, args.complaints, 0.3, args.days, random.Random(args.seed))
+
+        import responses
+        from api import create_app
+
+        client = create_app('production').test_client()
+        report = {'_config': {'complaints': args.complaints, 'repeat': args.repeat,
+                              'orjson': responses.orjson is not None,
+                              'brotli': responses.brotli is not None}}
+        for name, query, encoding, use_orjson in VARIANTS:
+            if use_orjson and responses.orjson is None:
+                continue
+            if encoding == 'br' and responses.brotli is None:
+                continue
+            report[name] = measure(client, responses, f'/api/complaints{query}',
+                                   encoding, use_orjson, args.repeat)
+        return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='List endpoint payload benchmark')
+    parser.add_argument('--complaints', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workdir', default=None)
+    parser.add_argument('-o', '--output')
+    args = parser.parse_args()
+
+    output = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
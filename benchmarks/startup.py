@@ -0,0 +1,102 @@
+"""
+Startup time and per-worker memory of the production server (Linux only)
+
+    python benchmarks/startup.py --workers 4
+
+Boots gunicorn against a scratch database, waits until every worker
+answers, then reports time-to-ready and each worker's memory from
+/proc/<pid>/smaps_rollup. Pss and USS (private pages) show how much of
+the preloaded master is still shared copy-on-write.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from load import scratch_env
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_import(module, env):
+    """Wall time of a fresh interpreter importing a module"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', f'import {module}'], cwd=ROOT, env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def memory_kb(pid):
+    """Rss, Pss and USS of a process in kB"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss_kb': fields.get('Rss', 0),
+        'pss_kb': fields.get('Pss', 0),
+        'uss_kb': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def wait_ready(url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+def run(workers, port, timeout):
+    with tempfile.TemporaryDirectory() as workdir:
+        env = scratch_env(workdir)
+        result = {
+            'import_api_s': round(time_import('api', env), 4),
+            'import_wsgi_s': round(time_import('wsgi', env), 4),
+        }
+
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app',
+             '--workers', str(workers), '--bind', f'127.0.0.1:{port}'],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            url = f'http://127.0.0.1:{port}/api/stats'
+            if not wait_ready(url, timeout):
+                raise SystemExit('server did not become ready')
+            # Every worker must be forked before memory is sampled
+            while len(children(server.pid)) < workers and time.perf_counter() - started < timeout:
+                time.sleep(0.05)
+            result['ready_s'] = round(time.perf_counter() - started, 4)
+            result['master'] = memory_kb(server.pid)
+            result['workers'] = [dict(pid=pid, **memory_kb(pid)) for pid in children(server.pid)]
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+        return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--timeout', type=float, default=30)
+    args = parser.parse_args()
+    print(json.dumps(run(args.workers, args.port, args.timeout), indent=2))
@@ -0,0 +1,158 @@
+"""
+Contention benchmark for the triage queue (POST /api/queue/next)
+
+    python benchmarks/triage_queue.py --claimers 50 --complaints 5000 --batch 5
+
+Seeds a scratch database through save_complaint (so the queue is filled by
+the normal intake path), then starts `--claimers` officer threads that
+each loop: claim the next `--batch` complaints with triage.claim, hold
+them for `--hold-ms`, and move them to In Progress, which takes them off
+the queue. The report gives claims per second, claim latency, and the
+number of complaints handed to more than one officer, which must be 0.
+"""
+
+import argparse
+import collections
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load import DESCRIPTIONS, percentile, scratch_env  # noqa: E402
+from writes import _ms  # noqa: E402
+
+PRIORITIES = ['High', 'Medium', 'Low']
+CATEGORIES = ['Pothole', 'Garbage', 'Streetlight', 'Water Supply']
+
+
+def seed(count, rng):
+    from helpers import save_complaint
+
+    now = datetime.now()
+    for n in range(count):
+        when = now - timedelta(minutes=rng.randrange(30 * 24 * 60))
+        # A few hundred hotspots so duplicate clusters form
+        lat = 12.90 + rng.randrange(20) * 0.002
+        lng = 77.50 + rng.randrange(20) * 0.002
+        save_complaint({
+            'id': f"CMP{when.strftime('%Y%m%d')}{n:06d}",
+            'description': DESCRIPTIONS[n % len(DESCRIPTIONS)],
+            'image_path': None,
+            'category': rng.choice(CATEGORIES),
+            'priority': rng.choice(PRIORITIES),
+            'location': f'{lat:.5f},{lng:.5f}',
+            'status': 'Submitted',
+            'timestamp': when,
+            'anonymous': False,
+        })
+
+
+def run(args, workdir):
+    """Seed a scratch database in `workdir` and run the claimers against it"""
+    import database
+    from helpers import update_complaint_status
+    from migrations import migrate
+    import triage
+
+    env = scratch_env(workdir)
+    database.configure(env['DATABASE_NAME'], env['ARCHIVE_DATABASE_NAME'])
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate()
+        seed(args.complaints, random.Random(args.seed))
+
+    conn = database.get_db_connection()
+    plan = conn.execute('''
+        EXPLAIN QUERY PLAN
+        SELECT complaint_id, urgency_key FROM triage_queue INDEXED BY idx_triage_queue_urgency
+        WHERE lease_expires < 0 OR lease_owner = '' ORDER BY urgency_key DESC LIMIT 5
+    ''').fetchall()
+    queued = conn.execute('SELECT COUNT(*) FROM triage_queue').fetchone()[0]
+    conn.close()
+    print(f"📋 {queued} complaints queued; claim plan: {'; '.join(row['detail'] for row in plan)}")
+
+    owners = collections.defaultdict(set)
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + args.duration
+
+    def officer(name):
+        nonlocal failures
+        local, failed = [], 0
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                claimed = triage.claim(name, args.batch)
+            except Exception:
+                failed += 1
+                continue
+            local.append(time.perf_counter() - started)
+            if not claimed:
+                break
+            with lock:
+                for entry in claimed:
+                    owners[entry['id']].add(name)
+            if args.hold_ms:
+                time.sleep(args.hold_ms / 1000)
+            for entry in claimed:
+                update_complaint_status(entry['id'], 'In Progress')
+        with lock:
+            latencies.extend(local)
+            failures += failed
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        threads = [threading.Thread(target=officer, args=(f'officer-{n}',)) for n in range(args.claimers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'claimers': args.claimers,
+        'queued': queued,
+        'claims': len(latencies),
+        'complaints_claimed': len(owners),
+        'double_claimed': sum(1 for names in owners.values() if len(names) > 1),
+        'failures': failures,
+        'claims_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': _ms(percentile(latencies, 0.50)),
+        'p99_ms': _ms(percentile(latencies, 0.99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--claimers', type=int, default=50)
+    parser.add_argument('--complaints', type=int, default=5000)
+    parser.add_argument('--batch', type=int, default=5, help='complaints per claim')
+    parser.add_argument('--hold-ms', type=float, default=0, help='time an officer holds a claim')
+    parser.add_argument('--duration', type=float, default=30, help='stop after this many seconds')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('-o', '--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='triage-queue-') as workdir:
+        result = run(args, workdir)
+    print(f"{args.claimers} claimers: {result['claims_per_second']} claims/s  "
+          f"p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  "
+          f"({result['complaints_claimed']} complaints claimed, {result['double_claimed']} double-claimed, "
+          f"{result['failures']} failed)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
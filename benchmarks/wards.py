@@ -0,0 +1,132 @@
+"""
+Lookup benchmark for the offline ward resolver
+
+    python benchmarks/wards.py --wards 4000 --vertices 64 --lookups 100000
+    python benchmarks/wards.py --geojson data/wards.geojson
+
+Without --geojson, builds a synthetic city of `--wards` tiled polygons with
+about `--vertices` wiggly vertices each (neighbours share their borders
+exactly, like real ward maps). Reports index build time and lookup
+latency, and checks a sample of lookups against a brute-force scan of
+every polygon.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load import percentile  # noqa: E402
+
+# Synthetic city extent (lng, lat)
+ORIGIN = (77.40, 12.80)
+SPAN = 0.40
+
+
+def synthetic_geojson(wards, vertices, rng):
+    """FeatureCollection of a jittered grid of wards"""
+    side = math.ceil(math.sqrt(wards))
+    step = max(1, vertices // 4)  # points per ward side
+    lattice = side * step
+    spacing = SPAN / lattice
+
+    def vertex(i, j):
+        # Jitter depends only on the lattice point, so borders are shared;
+        # it stays below half a spacing, so polygons stay simple
+        jitter = random.Random(i * 1000003 + j)
+        dx = dy = 0.0
+        if 0 < i < lattice and 0 < j < lattice:
+            dx = (jitter.random() - 0.5) * 0.8 * spacing
+            dy = (jitter.random() - 0.5) * 0.8 * spacing
+        return [round(ORIGIN[0] + i * spacing + dx, 7), round(ORIGIN[1] + j * spacing + dy, 7)]
+
+    features = []
+    for column in range(side):
+        for row in range(side):
+            if len(features) == wards:
+                break
+            i0, j0 = column * step, row * step
+            ring = ([vertex(i0 + k, j0) for k in range(step)]
+                    + [vertex(i0 + step, j0 + k) for k in range(step)]
+                    + [vertex(i0 + step - k, j0 + step) for k in range(step)]
+                    + [vertex(i0, j0 + step - k) for k in range(step)])
+            ring.append(ring[0])
+            features.append({
+                'type': 'Feature',
+                'properties': {'name': f'Ward {len(features) + 1}'},
+                'geometry': {'type': 'Polygon', 'coordinates': [ring]},
+            })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def brute_force(features, lat, lng):
+    for name, polygons in features:
+        for polygon in polygons:
+            inside = False
+            for ring in polygon:
+                for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+                    if (y1 > lat) != (y2 > lat) and lng < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+                        inside = not inside
+            if inside:
+                return name
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--geojson', help='benchmark these boundaries instead of synthetic ones')
+    parser.add_argument('--wards', type=int, default=4000)
+    parser.add_argument('--vertices', type=int, default=64)
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--verify', type=int, default=200, help='lookups checked by brute force')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    from wards import WardIndex, read_geojson
+
+    rng = random.Random(args.seed)
+    path = args.geojson
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix='wards-'), 'wards.geojson')
+        with open(path, 'w') as f:
+            json.dump(synthetic_geojson(args.wards, args.vertices, rng), f)
+
+    features = read_geojson(path)
+    started = time.perf_counter()
+    index = WardIndex(features)
+    build_ms = (time.perf_counter() - started) * 1000
+    edges = sum(len(ring) for _, polygons in features for polygon in polygons for ring in polygon)
+    print(f"🏛️ {index.count} polygons, {edges} edges; grid {index.columns}x{index.rows} "
+          f"built in {build_ms:.0f} ms")
+
+    min_x, min_y = index.min_x, index.min_y
+    width, height = index.columns * index.cell_width, index.rows * index.cell_height
+    points = [(min_y + rng.random() * height, min_x + rng.random() * width)
+              for _ in range(args.lookups)]
+
+    latencies = []
+    found = 0
+    for lat, lng in points:
+        started = time.perf_counter()
+        ward = index.lookup(lat, lng)
+        latencies.append(time.perf_counter() - started)
+        found += ward is not None
+    latencies.sort()
+    print(f"{args.lookups} lookups: mean {sum(latencies) / len(latencies) * 1e6:.1f} us  "
+          f"p50 {percentile(latencies, 0.50) * 1e6:.1f} us  p99 {percentile(latencies, 0.99) * 1e6:.1f} us  "
+          f"({found} inside a ward)")
+
+    mismatches = sum(index.lookup(lat, lng) != brute_force(features, lat, lng)
+                     for lat, lng in points[:args.verify])
+    print(f"{mismatches} of {min(args.verify, len(points))} lookups differ from a brute-force scan")
+
+
+if __name__ == '__main__':
+    main()
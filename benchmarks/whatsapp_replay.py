@@ -0,0 +1,404 @@
+"""
+Record-and-replay load test for the WhatsApp bot (whatsapp-complaint-bot/app.py)
+
+Record real traffic by starting the bot with WEBHOOK_RECORD_FILE set: every
+incoming webhook payload is appended to that JSONL file with its arrival
+time. Or generate a synthetic recording:
+
+    python benchmarks/whatsapp_replay.py synth -o webhooks.jsonl --messages 2000 --rate 20
+
+Replay it against the bot at 1x-100x the recorded pace:
+
+    python benchmarks/whatsapp_replay.py replay webhooks.jsonl --speed 10
+    python benchmarks/whatsapp_replay.py replay webhooks.jsonl --speed 50 --server gunicorn --workers 4
+
+`replay` starts a local stand-in for the Graph API (with --latency-ms,
+--jitter-ms and --error-rate injection), boots the bot pointed at it via
+GRAPH_API_BASE and reports webhook throughput, webhook latency and reply
+latency: the time from posting a message to the bot's first text reply
+to that sender reaching the Graph API. Each replayed message gets its own
+synthetic sender number, so replies can be matched and real numbers never
+leave the recording. Use --bot-url to drive an already running bot (start
+it with GRAPH_API_BASE=http://127.0.0.1:<graph-port>), or run the stand-in
+on its own with the `graph` subcommand.
+"""
+
+import argparse
+import json
+import os
+import queue
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_DIR = os.path.join(ROOT, 'whatsapp-complaint-bot')
+sys.path.insert(0, ROOT)
+
+from load import DESCRIPTIONS, _ms, percentile  # noqa: E402
+
+_MESSAGES_PATH_RE = re.compile(r'^/[^/]+/[^/]+/messages$')
+_MEDIA_PATH_RE = re.compile(r'^/[^/]+/([^/]+)$')
+
+
+# ==================== GRAPH API STAND-IN ====================
+
+class GraphStandIn:
+    """What the stand-in received: call counts and first text reply per recipient"""
+
+    def __init__(self, latency, jitter, error_rate, seed):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.errors = 0
+        self.first_reply = {}
+
+    def delay(self):
+        with self.lock:
+            return max(0.0, self.rng.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+
+    def should_fail(self):
+        with self.lock:
+            return self.rng.random() < self.error_rate
+
+    def record(self, payload, failed):
+        kind = payload.get('type') or payload.get('status') or 'other'
+        now = time.perf_counter()
+        with self.lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+            if failed:
+                self.errors += 1
+            elif kind == 'text':
+                self.first_reply.setdefault(payload.get('to'), now)
+
+
+def make_handler(stand_in):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, body, content_type='application/json'):
+            data = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if not _MESSAGES_PATH_RE.match(self.path):
+                return self._reply(404, {'error': {'message': 'Unknown path'}})
+            time.sleep(stand_in.delay())
+            payload = json.loads(body or b'{}')
+            failed = stand_in.should_fail()
+            stand_in.record(payload, failed)
+            if failed:
+                return self._reply(500, {'error': {'message': 'Injected error', 'code': 131000}})
+            if payload.get('status') == 'read':
+                return self._reply(200, {'success': True})
+            return self._reply(200, {
+                'messaging_product': 'whatsapp',
+                'contacts': [{'input': payload.get('to'), 'wa_id': payload.get('to')}],
+                'messages': [{'id': f'wamid.replay{time.perf_counter_ns()}'}],
+            })
+
+        def do_GET(self):
+            time.sleep(stand_in.delay())
+            if self.path.startswith('/media/'):
+                return self._reply(200, b'\xff\xd8replay-media\xff\xd9', 'image/jpeg')
+            match = _MEDIA_PATH_RE.match(self.path)
+            if not match:
+                return self._reply(404, {'error': {'message': 'Unknown path'}})
+            host = self.headers.get('Host', '127.0.0.1')
+            return self._reply(200, {'id': match.group(1), 'mime_type': 'image/jpeg',
+                                     'url': f'http://{host}/media/{match.group(1)}'})
+
+    return Handler
+
+
+def start_graph(port, stand_in):
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(stand_in))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='graph-stand-in', daemon=True).start()
+    return server
+
+
+# ==================== RECORDINGS ====================
+
+def load_recording(path):
+    """(offset seconds from the first webhook, payload) per recorded line"""
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                entries.append((entry['received_at'], entry['payload']))
+    if not entries:
+        raise SystemExit(f'{path} has no recorded webhooks')
+    entries.sort(key=lambda e: e[0])
+    first = entries[0][0]
+    return [(received_at - first, payload) for received_at, payload in entries]
+
+
+def assign_senders(payload, next_number):
+    """Give every message in a payload its own synthetic sender; returns the senders"""
+    senders = []
+    for entry in payload.get('entry', []):
+        for change in entry.get('changes', []):
+            value = change.get('value', {})
+            for message in value.get('messages', []):
+                message['from'] = f'9199{next_number():08d}'
+                senders.append(message['from'])
+            for contact, sender in zip(value.get('contacts', []), senders):
+                contact['wa_id'] = sender
+    return senders
+
+
+def synthetic_message(rng, n):
+    kind = rng.choices(['text', 'location', 'image', 'command'], [50, 20, 15, 15])[0]
+    message = {'id': f'wamid.synth{n}', 'timestamp': str(int(time.time())), 'type': kind}
+    if kind == 'text':
+        message['text'] = {'body': rng.choice(DESCRIPTIONS)}
+    elif kind == 'command':
+        message.update(type='text', text={'body': rng.choice(['hi', 'complaint', 'status', 'help'])})
+    elif kind == 'location':
+        message['location'] = {'latitude': 12.9 + rng.random() / 10, 'longitude': 77.5 + rng.random() / 10}
+    else:
+        message['image'] = {'id': f'media{n}', 'mime_type': 'image/jpeg', 'caption': rng.choice(DESCRIPTIONS)}
+    return message
+
+
+def command_synth(args):
+    """Poisson arrivals of typical citizen messages"""
+    rng = random.Random(args.seed)
+    at = time.time()
+    with open(args.output, 'w', encoding='utf-8') as f:
+        for n in range(args.messages):
+            at += rng.expovariate(args.rate)
+            payload = {'object': 'whatsapp_business_account', 'entry': [{'id': 'synth', 'changes': [{
+                'field': 'messages',
+                'value': {'messaging_product': 'whatsapp',
+                          'metadata': {'phone_number_id': 'replay'},
+                          'contacts': [{'profile': {'name': 'Citizen'}, 'wa_id': ''}],
+                          'messages': [synthetic_message(rng, n)]},
+            }]}]}
+            f.write(json.dumps({'received_at': at, 'payload': payload}, separators=(',', ':')) + '\n')
+    print(f'✅ Wrote {args.messages} webhooks (~{args.rate}/s) to {args.output}')
+
+
+# ==================== REPLAY ====================
+
+def start_bot(args):
+    """Boot the bot in a subprocess, pointed at the Graph API stand-in"""
+    env = dict(os.environ)
+    env.update({
+        'GRAPH_API_BASE': f'http://127.0.0.1:{args.graph_port}',
+        'WHATSAPP_TOKEN': 'replay',
+        'PHONE_NUMBER_ID': 'replay',
+        'VERIFY_TOKEN': 'replay',
+    })
+    env.pop('WEBHOOK_RECORD_FILE', None)
+    if args.server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', 'app:app', '--worker-class', 'gthread',
+                   '--workers', str(args.workers), '--threads', str(args.threads),
+                   '--bind', f'127.0.0.1:{args.port}']
+    else:
+        command = [sys.executable, '-c',
+                   f"from app import app; app.run(host='127.0.0.1', port={args.port}, threaded=True)"]
+    bot = subprocess.Popen(command, cwd=BOT_DIR, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{args.port}/health', timeout=1):
+                return bot
+        except OSError:
+            time.sleep(0.1)
+    bot.terminate()
+    raise SystemExit('Bot did not start')
+
+
+def replay(url, recording, speed, concurrency):
+    """Post the recording on its (sped-up) schedule; returns per-webhook results"""
+    counter = iter(range(10 ** 8))
+    jobs = queue.Queue()
+    results = []
+    lock = threading.Lock()
+    start = time.perf_counter() + 0.2
+
+    for offset, payload in recording:
+        senders = assign_senders(payload, lambda: next(counter))
+        jobs.put((start + offset / speed, json.dumps(payload).encode('utf-8'), senders))
+
+    def sender():
+        local = []
+        while True:
+            try:
+                due, body, senders = jobs.get_nowait()
+            except queue.Empty:
+                break
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+            sent = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except (urllib.error.URLError, OSError):
+                status = None
+            local.append({'due': due, 'sent': sent, 'done': time.perf_counter(),
+                          'status': status, 'senders': senders})
+        with lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=sender) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def report(results, stand_in, speed, recorded_span):
+    ok = [r for r in results if r['status'] == 200]
+    first_sent = min(r['sent'] for r in results)
+    elapsed = max(r['done'] for r in results) - first_sent
+    webhook_latency = sorted(r['done'] - r['sent'] for r in ok)
+    reply_latency, missing = [], 0
+    for r in ok:
+        for number in r['senders']:
+            replied = stand_in.first_reply.get(number)
+            if replied is None:
+                missing += 1
+            else:
+                reply_latency.append(replied - r['sent'])
+    reply_latency.sort()
+
+    return {
+        'webhooks': len(results),
+        'failed_webhooks': len(results) - len(ok),
+        'speed': speed,
+        'recorded_span_s': round(recorded_span, 3),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(ok) / elapsed, 2) if elapsed else None,
+        'max_schedule_lag_ms': _ms(max(r['sent'] - r['due'] for r in results)),
+        'webhook_p50_ms': _ms(percentile(webhook_latency, 0.50)),
+        'webhook_p95_ms': _ms(percentile(webhook_latency, 0.95)),
+        'webhook_p99_ms': _ms(percentile(webhook_latency, 0.99)),
+        'replies': len(reply_latency),
+        'messages_without_reply': missing,
+        'reply_p50_ms': _ms(percentile(reply_latency, 0.50)),
+        'reply_p95_ms': _ms(percentile(reply_latency, 0.95)),
+        'reply_p99_ms': _ms(percentile(reply_latency, 0.99)),
+        'graph_calls': dict(stand_in.calls),
+        'graph_injected_errors': stand_in.errors,
+    }
+
+
+def command_replay(args):
+    if not 1 <= args.speed <= 100:
+        raise SystemExit('--speed must be between 1 and 100')
+    recording = load_recording(args.recording)
+    stand_in = GraphStandIn(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate, args.seed)
+    graph = start_graph(args.graph_port, stand_in)
+
+    bot = None if args.bot_url else start_bot(args)
+    url = args.bot_url or f'http://127.0.0.1:{args.port}/webhook'
+    try:
+        results = replay(url, recording, args.speed, args.concurrency)
+        time.sleep(args.drain)  # let in-flight replies reach the stand-in
+    finally:
+        if bot is not None:
+            bot.terminate()
+            bot.wait(timeout=10)
+        graph.shutdown()
+
+    summary = report(results, stand_in, args.speed, recording[-1][0])
+    summary['_config'] = {
+        'recording': args.recording,
+        'server': 'external' if args.bot_url else args.server,
+        'workers': args.workers,
+        'concurrency': args.concurrency,
+        'graph_latency_ms': args.latency_ms,
+        'graph_jitter_ms': args.jitter_ms,
+        'graph_error_rate': args.error_rate,
+    }
+    output = json.dumps(summary, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+def command_graph(args):
+    stand_in = GraphStandIn(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate, args.seed)
+    server = start_graph(args.graph_port, stand_in)
+    print(f'🌐 Graph API stand-in on http://127.0.0.1:{args.graph_port} (Ctrl+C to stop)')
+    try:
+        while True:
+            time.sleep(5)
+            print(f'📊 calls {stand_in.calls} injected errors {stand_in.errors}')
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+def add_graph_options(parser):
+    parser.add_argument('--graph-port', type=int, default=9109)
+    parser.add_argument('--latency-ms', type=float, default=80, help='mean Graph API latency')
+    parser.add_argument('--jitter-ms', type=float, default=30, help='std deviation of the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of calls answered with 500')
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WhatsApp bot record-and-replay load test')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    rep = commands.add_parser('replay', help='replay a recording against the bot')
+    rep.add_argument('recording')
+    rep.add_argument('--speed', type=float, default=1, help='1x-100x the recorded pace')
+    rep.add_argument('--concurrency', type=int, default=32, help='max webhooks in flight')
+    rep.add_argument('--server', choices=['werkzeug', 'gunicorn'], default='werkzeug')
+    rep.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    rep.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+    rep.add_argument('--port', type=int, default=8098)
+    rep.add_argument('--bot-url', help='webhook URL of an already running bot')
+    rep.add_argument('--drain', type=float, default=1.0, help='seconds to wait for late replies')
+    rep.add_argument('-o', '--output', help='write the JSON report to this file')
+    add_graph_options(rep)
+    rep.set_defaults(func=command_replay)
+
+    synth = commands.add_parser('synth', help='generate a synthetic recording')
+    synth.add_argument('-o', '--output', required=True)
+    synth.add_argument('--messages', type=int, default=1000)
+    synth.add_argument('--rate', type=float, default=10, help='mean webhooks per second')
+    synth.add_argument('--seed', type=int, default=42)
+    synth.set_defaults(func=command_synth)
+
+    graph = commands.add_parser('graph', help='run only the Graph API stand-in')
+    add_graph_options(graph)
+    graph.set_defaults(func=command_graph)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
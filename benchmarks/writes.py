@@ -0,0 +1,144 @@
+"""
+Write-throughput benchmark for save_complaint, with and without group commit
+
+    python benchmarks/writes.py --threads 16 --duration 10
+    python benchmarks/writes.py --mode on --max-delay-ms 2 --max-batch 128
+
+Each mode runs against its own scratch database; request threads call
+helpers.save_complaint in a loop, exactly as the API does, and the report
+gives committed writes per second, failures and per-write latency.
+"""
+
+import argparse
+import collections
+import contextlib
+import io
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load import DESCRIPTIONS, percentile, scratch_env  # noqa: E402
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def run_mode(group_commit, threads, duration, max_delay_ms, max_batch):
+    """Benchmark one mode against a scratch database that is removed afterwards"""
+    with tempfile.TemporaryDirectory(prefix='writes-') as workdir:
+        return _run_mode(workdir, group_commit, threads, duration, max_delay_ms, max_batch)
+
+
+def _run_mode(workdir, group_commit, threads, duration, max_delay_ms, max_batch):
+    import database
+    from config import Config
+    from helpers import save_complaint
+    from migrations import migrate
+
+    env = scratch_env(workdir)
+    database.configure(env['DATABASE_NAME'], env['ARCHIVE_DATABASE_NAME'])
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate()
+
+    Config.GROUP_COMMIT_ENABLED = group_commit
+    Config.GROUP_COMMIT_MAX_DELAY_MS = max_delay_ms
+    Config.GROUP_COMMIT_MAX_BATCH = max_batch
+
+    # IDs carry their date, so spread a unique sequence over past days
+    sequence = itertools.count()
+    sequence_lock = threading.Lock()
+    results_lock = threading.Lock()
+    latencies = []
+    failures = 0
+    stop_at = time.perf_counter() + duration
+
+    def next_complaint():
+        with sequence_lock:
+            n = next(sequence)
+        when = datetime.now() - timedelta(days=n // 10000)
+        return {
+            'id': f"CMP{when.strftime('%Y%m%d')}{n % 10000:04d}",
+            'description': DESCRIPTIONS[n % len(DESCRIPTIONS)],
+            'image_path': None,
+            'category': 'Pothole',
+            'priority': 'Medium',
+            'location': '12.97,77.59',
+            'status': 'Submitted',
+            'timestamp': when,
+            'anonymous': False,
+        }
+
+    def client():
+        nonlocal failures
+        local, failed = [], 0
+        while time.perf_counter() < stop_at:
+            data = next_complaint()
+            started = time.perf_counter()
+            if save_complaint(data):
+                local.append(time.perf_counter() - started)
+            else:
+                failed += 1
+        with results_lock:
+            latencies.extend(local)
+            failures += failed
+
+    # Hide the per-write success lines, but report why writes failed
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        workers = [threading.Thread(target=client) for _ in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+    errors = collections.Counter(line for line in output.getvalue().splitlines()
+                                 if line.startswith('Error'))
+    for line, count in errors.most_common(5):
+        print(f"⚠️ {count} x {line}")
+
+    latencies.sort()
+    return {
+        'group_commit': group_commit,
+        'writes': len(latencies),
+        'failures': failures,
+        'writes_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': _ms(percentile(latencies, 0.50)),
+        'p99_ms': _ms(percentile(latencies, 0.99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['on', 'off', 'both'], default='both')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--max-delay-ms', type=float, default=5)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('-o', '--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    modes = {'on': [True], 'off': [False], 'both': [False, True]}[args.mode]
+    results = [run_mode(mode, args.threads, args.duration, args.max_delay_ms, args.max_batch)
+               for mode in modes]
+    for result in results:
+        label = 'group commit' if result['group_commit'] else 'per-write commit'
+        print(f"{label:>17}: {result['writes_per_second']:>8} writes/s  "
+              f"p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  "
+              f"({result['writes']} writes, {result['failures']} failed)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -351,7 +351,7 @@ const Admin = () => {
                 <div className="detail-row">
                   <strong>Image:</strong><br />
                   <img 
-                    src={`http://localhost:5000/static/${selectedComplaint.image_path}`} 
+                    src={`http://localhost:5000/static/${selectedComplaint.image_path}?w=640`} 
                     alt="Complaint"
                     className="modal-image"
                   />
@@ -75,7 +75,7 @@ const TrackComplaint = () => {
                   className="form-control form-control-lg"
                   value={complaintId}
                   onChange={(e) => setComplaintId(e.target.value)}
-                  placeholder="Enter Complaint ID (e.g., CMP202501011234)"
+                  placeholder="Enter Complaint ID (e.g., CMP20250101K7Q2ZC9M)"
                   disabled={loading}
                 />
                 <button type="submit" className="btn btn-primary btn-lg" disabled={loading}>
@@ -173,7 +173,7 @@ const TrackComplaint = () => {
                     <div className="detail-item full-width">
                       <span className="detail-label">Uploaded Image:</span>
                       <img 
-                        src={`http://localhost:5000/static/${complaint.image_path}`} 
+                        src={`http://localhost:5000/static/${complaint.image_path}?w=640`} 
                         alt="Complaint" 
                         className="complaint-image"
                       />
@@ -11,12 +11,16 @@ class Config:
     DEBUG = True
     
     # File Upload Configuration
-    UPLOAD_FOLDER = 'static/uploads'
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'static/uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
     
     # Database Configuration
-    DATABASE_NAME = 'complaints.db'
+    DATABASE_NAME = os.environ.get('DATABASE_NAME', 'complaints.db')
+    ARCHIVE_DATABASE_NAME = os.environ.get('ARCHIVE_DATABASE_NAME', 'complaints_archive.db')
+    
+    # Resolved complaints older than this move to archive partitions
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
     
     # Twilio Configuration (for WhatsApp integration)
     TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID', '')
@@ -27,6 +31,10 @@ class Config:
     AI_MODEL_PATH = 'models/complaint_classifier.h5'
     USE_AI_CLASSIFICATION = False  # Set to True when AI model is implemented
     
+    # Text classifier for complaints without a photo (python textclassifier.py train)
+    TEXT_MODEL_PATH = os.environ.get('TEXT_MODEL_PATH', 'models/text_classifier.npy')
+    TEXT_CLASSIFIER_MIN_CONFIDENCE = 0.5
+    
     # Priority Keywords
     HIGH_PRIORITY_KEYWORDS = [
         'urgent', 'emergency', 'dangerous', 'severe', 'critical', 
@@ -68,6 +76,72 @@ class Config:
     HOST = '0.0.0.0'
     PORT = 5000
     
+    # Response compression (gzip, or br when the brotli package is installed)
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_LEVEL = 6
+    
+    # SLA escalation (deadlines in hours since the complaint was filed)
+    SLA_ENABLED = os.environ.get('SLA_ENABLED', 'false').lower() == 'true'
+    SLA_SCAN_INTERVAL_SECONDS = int(os.environ.get('SLA_SCAN_INTERVAL_SECONDS', 300))
+    SLA_HOURS = {'High': 24, 'Medium': 72, 'Low': 168}
+    SLA_DEPARTMENT_HOURS = {
+        # 'Water Supply': {'High': 12},
+    }
+    SLA_NOTIFY_NUMBER = os.environ.get('SLA_NOTIFY_NUMBER', '')
+    
+    # Ward boundaries for offline ward tagging (see wards.py)
+    WARDS_GEOJSON = os.environ.get('WARDS_GEOJSON', 'data/wards.geojson')
+    WARDS_NAME_PROPERTY = os.environ.get('WARDS_NAME_PROPERTY', 'name')
+    
+    # Heatmap tiles may be cached by browsers/proxies this long
+    HEATMAP_MAX_AGE_SECONDS = 60
+    
+    # Triage queue (see triage.py); urgency is measured in hours of age
+    TRIAGE_PRIORITY_WEIGHT_HOURS = {'High': 72, 'Medium': 24, 'Low': 0}
+    TRIAGE_DUPLICATE_WEIGHT_HOURS = 12
+    TRIAGE_LEASE_SECONDS = int(os.environ.get('TRIAGE_LEASE_SECONDS', 600))
+    TRIAGE_MAX_CLAIM = 50
+    
+    # Read replica for heavy admin reads (see replica.py)
+    READ_REPLICA_ENABLED = os.environ.get('READ_REPLICA_ENABLED', 'false').lower() == 'true'
+    READ_REPLICA_REFRESH_SECONDS = int(os.environ.get('READ_REPLICA_REFRESH_SECONDS', 30))
+    READ_REPLICA_MAX_AGE_SECONDS = 300
+    READ_REPLICA_ENDPOINTS = [
+        'api.get_complaints',
+        'api.export_complaints',
+        'api.get_stats',
+        'api.get_leaderboard',
+        'api.analytics_daily',
+        'api.analytics_backlog',
+        'api.analytics_resolution',
+        'api.analytics_stages',
+        'api.get_escalations',
+        'api.get_heatmap_tile',
+    ]
+    
+    # Group commit: batch complaint writes into shared transactions
+    GROUP_COMMIT_ENABLED = os.environ.get('GROUP_COMMIT_ENABLED', 'false').lower() == 'true'
+    GROUP_COMMIT_MAX_DELAY_MS = float(os.environ.get('GROUP_COMMIT_MAX_DELAY_MS', 5))
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 64))
+    
+    # Admission control for submission endpoints (rates are requests/second)
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'false').lower() == 'true'
+    ADMISSION_ROUTES = {
+        ('POST', '/api/complaints'): 'submit',
+        ('POST', '/api/analyze-image'): 'submit',
+        ('POST', '/api/whatsapp'): 'whatsapp',
+    }
+    ADMISSION_LIMITS = {
+        'submit': {'global_rate': 20, 'global_burst': 40, 'client_rate': 0.2,
+                   'client_burst': 5, 'max_in_flight': 8},
+        'whatsapp': {'global_rate': 20, 'global_burst': 40, 'client_rate': 0.2,
+                     'client_burst': 5, 'max_in_flight': 8},
+    }
+    ADMISSION_CLIENT_SLOTS = 4096
+    # Reverse proxies in front of the app whose X-Forwarded-* headers are trusted
+    TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+    DEFERRED_CLASSIFICATION_INTERVAL_SECONDS = 2
+    
     # Pagination
     COMPLAINTS_PER_PAGE = 50
     
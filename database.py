@@ -1,82 +1,112 @@
 import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
 import os
+import profiling
+from partitions import reset_partition_cache
+
+DATABASE_NAME = os.environ.get('DATABASE_NAME', 'complaints.db')
+ARCHIVE_DATABASE_NAME = os.environ.get('ARCHIVE_DATABASE_NAME', 'complaints_archive.db')
+
+# Seconds a connection waits for the write lock before "database is locked"
+BUSY_TIMEOUT_SECONDS = float(os.environ.get('DATABASE_BUSY_TIMEOUT', 15))
+
+DEPARTMENTS = [
+    'Roads and Infrastructure',
+    'Sanitation and Waste Management',
+    'Street Lighting',
+    'Water Supply',
+    'Drainage and Sewerage',
+    'Public Health'
+]
+
+def configure(database_name, archive_database_name=None):
+    """Point connections at the database files from the app config"""
+    global DATABASE_NAME, ARCHIVE_DATABASE_NAME
+    DATABASE_NAME = database_name
+    if archive_database_name:
+        ARCHIVE_DATABASE_NAME = archive_database_name
+    reset_partition_cache()
 
-DATABASE_NAME = 'complaints.db'
 
 def get_db_connection():
-    """Create a database connection"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    """Create a database connection with the archive database attached"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=BUSY_TIMEOUT_SECONDS)
     conn.row_factory = sqlite3.Row
+    conn.execute('ATTACH DATABASE ? AS archive', (ARCHIVE_DATABASE_NAME,))
+    profiling.trace_sql(conn)
     return conn
 
 
-def init_db():
-    """Initialize database with required tables"""
-    conn = get_db_connection()
+@contextmanager
+def write_transaction(conn=None):
+    """
+    Yield a cursor inside BEGIN IMMEDIATE ... COMMIT, rolled back on error
+    Taking the write lock up front means the transaction never fails half
+    way through on a lock upgrade. Uses (and closes) a connection of its
+    own unless `conn` is given; that connection is left in autocommit mode.
+    """
+    own_connection = conn is None
+    if own_connection:
+        conn = get_db_connection()
+    conn.isolation_level = None  # explicit BEGIN/COMMIT below
     cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        yield cursor
+        cursor.execute('COMMIT')
+    except BaseException:
+        if conn.in_transaction:
+            cursor.execute('ROLLBACK')
+        raise
+    finally:
+        if own_connection:
+            conn.close()
+
+
+def init_db():
+    """Initialize the database by applying any pending schema migrations"""
+    from migrations import migrate
     
-    # Create complaints table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS complaints (
-            id TEXT PRIMARY KEY,
-            description TEXT NOT NULL,
-            image_path TEXT,
-            category TEXT,
-            priority TEXT,
-            location TEXT,
-            status TEXT DEFAULT 'Submitted',
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            anonymous BOOLEAN DEFAULT 0,
-            resolved_at DATETIME
-        )
-    ''')
-    
-    # Create departments table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS departments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            complaints_resolved INTEGER DEFAULT 0,
-            avg_resolution_time REAL DEFAULT 0.0,
-            total_complaints INTEGER DEFAULT 0
-        )
-    ''')
-    
-    # Insert default departments if they don't exist
-    departments = [
-        'Roads and Infrastructure',
-        'Sanitation and Waste Management',
-        'Street Lighting',
-        'Water Supply',
-        'Drainage and Sewerage',
-        'Public Health'
-    ]
-    
-    for dept in departments:
-        cursor.execute('''
-            INSERT OR IGNORE INTO departments (name) VALUES (?)
-        ''', (dept,))
-    
-    conn.commit()
-    conn.close()
+    migrate()
     print("✅ Database initialized successfully!")
 
 
+CATEGORY_DEPARTMENTS = {
+    'Pothole': 'Roads and Infrastructure',
+    'Road Damage': 'Roads and Infrastructure',
+    'Garbage': 'Sanitation and Waste Management',
+    'Waste': 'Sanitation and Waste Management',
+    'Streetlight': 'Street Lighting',
+    'Lighting': 'Street Lighting',
+    'Water': 'Water Supply',
+    'Drainage': 'Drainage and Sewerage',
+    'Health': 'Public Health'
+}
+DEFAULT_DEPARTMENT = 'Roads and Infrastructure'
+
+# Category of complaints accepted in degraded mode, classified later by
+# helpers.classify_pending; department and rollup counts wait until then
+PENDING_CATEGORY = 'Pending'
+
+
 def get_department_by_category(category):
     """Map category to department"""
-    mapping = {
-        'Pothole': 'Roads and Infrastructure',
-        'Road Damage': 'Roads and Infrastructure',
-        'Garbage': 'Sanitation and Waste Management',
-        'Waste': 'Sanitation and Waste Management',
-        'Streetlight': 'Street Lighting',
-        'Lighting': 'Street Lighting',
-        'Water': 'Water Supply',
-        'Drainage': 'Drainage and Sewerage',
-        'Health': 'Public Health'
-    }
-    return mapping.get(category, 'Roads and Infrastructure')
+    return CATEGORY_DEPARTMENTS.get(category, DEFAULT_DEPARTMENT)
+
+
+def department_category_filter(department):
+    """
+    SQL condition (and parameters) on `category` selecting one department's
+    complaints, including the default department's unmapped categories
+    """
+    if department == DEFAULT_DEPARTMENT:
+        others = [c for c, d in CATEGORY_DEPARTMENTS.items() if d != department]
+        placeholders = ', '.join('?' * len(others))
+        return f'(category IS NULL OR category NOT IN ({placeholders}))', others
+    categories = [c for c, d in CATEGORY_DEPARTMENTS.items() if d == department]
+    placeholders = ', '.join('?' * len(categories))
+    return f'category IN ({placeholders})', categories
 
 
 if __name__ == '__main__':
@@ -0,0 +1,334 @@
+"""
+Append-only complaint status history and the department counters derived from it
+
+Every status transition appends one row to complaint_events. The
+departments.total_complaints / complaints_resolved counters are folded in
+from these events incrementally: the id of the last applied event is kept
+in event_checkpoints, and each write transaction applies the events after
+it. A complaint entering a department (old_status NULL) adds to its total;
+entering or leaving Resolved adds or removes a resolution, so repeated
+"Resolved" updates and reopened complaints no longer skew the leaderboard.
+
+Events of complaints waiting for classification carry no department and
+are not counted; classification appends the event that counts them.
+
+Stage durations are kept the same way: complaint_stages holds the first
+time each complaint entered Submitted, In Progress and Resolved, and
+stage_totals the per-department sums and counts of the gaps between them,
+so stage_durations reads one row per department.
+
+    python events.py rebuild    # recompute counters and stage totals from the history
+"""
+
+from datetime import datetime
+from database import get_db_connection, get_department_by_category, write_transaction, PENDING_CATEGORY
+from replica import get_read_connection
+
+EVENTS_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS complaint_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        complaint_id TEXT NOT NULL,
+        department TEXT,
+        old_status TEXT,
+        new_status TEXT NOT NULL,
+        occurred_at DATETIME NOT NULL
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_complaint_events_complaint
+    ON complaint_events (complaint_id, id)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS event_checkpoints (
+        name TEXT PRIMARY KEY,
+        last_event_id INTEGER NOT NULL
+    )
+    ''',
+]
+
+STAGES_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS complaint_stages (
+        complaint_id TEXT PRIMARY KEY,
+        department TEXT,
+        submitted REAL,
+        in_progress REAL,
+        resolved REAL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS stage_totals (
+        department TEXT PRIMARY KEY,
+        complaints INTEGER NOT NULL DEFAULT 0,
+        submitted_to_in_progress_hours REAL NOT NULL DEFAULT 0,
+        submitted_to_in_progress INTEGER NOT NULL DEFAULT 0,
+        in_progress_to_resolved_hours REAL NOT NULL DEFAULT 0,
+        in_progress_to_resolved INTEGER NOT NULL DEFAULT 0,
+        submitted_to_resolved_hours REAL NOT NULL DEFAULT 0,
+        submitted_to_resolved INTEGER NOT NULL DEFAULT 0,
+        resolved INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+]
+
+COUNTERS_CHECKPOINT = 'department_counters'
+
+# complaint_stages column (julian day) for the first entry into each status
+STAGE_COLUMNS = {'Submitted': 'submitted', 'In Progress': 'in_progress', 'Resolved': 'resolved'}
+
+# Gaps averaged by stage_durations: (from, to), named from_to in stage_totals
+STAGE_PAIRS = [('submitted', 'in_progress'), ('in_progress', 'resolved'), ('submitted', 'resolved')]
+
+
+def event_department(category):
+    """Department an event is counted under; None while a complaint is unclassified"""
+    if category == PENDING_CATEGORY:
+        return None
+    return get_department_by_category(category)
+
+
+def record_event(cursor, complaint_id, category, old_status, new_status, occurred_at=None):
+    """
+    Append a status transition and fold it into the department counters
+    Runs inside the caller's write transaction. old_status None means the
+    complaint is entering its department (created or just classified).
+    """
+    department = event_department(category)
+    occurred_at = occurred_at or datetime.now()
+    cursor.execute('''
+        INSERT INTO complaint_events (complaint_id, department, old_status, new_status, occurred_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (complaint_id, department, old_status, new_status, occurred_at))
+    apply_events(cursor)
+    _record_stage(cursor, complaint_id, department, new_status, occurred_at)
+
+
+def _checkpoint(cursor):
+    cursor.execute('SELECT last_event_id FROM event_checkpoints WHERE name = ?', (COUNTERS_CHECKPOINT,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def _set_checkpoint(cursor, event_id):
+    cursor.execute('''
+        INSERT INTO event_checkpoints (name, last_event_id) VALUES (?, ?)
+        ON CONFLICT (name) DO UPDATE SET last_event_id = excluded.last_event_id
+    ''', (COUNTERS_CHECKPOINT, event_id))
+
+
+def apply_events(cursor):
+    """Apply events after the checkpoint to the department counters; returns how many"""
+    checkpoint = _checkpoint(cursor)
+    cursor.execute('''
+        SELECT department,
+               COUNT(old_status IS NULL OR NULL) AS created,
+               SUM((new_status = 'Resolved') - IFNULL(old_status = 'Resolved', 0)) AS resolved,
+               MAX(id) AS last_id,
+               COUNT(*) AS events
+        FROM complaint_events WHERE id > ?
+        GROUP BY department
+    ''', (checkpoint,))
+    rows = cursor.fetchall()
+    if not rows:
+        return 0
+
+    for row in rows:
+        if row['department'] is None:
+            continue
+        cursor.execute('''
+            UPDATE departments
+            SET total_complaints = total_complaints + ?,
+                complaints_resolved = complaints_resolved + ?
+            WHERE name = ?
+        ''', (row['created'], row['resolved'], row['department']))
+    _set_checkpoint(cursor, max(row['last_id'] for row in rows))
+    return sum(row['events'] for row in rows)
+
+
+def _stage_totals_delta(stages, sign):
+    """stage_totals column values one complaint's stage row adds (sign 1) or removes (-1)"""
+    department, *times = stages
+    times = dict(zip(STAGE_COLUMNS.values(), times))
+    values = [sign]
+    for start, end in STAGE_PAIRS:
+        known = times[start] is not None and times[end] is not None
+        values += [sign * (times[end] - times[start]) * 24 if known else 0.0, sign * known]
+    values.append(sign * (times['resolved'] is not None))
+    return department, values
+
+
+def _add_stage_totals(cursor, stages, sign):
+    department, values = _stage_totals_delta(stages, sign)
+    if department is None:
+        return
+    cursor.execute('''
+        INSERT INTO stage_totals (department, complaints,
+            submitted_to_in_progress_hours, submitted_to_in_progress,
+            in_progress_to_resolved_hours, in_progress_to_resolved,
+            submitted_to_resolved_hours, submitted_to_resolved, resolved)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (department) DO UPDATE SET
+            complaints = complaints + excluded.complaints,
+            submitted_to_in_progress_hours = submitted_to_in_progress_hours + excluded.submitted_to_in_progress_hours,
+            submitted_to_in_progress = submitted_to_in_progress + excluded.submitted_to_in_progress,
+            in_progress_to_resolved_hours = in_progress_to_resolved_hours + excluded.in_progress_to_resolved_hours,
+            in_progress_to_resolved = in_progress_to_resolved + excluded.in_progress_to_resolved,
+            submitted_to_resolved_hours = submitted_to_resolved_hours + excluded.submitted_to_resolved_hours,
+            submitted_to_resolved = submitted_to_resolved + excluded.submitted_to_resolved,
+            resolved = resolved + excluded.resolved
+    ''', (department, *values))
+
+
+def _record_stage(cursor, complaint_id, department, new_status, occurred_at):
+    """Fold one event into complaint_stages and move the complaint's share of stage_totals"""
+    cursor.execute('''
+        SELECT department, submitted, in_progress, resolved FROM complaint_stages WHERE complaint_id = ?
+    ''', (complaint_id,))
+    row = cursor.fetchone()
+    old = tuple(row) if row else (None, None, None, None)
+    new = list(old)
+    new[0] = department or old[0]
+    if new_status in STAGE_COLUMNS:
+        index = 1 + list(STAGE_COLUMNS).index(new_status)
+        cursor.execute('SELECT julianday(?)', (occurred_at,))
+        entered = cursor.fetchone()[0]
+        if new[index] is None or entered < new[index]:
+            new[index] = entered
+    new = tuple(new)
+    if new == old:
+        return
+
+    cursor.execute('''
+        INSERT OR REPLACE INTO complaint_stages (complaint_id, department, submitted, in_progress, resolved)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (complaint_id, *new))
+    if row is not None:
+        _add_stage_totals(cursor, old, -1)
+    _add_stage_totals(cursor, new, 1)
+
+
+def rebuild_counters(conn=None):
+    """Recompute all department counters from the history in one pass"""
+    with write_transaction(conn) as cursor:
+        cursor.execute('UPDATE departments SET total_complaints = 0, complaints_resolved = 0')
+        cursor.execute('''
+            SELECT department,
+                   COUNT(old_status IS NULL OR NULL) AS created,
+                   SUM((new_status = 'Resolved') - IFNULL(old_status = 'Resolved', 0)) AS resolved
+            FROM complaint_events WHERE department IS NOT NULL
+            GROUP BY department
+        ''')
+        counters = [(row['created'], row['resolved'], row['department']) for row in cursor.fetchall()]
+        cursor.executemany('''
+            UPDATE departments SET total_complaints = ?, complaints_resolved = ? WHERE name = ?
+        ''', counters)
+        cursor.execute('SELECT IFNULL(MAX(id), 0) FROM complaint_events')
+        _set_checkpoint(cursor, cursor.fetchone()[0])
+    print("🏆 Department counters rebuilt from complaint history")
+
+
+def rebuild_stages(conn=None):
+    """Recompute complaint_stages and stage_totals from the history"""
+    with write_transaction(conn) as cursor:
+        cursor.execute('DELETE FROM complaint_stages')
+        cursor.execute('DELETE FROM stage_totals')
+        cursor.execute('''
+            INSERT INTO complaint_stages (complaint_id, department, submitted, in_progress, resolved)
+            SELECT complaint_id, MAX(department),
+                   MIN(CASE WHEN new_status = 'Submitted' THEN julianday(occurred_at) END),
+                   MIN(CASE WHEN new_status = 'In Progress' THEN julianday(occurred_at) END),
+                   MIN(CASE WHEN new_status = 'Resolved' THEN julianday(occurred_at) END)
+            FROM complaint_events GROUP BY complaint_id
+        ''')
+        cursor.execute('''
+            INSERT INTO stage_totals (department, complaints,
+                submitted_to_in_progress_hours, submitted_to_in_progress,
+                in_progress_to_resolved_hours, in_progress_to_resolved,
+                submitted_to_resolved_hours, submitted_to_resolved, resolved)
+            SELECT department, COUNT(*),
+                   IFNULL(SUM((in_progress - submitted) * 24), 0), COUNT(in_progress - submitted),
+                   IFNULL(SUM((resolved - in_progress) * 24), 0), COUNT(resolved - in_progress),
+                   IFNULL(SUM((resolved - submitted) * 24), 0), COUNT(resolved - submitted),
+                   COUNT(resolved)
+            FROM complaint_stages WHERE department IS NOT NULL GROUP BY department
+        ''')
+    print("⏱️ Stage durations rebuilt from complaint history")
+
+
+def backfill_events(conn, table):
+    """
+    Synthesize history for complaints of `table` that have none yet
+    One creation event at the complaint timestamp, plus one transition to
+    the current status when it moved past Submitted (at resolved_at, or at
+    the creation time when the real time is unknown). Idempotent.
+    """
+    conn.create_function('event_department', 1, event_department, deterministic=True)
+    missing = f'''
+        FROM {table} c
+        WHERE NOT EXISTS (SELECT 1 FROM complaint_events e WHERE e.complaint_id = c.id)
+    '''
+    with write_transaction(conn) as cursor:
+        cursor.execute(f'''
+            CREATE TEMP TABLE backfill_ids AS SELECT c.id {missing}
+        ''')
+        cursor.execute(f'''
+            INSERT INTO complaint_events (complaint_id, department, old_status, new_status, occurred_at)
+            SELECT id, event_department(category), NULL, 'Submitted', timestamp
+            FROM {table} WHERE id IN (SELECT id FROM temp.backfill_ids)
+        ''')
+        cursor.execute(f'''
+            INSERT INTO complaint_events (complaint_id, department, old_status, new_status, occurred_at)
+            SELECT id, event_department(category), 'Submitted', status, IFNULL(resolved_at, timestamp)
+            FROM {table} WHERE id IN (SELECT id FROM temp.backfill_ids) AND status != 'Submitted'
+        ''')
+        cursor.execute('DROP TABLE temp.backfill_ids')
+
+
+# ==================== QUERIES ====================
+
+def complaint_history(complaint_id):
+    """Status transitions of one complaint, oldest first"""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT old_status, new_status, occurred_at
+        FROM complaint_events WHERE complaint_id = ? ORDER BY id
+    ''', (complaint_id,)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def stage_durations(department=None):
+    """
+    Average hours spent in each stage, per department
+    Submitted -> In Progress, In Progress -> Resolved and Submitted ->
+    Resolved, using the first time each complaint entered each status.
+    """
+    where, params = '1', []
+    if department:
+        where, params = 'department = ?', [department]
+
+    conn = get_read_connection()
+    rows = conn.execute(f'''
+        SELECT department,
+               ROUND(submitted_to_in_progress_hours / NULLIF(submitted_to_in_progress, 0), 2)
+                   AS submitted_to_in_progress_hours,
+               ROUND(in_progress_to_resolved_hours / NULLIF(in_progress_to_resolved, 0), 2)
+                   AS in_progress_to_resolved_hours,
+               ROUND(submitted_to_resolved_hours / NULLIF(submitted_to_resolved, 0), 2)
+                   AS submitted_to_resolved_hours,
+               resolved
+        FROM stage_totals WHERE complaints > 0 AND {where}
+        ORDER BY department
+    ''', params).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+if __name__ == '__main__':
+    import sys
+
+    if sys.argv[1:2] != ['rebuild']:
+        sys.exit('usage: python events.py rebuild')
+    rebuild_counters()
+    rebuild_stages()
@@ -0,0 +1,57 @@
+"""
+Streaming complaint export (CSV / NDJSON, optionally gzipped)
+
+Rows arrive in chunks from helpers.iter_complaints and each chunk is
+encoded and yielded straight away, so memory stays flat and the first
+bytes go out before the query has finished.
+"""
+
+import csv
+import io
+import json
+import zlib
+from partitions import COMPLAINT_COLUMNS
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def csv_chunks(chunks, columns=COMPLAINT_COLUMNS):
+    """Encode row chunks as CSV; the header is sent before any query result"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode('utf-8')
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(tuple(row[column] for column in columns) for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def ndjson_chunks(chunks, columns=COMPLAINT_COLUMNS):
+    """Encode row chunks as newline-delimited JSON"""
+    for rows in chunks:
+        yield ''.join(
+            json.dumps({column: row[column] for column in columns}, default=str) + '\n'
+            for row in rows
+        ).encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip a byte stream on the fly"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(chunks, fmt, gzip=False, columns=None):
+    """Byte generator for an export in the given format"""
+    encoder = csv_chunks if fmt == 'csv' else ndjson_chunks
+    stream = encoder(chunks, columns or COMPLAINT_COLUMNS)
+    return gzip_chunks(stream) if gzip else stream
@@ -0,0 +1,25 @@
+"""
+Gunicorn settings for production (Linux)
+
+    SECRET_KEY=... gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 4))
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+
+# Load the app (and its models) once in the master, then fork
+preload_app = True
+
+
+def post_fork(server, worker):
+    """Per-worker setup: nothing opened in the master is reused here"""
+    from api import init_worker
+    from wsgi import app
+    init_worker(app)
+    server.log.info(f"Worker {worker.pid} initialised")
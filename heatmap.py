@@ -0,0 +1,160 @@
+"""
+Pre-aggregated heatmap tiles of open complaints
+
+Open complaints (anything not Resolved) with a "lat, lng" location are
+counted in heatmap_cells: one row per zoom level, map tile, category and
+cell, where every tile (standard web-mercator z/x/y) is split into a
+TILE_CELLS x TILE_CELLS grid. save_complaint, update_complaint_status and
+classify_pending adjust the counts in their own transactions, so a tile is
+a single primary-key range read no matter how many complaints exist.
+
+    python heatmap.py rebuild    # recompute the grid, one month per transaction
+"""
+
+import math
+import re
+from collections import Counter
+from partitions import rebuild_by_partition, rebuild_pending
+from replica import get_read_connection
+
+TILE_CELLS = 32
+_CELL_BITS = 5  # log2(TILE_CELLS)
+MIN_ZOOM = 8
+MAX_ZOOM = 16
+
+HEATMAP_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS heatmap_cells (
+        zoom INTEGER NOT NULL,
+        tile_x INTEGER NOT NULL,
+        tile_y INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        cell INTEGER NOT NULL,
+        open_count INTEGER NOT NULL,
+        PRIMARY KEY (zoom, tile_x, tile_y, category, cell)
+    ) WITHOUT ROWID
+    ''',
+]
+
+# partition_rebuilds target of rebuild_heatmap
+REBUILD_TARGET = 'heatmap'
+
+_LOCATION_RE = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$')
+_MAX_LATITUDE = 85.05112878
+
+
+def parse_location(location):
+    """(lat, lng) from a "lat, lng" location string, or None"""
+    match = _LOCATION_RE.match(location or '')
+    if not match:
+        return None
+    lat, lng = float(match.group(1)), float(match.group(2))
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+def cells_for(lat, lng):
+    """(zoom, tile_x, tile_y, cell) of a point at every stored zoom level"""
+    lat = max(-_MAX_LATITUDE, min(_MAX_LATITUDE, lat))
+    x = (lng + 180.0) / 360.0
+    y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0
+    cells = []
+    for zoom in range(MIN_ZOOM, MAX_ZOOM + 1):
+        scale = 1 << (zoom + _CELL_BITS)
+        px = min(int(x * scale), scale - 1)
+        py = min(int(y * scale), scale - 1)
+        cell = (py & (TILE_CELLS - 1)) * TILE_CELLS + (px & (TILE_CELLS - 1))
+        cells.append((zoom, px >> _CELL_BITS, py >> _CELL_BITS, cell))
+    return cells
+
+
+def _add_cells(cursor, counts):
+    cursor.executemany('''
+        INSERT INTO heatmap_cells (zoom, tile_x, tile_y, category, cell, open_count)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (zoom, tile_x, tile_y, category, cell) DO UPDATE SET
+            open_count = open_count + excluded.open_count
+    ''', [(*key, count) for key, count in counts.items()])
+
+
+def record(cursor, table, location, category, delta):
+    """
+    Add `delta` open complaints of partition `table` at `location`
+    No-op for unparseable locations and while a rebuild has yet to reach `table`.
+    """
+    point = parse_location(location)
+    if point is None or not delta or rebuild_pending(cursor, REBUILD_TARGET, table):
+        return
+    category = category or 'Uncategorized'
+    _add_cells(cursor, {(zoom, tx, ty, category, cell): delta for zoom, tx, ty, cell in cells_for(*point)})
+
+
+def is_open(status):
+    return status is not None and status != 'Resolved'
+
+
+def _reset_heatmap(cursor):
+    cursor.execute('DELETE FROM heatmap_cells')
+
+
+def _rebuild_partition(cursor, tables):
+    counts = Counter()
+    for table in tables:
+        cursor.execute(f"SELECT location, category FROM {table} WHERE status != 'Resolved'")
+        for row in cursor.fetchall():
+            point = parse_location(row['location'])
+            if point is not None:
+                category = row['category'] or 'Uncategorized'
+                for zoom, tx, ty, cell in cells_for(*point):
+                    counts[(zoom, tx, ty, category, cell)] += 1
+    _add_cells(cursor, counts)
+
+
+def rebuild_heatmap(conn=None):
+    """
+    Recompute the grid from the hot partitions (archived complaints are
+    all resolved), one month per write transaction
+    """
+    rebuild_by_partition(conn, REBUILD_TARGET, _reset_heatmap, _rebuild_partition, include_archive=False)
+    print("🗺️ Heatmap grid rebuilt")
+
+
+def get_tile(zoom, x, y, category=None):
+    """
+    Open-complaint counts of one tile as sparse [cell, count] pairs per
+    category; cell = row * TILE_CELLS + column
+    """
+    if not MIN_ZOOM <= zoom <= MAX_ZOOM:
+        raise ValueError(f'zoom must be between {MIN_ZOOM} and {MAX_ZOOM}')
+    if not (0 <= x < (1 << zoom) and 0 <= y < (1 << zoom)):
+        raise ValueError('tile is outside the map')
+
+    where, params = '', [zoom, x, y]
+    if category:
+        where, params = 'AND category = ?', params + [category]
+
+    conn = get_read_connection()
+    rows = conn.execute(f'''
+        SELECT category, cell, open_count FROM heatmap_cells
+        WHERE zoom = ? AND tile_x = ? AND tile_y = ? {where} AND open_count > 0
+    ''', params).fetchall()
+    conn.close()
+
+    categories = {}
+    for row in rows:
+        categories.setdefault(row['category'], []).append([row['cell'], row['open_count']])
+    return {
+        'z': zoom, 'x': x, 'y': y,
+        'size': TILE_CELLS,
+        'total': sum(row['open_count'] for row in rows),
+        'categories': categories,
+    }
+
+
+if __name__ == '__main__':
+    import sys
+
+    if sys.argv[1:2] != ['rebuild']:
+        sys.exit('usage: python heatmap.py rebuild')
+    rebuild_heatmap()
@@ -1,7 +1,31 @@
 import random
 import string
 from datetime import datetime
-from database import get_db_connection, get_department_by_category
+from database import get_db_connection, get_department_by_category, write_transaction, PENDING_CATEGORY
+from analytics import record_created, record_status_change
+from events import record_event
+from config import Config
+from textclassifier import load_model as load_text_model
+from writer import run_write
+from profiling import traced
+from replica import get_read_connection
+import heatmap
+import triage
+import wards
+from partitions import (
+    ARCHIVE_SCHEMA,
+    drop_archived_copies,
+    ensure_partition,
+    locate_complaint,
+    partition_for_id,
+    partition_name,
+    range_filter,
+    restore_from_archive,
+    route,
+    union_params,
+    union_sql,
+    unshadowed
+)
 import os
 import re
 
@@ -12,7 +36,31 @@ URGENCY_KEYWORDS = {
     'low': ['minor', 'small', 'request', 'suggestion', 'maintenance']
 }
 
+# One compiled alternation per urgency level, built once per process
+_priority_matchers = None
 
+
+def get_priority_matchers():
+    """Compiled keyword matchers for detect_priority"""
+    global _priority_matchers
+    if _priority_matchers is None:
+        _priority_matchers = {
+            level: re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+            for level, keywords in URGENCY_KEYWORDS.items()
+        }
+    return _priority_matchers
+
+
+def warm_up():
+    """
+    Load models and compile matchers ahead of the first request
+    Called in the pre-fork master so workers share them copy-on-write
+    """
+    get_priority_matchers()
+    load_text_model()
+
+
+@traced
 def categorize_image(file_path):
     """
     Categorize image using AI model
@@ -38,17 +86,38 @@ def categorize_image(file_path):
         return 'Uncategorized'
 
 
+@traced
+def categorize_texts(texts):
+    """Categorize complaint descriptions with the text classifier"""
+    model = load_text_model()
+    return model.predict_batch(texts, min_confidence=Config.TEXT_CLASSIFIER_MIN_CONFIDENCE)
+
+
+@traced
+def categorize_text(text):
+    """Categorize a single complaint description"""
+    try:
+        category = categorize_texts([text])[0]
+        print(f"🤖 AI Categorized text as: {category}")
+        return category
+    except Exception as e:
+        print(f"Error categorizing text: {str(e)}")
+        return 'Uncategorized'
+
+
+@traced
 def detect_priority(text):
     """
     Detect priority level from complaint description
     Uses keyword matching and basic NLP
     """
     text_lower = text.lower()
+    matchers = get_priority_matchers()
     
-    # Count urgency keywords
-    high_count = sum(1 for keyword in URGENCY_KEYWORDS['high'] if keyword in text_lower)
-    medium_count = sum(1 for keyword in URGENCY_KEYWORDS['medium'] if keyword in text_lower)
-    low_count = sum(1 for keyword in URGENCY_KEYWORDS['low'] if keyword in text_lower)
+    # Count distinct urgency keywords
+    high_count = len(set(matchers['high'].findall(text_lower)))
+    medium_count = len(set(matchers['medium'].findall(text_lower)))
+    low_count = len(set(matchers['low'].findall(text_lower)))
     
     # Determine priority
     if high_count > 0:
@@ -59,46 +128,65 @@ def detect_priority(text):
         return 'Low'
 
 
-def generate_complaint_id():
-    """Generate a unique complaint ID"""
-    timestamp = datetime.now().strftime('%Y%m%d')
-    random_suffix = ''.join(random.choices(string.digits, k=4))
+def generate_complaint_id(when=None):
+    """Generate a unique complaint ID (the embedded date selects its partition)"""
+    timestamp = (when or datetime.now()).strftime('%Y%m%d')
+    # 36^8 suffixes a day, so busy days do not collide on the primary key
+    random_suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
     return f"CMP{timestamp}{random_suffix}"
 
 
+def _count_new_complaint(cursor, table, complaint_id, timestamp, category, status='Submitted'):
+    """Record a newly categorized complaint in its history, department and rollups"""
+    record_event(cursor, complaint_id, category, None, status, timestamp)
+    record_created(cursor, table, timestamp, category, get_department_by_category(category))
+
+
+def _insert_complaint(cursor, data):
+    partition = partition_for_id(data['id']) or partition_name(data['timestamp'])
+    ensure_partition(cursor, partition)
+    
+    cursor.execute(f'''
+        INSERT INTO {partition} 
+        (id, description, image_path, category, priority, location, status, timestamp, anonymous, ward)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        data['id'],
+        data['description'],
+        data['image_path'],
+        data['category'],
+        data['priority'],
+        data['location'],
+        data['status'],
+        data['timestamp'],
+        data['anonymous'],
+        data.get('ward')
+    ))
+    
+    if data['category'] == PENDING_CATEGORY:
+        cursor.execute('''
+            INSERT INTO pending_classification (complaint_id, queued_at) VALUES (?, ?)
+        ''', (data['id'], datetime.now()))
+        record_event(cursor, data['id'], PENDING_CATEGORY, None, data['status'], data['timestamp'])
+    else:
+        _count_new_complaint(cursor, partition, data['id'], data['timestamp'], data['category'],
+                             data['status'])
+    
+    if heatmap.is_open(data['status']):
+        heatmap.record(cursor, partition, data['location'], data['category'], 1)
+    if data['status'] == 'Submitted':
+        triage.enqueue(cursor, partition, data['id'], data['priority'], data['timestamp'],
+                       data['location'], data['category'])
+
+
+@traced
 def save_complaint(data):
-    """Save complaint to database"""
+    """Save complaint to database; returns True only once it is committed"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO complaints 
-            (id, description, image_path, category, priority, location, status, timestamp, anonymous)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            data['id'],
-            data['description'],
-            data['image_path'],
-            data['category'],
-            data['priority'],
-            data['location'],
-            data['status'],
-            data['timestamp'],
-            data['anonymous']
-        ))
-        
-        # Update department stats
-        department = get_department_by_category(data['category'])
-        cursor.execute('''
-            UPDATE departments 
-            SET total_complaints = total_complaints + 1
-            WHERE name = ?
-        ''', (department,))
-        
-        conn.commit()
-        conn.close()
-        
+        if 'ward' not in data:
+            # Resolved before taking the write lock
+            data = {**data, 'ward': wards.ward_for_location(data['location'])}
+        run_write(_insert_complaint, data)
         print(f"✅ Complaint {data['id']} saved successfully!")
         return True
         
@@ -107,14 +195,61 @@ def save_complaint(data):
         return False
 
 
-def get_complaint_by_id(complaint_id):
-    """Fetch complaint details by ID"""
+@traced
+def classify_pending(batch_size=200):
+    """
+    Categorize a batch of complaints accepted in degraded mode
+    Runs in one write transaction so several workers can drain the queue
+    concurrently. Returns the number of complaints classified.
+    """
+    with write_transaction() as cursor:
+        cursor.execute(
+            'SELECT complaint_id FROM pending_classification ORDER BY queued_at LIMIT ?',
+            (batch_size,)
+        )
+        ids = [row['complaint_id'] for row in cursor.fetchall()]
+        
+        pending = []
+        for complaint_id in ids:
+            table = locate_complaint(cursor, complaint_id)
+            if table:
+                cursor.execute(f'SELECT description, priority, timestamp, status, location FROM {table} WHERE id = ?',
+                               (complaint_id,))
+                pending.append((complaint_id, table, cursor.fetchone()))
+        
+        categories = categorize_texts([row['description'] for _, _, row in pending])
+        for (complaint_id, table, row), category in zip(pending, categories):
+            cursor.execute(f'UPDATE {table} SET category = ? WHERE id = ?', (category, complaint_id))
+            _count_new_complaint(cursor, table, complaint_id, datetime.fromisoformat(row['timestamp']),
+                                 category, row['status'])
+            if heatmap.is_open(row['status']):
+                heatmap.record(cursor, table, row['location'], PENDING_CATEGORY, -1)
+                heatmap.record(cursor, table, row['location'], category, 1)
+            if row['status'] == 'Submitted':
+                # Re-cluster under the real category
+                triage.enqueue(cursor, table, complaint_id, row['priority'], row['timestamp'],
+                               row['location'], category)
+        
+        cursor.executemany('DELETE FROM pending_classification WHERE complaint_id = ?',
+                           [(complaint_id,) for complaint_id in ids])
+    if ids:
+        print(f"🤖 Classified {len(pending)} deferred complaints")
+    return len(ids)
+
+
+@traced
+def get_complaint_by_id(complaint_id, fields=None):
+    """Fetch complaint details by ID (optionally only the given columns)"""
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM complaints WHERE id = ?', (complaint_id,))
-        row = cursor.fetchone()
+        table = locate_complaint(cursor, complaint_id)
+        row = None
+        if table:
+            column_list = ', '.join(fields) if fields else '*'
+            cursor.execute(f'SELECT {column_list} FROM {table} WHERE id = ?', (complaint_id,))
+            row = cursor.fetchone()
         conn.close()
         
         if row:
@@ -126,16 +261,47 @@ def get_complaint_by_id(complaint_id):
         return None
 
 
-def get_all_complaints():
-    """Fetch all complaints for admin dashboard"""
+def _select_complaints(cursor, start=None, end=None, include_archive=True, fields=None):
+    """
+    Run the newest-first query over the partitions overlapping [start, end)
+    Each partition is read through its timestamp index and SQLite merges
+    them, so rows can be consumed as they are produced. `fields` limits the
+    selected columns; timestamp is always selected because it is the sort key.
+    Returns False when no partition matches.
+    """
+    tables = route(cursor, start, end, include_archive)
+    if not tables:
+        return False
+    
+    columns = list(fields) if fields else None
+    if columns and 'timestamp' not in columns:
+        columns.append('timestamp')
+    
+    where, params = range_filter(start, end)
+    cursor.execute(
+        f'{union_sql(tables, columns, where=where)} ORDER BY timestamp DESC',
+        union_params(tables, params)
+    )
+    return True
+
+
+@traced
+def get_all_complaints(start=None, end=None, include_archive=True, fields=None):
+    """
+    Fetch complaints for admin dashboard
+    Only partitions overlapping [start, end) are queried, and only the
+    requested columns are read when `fields` is given
+    """
     try:
-        conn = get_db_connection()
+        conn = get_read_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM complaints ORDER BY timestamp DESC')
-        rows = cursor.fetchall()
+        found = _select_complaints(cursor, start, end, include_archive, fields)
+        rows = cursor.fetchall() if found else []
         conn.close()
         
+        if fields:
+            return [{field: row[field] for field in fields} for row in rows]
         return [dict(row) for row in rows]
         
     except Exception as e:
@@ -143,44 +309,82 @@ def get_all_complaints():
         return []
 
 
-def update_complaint_status(complaint_id, new_status):
-    """Update complaint status"""
+def iter_complaints(start=None, end=None, include_archive=True, fields=None, chunk_size=1000):
+    """
+    Stream complaints newest first in chunks of sqlite3.Row
+    The connection stays open until the generator is exhausted or closed.
+    """
+    conn = get_read_connection()
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
-        
-        # If status is being set to resolved, record timestamp
-        if new_status == 'Resolved':
-            cursor.execute('''
-                UPDATE complaints 
-                SET status = ?, resolved_at = ?
-                WHERE id = ?
-            ''', (new_status, datetime.now(), complaint_id))
-            
-            # Update department resolved count
-            cursor.execute('''
-                SELECT category FROM complaints WHERE id = ?
-            ''', (complaint_id,))
-            result = cursor.fetchone()
-            
-            if result:
-                category = result['category']
-                department = get_department_by_category(category)
-                
-                cursor.execute('''
-                    UPDATE departments 
-                    SET complaints_resolved = complaints_resolved + 1
-                    WHERE name = ?
-                ''', (department,))
-        else:
-            cursor.execute('''
-                UPDATE complaints 
-                SET status = ?
-                WHERE id = ?
-            ''', (new_status, complaint_id))
-        
-        conn.commit()
+        if not _select_complaints(cursor, start, end, include_archive, fields):
+            return
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
         conn.close()
+
+
+def _apply_status_change(cursor, complaint_id, new_status):
+    """Returns the partition the complaint was found in, or None"""
+    found_in = table = locate_complaint(cursor, complaint_id)
+    if table is None:
+        return None
+    
+    # Archive partitions only hold resolved complaints
+    if table.startswith(f'{ARCHIVE_SCHEMA}.') and new_status != 'Resolved':
+        table = restore_from_archive(cursor, complaint_id)
+    
+    cursor.execute(f'SELECT status, category, priority, location, timestamp FROM {table} WHERE id = ?',
+                   (complaint_id,))
+    current = cursor.fetchone()
+    old_status = current['status']
+    now = datetime.now()
+    
+    # If status is being set to resolved, record timestamp
+    if new_status == 'Resolved':
+        cursor.execute(f'''
+            UPDATE {table} 
+            SET status = ?, resolved_at = ?
+            WHERE id = ?
+        ''', (new_status, now, complaint_id))
+    else:
+        cursor.execute(f'''
+            UPDATE {table} 
+            SET status = ?
+            WHERE id = ?
+        ''', (new_status, complaint_id))
+    
+    # Department counters follow from the history
+    if new_status != old_status:
+        record_event(cursor, complaint_id, current['category'], old_status, new_status, now)
+        heatmap.record(cursor, table, current['location'], current['category'],
+                       heatmap.is_open(new_status) - heatmap.is_open(old_status))
+        if new_status == 'Submitted':
+            triage.enqueue(cursor, table, complaint_id, current['priority'], current['timestamp'],
+                           current['location'], current['category'])
+        elif old_status == 'Submitted':
+            triage.dequeue(cursor, table, complaint_id)
+    record_status_change(cursor, table, complaint_id, old_status, new_status)
+    return found_in
+
+
+@traced
+def update_complaint_status(complaint_id, new_status):
+    """Update complaint status; True when updated, None if there is no such complaint, False on error"""
+    try:
+        found_in = run_write(_apply_status_change, complaint_id, new_status)
+        if found_in is None:
+            print(f"Error updating status: complaint {complaint_id} not found")
+            return None
+        
+        if found_in.startswith(f'{ARCHIVE_SCHEMA}.') and new_status != 'Resolved':
+            # Restored into the hot partition, which is now committed
+            with write_transaction() as cursor:
+                drop_archived_copies(cursor, found_in.split('.', 1)[1], complaint_id)
         
         print(f"✅ Complaint {complaint_id} status updated to {new_status}")
         return True
@@ -190,10 +394,38 @@ def update_complaint_status(complaint_id, new_status):
         return False
 
 
+@traced
+def get_complaint_stats(start=None, end=None):
+    """Count complaints per status, one aggregate per partition"""
+    stats = {'total': 0, 'submitted': 0, 'in_progress': 0, 'resolved': 0}
+    keys = {'Submitted': 'submitted', 'In Progress': 'in_progress', 'Resolved': 'resolved'}
+    try:
+        conn = get_read_connection()
+        cursor = conn.cursor()
+        
+        where, params = range_filter(start, end)
+        for table in route(cursor, start, end):
+            cursor.execute(
+                f'SELECT status, COUNT(*) AS count FROM {table} '
+                f'WHERE {where or "1"} AND {unshadowed(cursor, table)} GROUP BY status',
+                params
+            )
+            for row in cursor.fetchall():
+                stats['total'] += row['count']
+                if row['status'] in keys:
+                    stats[keys[row['status']]] += row['count']
+        conn.close()
+        
+    except Exception as e:
+        print(f"Error fetching stats: {str(e)}")
+    return stats
+
+
+@traced
 def get_leaderboard_data():
     """Get department performance data for leaderboard"""
     try:
-        conn = get_db_connection()
+        conn = get_read_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -220,6 +452,7 @@ def get_leaderboard_data():
         return []
 
 
+@traced
 def send_whatsapp_reply(to_number, message):
     """
     Send WhatsApp reply using Twilio API
@@ -0,0 +1,160 @@
+"""
+Content-addressed storage for uploaded complaint images
+
+Uploads are stored once per distinct content under
+UPLOAD_FOLDER/<h[0:2]>/<h[2:4]>/<sha256>.<ext>, so names never collide,
+identical photos are deduplicated and no directory grows past a few
+thousand entries. Because a path never changes content, it can be served
+with immutable, year-long cache headers. Resized variants are generated on
+first request and cached under UPLOAD_FOLDER/variants/w<width>/.
+
+    python images.py migrate    # move flat legacy uploads into the layout
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+
+VARIANT_WIDTHS = (160, 320, 640, 1280)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+LEGACY_MAX_AGE = 3600
+
+_CONTENT_PATH_RE = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+$')
+
+
+def content_path(digest, extension):
+    """Sharded relative path for a content hash"""
+    return f'{digest[:2]}/{digest[2:4]}/{digest}.{extension}'
+
+
+def is_content_addressed(relative_path):
+    return bool(_CONTENT_PATH_RE.match(relative_path))
+
+
+def _extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else 'bin'
+
+
+def store_upload(file, upload_folder):
+    """
+    Save an uploaded FileStorage under its content hash
+    Returns (image_path as stored on the complaint, absolute file path).
+    """
+    tmp_dir = os.path.join(upload_folder, '.tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+
+    tmp = tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False)
+    try:
+        with tmp:
+            for chunk in iter(lambda: file.stream.read(64 * 1024), b''):
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        relative = content_path(digest.hexdigest(), _extension(file.filename))
+        target = os.path.join(upload_folder, relative)
+        if not os.path.exists(target):  # else the same photo was uploaded before
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp.name, target)
+    finally:
+        if os.path.exists(tmp.name):
+            os.unlink(tmp.name)
+    return f'uploads/{relative}', target
+
+
+def variant_path(upload_folder, relative_path, width):
+    """
+    Absolute path of a resized variant, generating it on first use
+    Only content-addressed originals get variants (their names are stable).
+    Returns None when the original cannot be decoded as an image.
+    """
+    variant = os.path.join(upload_folder, 'variants', f'w{width}', relative_path)
+    if os.path.exists(variant):
+        return variant
+
+    from PIL import Image, ImageOps
+
+    source = os.path.join(upload_folder, relative_path)
+    os.makedirs(os.path.dirname(variant), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(variant))
+    try:
+        with os.fdopen(fd, 'wb') as out, Image.open(source) as original:
+            fmt = original.format or 'JPEG'
+            image = ImageOps.exif_transpose(original)
+            image.thumbnail((width, width * 4))
+            image.save(out, format=fmt)
+        # Concurrent generators race harmlessly: the last rename wins
+        os.replace(tmp, variant)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:  # OSError includes UnidentifiedImageError
+        print(f"Error resizing {relative_path}: {str(e)}")
+        return None
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return variant
+
+
+# ==================== MIGRATION ====================
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def migrate_flat_uploads(upload_folder):
+    """
+    Move legacy flat uploads into the sharded layout
+    Files are linked into place first, complaint rows are then repointed one
+    partition per transaction, and only then are the old names removed, so
+    an interrupted run can simply be repeated.
+    """
+    from database import get_db_connection
+    from partitions import route
+
+    mapping = {}
+    for name in os.listdir(upload_folder):
+        source = os.path.join(upload_folder, name)
+        # temp_ files are leftovers of /api/analyze-image, never referenced
+        if not os.path.isfile(source) or name.startswith(('.', 'temp_')):
+            continue
+        relative = content_path(_hash_file(source), _extension(name))
+        target = os.path.join(upload_folder, relative)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+        mapping[f'uploads/{name}'] = f'uploads/{relative}'
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    updated = 0
+    for table in route(cursor):
+        cursor.execute(f'SELECT id, image_path FROM {table} WHERE image_path IS NOT NULL')
+        changes = [(mapping[row['image_path']], row['id'])
+                   for row in cursor.fetchall() if row['image_path'] in mapping]
+        cursor.executemany(f'UPDATE {table} SET image_path = ? WHERE id = ?', changes)
+        conn.commit()
+        updated += len(changes)
+    conn.close()
+
+    for legacy in mapping:
+        os.unlink(os.path.join(upload_folder, legacy.split('/', 1)[1]))
+
+    print(f"🖼️ Moved {len(mapping)} uploads into the sharded layout ({updated} complaints updated)")
+    return mapping
+
+
+if __name__ == '__main__':
+    import sys
+    from config import Config
+
+    if sys.argv[1:2] != ['migrate']:
+        sys.exit('usage: python images.py migrate [upload_folder]')
+    migrate_flat_uploads(sys.argv[2] if len(sys.argv) > 2 else Config.UPLOAD_FOLDER)
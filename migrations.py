@@ -0,0 +1,308 @@
+"""
+Versioned schema migrations
+
+Each migration has a version number and runs once, in order. Applied
+versions are recorded in the schema_version table and mirrored into
+PRAGMA user_version, so startup can tell the schema is current from a
+single header read without issuing any DDL.
+
+Regular migrations run inside one transaction. Migrations registered with
+online=True manage their own transactions (see build_partition_index and
+backfill) so large tables are processed in short batches that never hold
+the write lock for long; they must be idempotent because an interrupted
+run is simply repeated.
+"""
+
+import time
+from datetime import datetime
+import database
+from database import get_db_connection, write_transaction
+from partitions import (
+    ARCHIVE_SCHEMA,
+    REBUILD_SCHEMA,
+    ensure_partition,
+    list_partitions,
+    migrate_legacy_table,
+    partition_name
+)
+
+MIGRATIONS = []
+
+# Pause between online batches so queued writers can take the lock
+BATCH_PAUSE_SECONDS = 0.01
+
+
+def migration(version, name, online=False):
+    """Register a migration function"""
+    def register(fn):
+        MIGRATIONS.append((version, name, online, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(conn):
+    """Schema version from the database header (no table access)"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def _record(conn, version, name):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    ''')
+    conn.execute(
+        'INSERT OR REPLACE INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)',
+        (version, name, datetime.now())
+    )
+    conn.execute(f'PRAGMA user_version = {int(version)}')
+
+
+def migrate(conn=None):
+    """Apply every pending migration; returns the versions applied"""
+    own_connection = conn is None
+    if own_connection:
+        conn = get_db_connection()
+    conn.isolation_level = None  # online migrations run in autocommit mode
+
+    applied = []
+    try:
+        version = current_version(conn)
+        for number, name, online, fn in MIGRATIONS:
+            if number <= version:
+                continue
+            if online:
+                fn(conn)
+            with write_transaction(conn):
+                if not online:
+                    fn(conn)
+                _record(conn, number, name)
+            applied.append(number)
+            print(f"🛠️ Applied migration {number:03d}: {name}")
+    finally:
+        if own_connection:
+            conn.close()
+    return applied
+
+
+class _FileLock:
+    """Exclusive inter-process lock on a file (fcntl, or msvcrt on Windows)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.handle = None
+
+    def __enter__(self):
+        self.handle = open(self.path, 'a+')
+        try:
+            import fcntl
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        except ImportError:
+            import msvcrt
+            self.handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self.handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.1)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            import fcntl
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+        except ImportError:
+            import msvcrt
+            self.handle.seek(0)
+            msvcrt.locking(self.handle.fileno(), msvcrt.LK_UNLCK, 1)
+        self.handle.close()
+
+
+def ensure_schema():
+    """
+    Startup hook: bring the schema up to date exactly once
+    The common case (already current) is a single PRAGMA read; otherwise
+    one process migrates under a file lock while the others wait.
+    """
+    conn = get_db_connection()
+    try:
+        if current_version(conn) >= latest_version():
+            return []
+    finally:
+        conn.close()
+
+    with _FileLock(f'{database.DATABASE_NAME}.migrate.lock'):
+        # Another process may have finished while we waited for the lock
+        return migrate()
+
+
+# ==================== ONLINE HELPERS ====================
+
+def each_partition(conn):
+    """Qualified names of every hot and archive partition"""
+    for schema in ('main', ARCHIVE_SCHEMA):
+        for name in list_partitions(conn.cursor(), schema):
+            yield schema, name
+
+
+def build_partition_index(conn, suffix, columns):
+    """
+    Create an index on every partition, one partition per transaction
+    The same (suffix, columns) pair must also be listed in
+    partitions.PARTITION_INDEXES so new partitions get it too.
+    """
+    for schema, name in each_partition(conn):
+        with write_transaction(conn) as cursor:
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_{name}_{suffix} ON {name} ({columns})')
+        time.sleep(BATCH_PAUSE_SECONDS)
+
+
+def add_partition_column(conn, column, ddl):
+    """Add a column to every partition that lacks it (metadata-only in SQLite)"""
+    for schema, name in each_partition(conn):
+        existing = [row[1] for row in conn.execute(f'PRAGMA {schema}.table_info({name})')]
+        if column not in existing:
+            conn.execute(f'ALTER TABLE {schema}.{name} ADD COLUMN {column} {ddl}')
+
+
+def backfill(conn, table, assignment, where='1', params=(), batch_size=5000):
+    """
+    UPDATE a large table in rowid-range batches, committing after each
+    `assignment` is the SET clause; rows outside `where` are left untouched.
+    """
+    row = conn.execute(f'SELECT MIN(rowid), MAX(rowid) FROM {table}').fetchone()
+    if row[0] is None:
+        return
+    low, high = row
+    while low <= high:
+        with write_transaction(conn) as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET {assignment} WHERE rowid >= ? AND rowid < ? AND ({where})',
+                (low, low + batch_size, *params)
+            )
+        low += batch_size
+        time.sleep(BATCH_PAUSE_SECONDS)
+
+
+# ==================== MIGRATIONS ====================
+
+@migration(1, 'initial schema')
+def _initial_schema(conn):
+    cursor = conn.cursor()
+
+    # Complaints live in monthly partitions; split any legacy table first
+    migrate_legacy_table(cursor)
+    ensure_partition(cursor, partition_name(datetime.now()))
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS departments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            complaints_resolved INTEGER DEFAULT 0,
+            avg_resolution_time REAL DEFAULT 0.0,
+            total_complaints INTEGER DEFAULT 0
+        )
+    ''')
+
+    for dept in database.DEPARTMENTS:
+        cursor.execute('INSERT OR IGNORE INTO departments (name) VALUES (?)', (dept,))
+
+
+@migration(2, 'analytics rollups', online=True)
+def _analytics_rollups(conn):
+    from analytics import ROLLUP_SCHEMA, rebuild_rollups
+
+    for statement in ROLLUP_SCHEMA:
+        conn.execute(statement)
+    rebuild_rollups(conn)
+
+
+@migration(3, 'sla escalation index and tables', online=True)
+def _sla_escalations(conn):
+    from sla import SLA_SCHEMA
+
+    for statement in SLA_SCHEMA:
+        conn.execute(statement)
+    build_partition_index(conn, 'status_priority_timestamp', 'status, priority, timestamp')
+
+
+@migration(4, 'deferred classification queue')
+def _pending_classification(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS pending_classification (
+            complaint_id TEXT PRIMARY KEY,
+            queued_at DATETIME NOT NULL
+        )
+    ''')
+
+
+@migration(5, 'complaint status history', online=True)
+def _complaint_events(conn):
+    from events import EVENTS_SCHEMA, backfill_events, rebuild_counters
+    from partitions import route
+
+    for statement in EVENTS_SCHEMA:
+        conn.execute(statement)
+    for table in route(conn.cursor()):
+        backfill_events(conn, table)
+        time.sleep(BATCH_PAUSE_SECONDS)
+    # Replaces the drifted in-place counters
+    rebuild_counters(conn)
+
+
+@migration(6, 'write-ahead log', online=True)
+def _write_ahead_log(conn):
+    # Readers no longer block the writer (or the replica backup the writer)
+    for schema in ('main', ARCHIVE_SCHEMA):
+        conn.execute(f'PRAGMA {schema}.journal_mode = WAL')
+
+
+@migration(7, 'heatmap grid', online=True)
+def _heatmap_grid(conn):
+    from heatmap import HEATMAP_SCHEMA, rebuild_heatmap
+
+    for statement in HEATMAP_SCHEMA:
+        conn.execute(statement)
+    rebuild_heatmap(conn)
+
+
+@migration(8, 'triage queue', online=True)
+def _triage_queue(conn):
+    from triage import TRIAGE_SCHEMA, rebuild_queue
+
+    for statement in TRIAGE_SCHEMA:
+        conn.execute(statement)
+    rebuild_queue(conn)
+
+
+@migration(9, 'complaint ward')
+def _complaint_ward(conn):
+    # Existing rows are tagged by python wards.py backfill
+    add_partition_column(conn, 'ward', 'TEXT')
+
+
+@migration(10, 'complaint stage totals', online=True)
+def _complaint_stages(conn):
+    from events import STAGES_SCHEMA, rebuild_stages
+
+    for statement in STAGES_SCHEMA:
+        conn.execute(statement)
+    rebuild_stages(conn)
+
+
+
+@migration(11, 'partition rebuild progress')
+def _partition_rebuilds(conn):
+    conn.execute(REBUILD_SCHEMA)
+
+if __name__ == '__main__':
+    applied = migrate()
+    print(f"✅ Schema at version {latest_version()} ({len(applied)} migrations applied)")
@@ -0,0 +1,367 @@
+"""
+Monthly partitioning for complaint storage
+
+Complaints are stored in one table per month (complaints_YYYYMM) in the
+main database. Resolved complaints older than Config.ARCHIVE_AFTER_DAYS are
+moved into the table for the same month in the attached archive database,
+so the hot working set only holds open and recently resolved complaints.
+
+In WAL mode a transaction spanning both database files is only atomic per
+file, so rows are moved in two steps that are each safe to repeat: copy
+and commit, then delete the source copy. While a complaint has both
+copies the hot one is current (locate_complaint checks it first).
+
+Tables derived from the complaints (rollups, heatmap, triage queue) are
+rebuilt one month per write transaction by rebuild_by_partition, so a
+rebuild never holds the write lock for more than one partition's work.
+"""
+
+import re
+import time
+from datetime import datetime, timedelta
+from config import Config
+
+PARTITION_PREFIX = 'complaints_'
+ARCHIVE_SCHEMA = 'archive'
+
+# Column order shared by every partition, used for explicit SELECT lists
+# so hot and archive tables can always be combined with UNION ALL
+COMPLAINT_COLUMNS = [
+    'id', 'description', 'image_path', 'category', 'priority',
+    'location', 'status', 'timestamp', 'anonymous', 'resolved_at', 'ward'
+]
+
+PARTITION_SCHEMA = '''
+    id TEXT PRIMARY KEY,
+    description TEXT NOT NULL,
+    image_path TEXT,
+    category TEXT,
+    priority TEXT,
+    location TEXT,
+    status TEXT DEFAULT 'Submitted',
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    anonymous BOOLEAN DEFAULT 0,
+    resolved_at DATETIME,
+    ward TEXT
+'''
+
+# Months a running rebuild has yet to reach, per derived table
+REBUILD_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS partition_rebuilds (
+        target TEXT NOT NULL,
+        partition TEXT NOT NULL,
+        PRIMARY KEY (target, partition)
+    ) WITHOUT ROWID
+'''
+
+# Pause between rebuild transactions so queued writers can take the lock
+REBUILD_PAUSE_SECONDS = 0.01
+
+# (index suffix, indexed columns) created on every partition
+PARTITION_INDEXES = [
+    ('timestamp', 'timestamp'),
+    ('status', 'status'),
+    ('status_priority_timestamp', 'status, priority, timestamp'),
+]
+
+_PARTITION_RE = re.compile(r'^complaints_(\d{6})$')
+_COMPLAINT_ID_RE = re.compile(r'^CMP-?(\d{4})(\d{2})\d{2}')
+
+
+def partition_key(when):
+    """Month key (YYYYMM) for a datetime"""
+    return when.strftime('%Y%m')
+
+
+def partition_name(when):
+    """Partition table name for a datetime"""
+    return f"{PARTITION_PREFIX}{partition_key(when)}"
+
+
+def partition_for_id(complaint_id):
+    """
+    Partition table name from the date embedded in a complaint ID
+    Returns None for IDs that do not carry a date
+    """
+    match = _COMPLAINT_ID_RE.match(complaint_id or '')
+    if not match:
+        return None
+    return f"{PARTITION_PREFIX}{match.group(1)}{match.group(2)}"
+
+
+def _month_start(key):
+    return datetime.strptime(key, '%Y%m')
+
+
+def _next_month(when):
+    return (when.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def table_exists(cursor, name, schema='main'):
+    """Check whether a table exists in the given schema"""
+    cursor.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?",
+        (name,)
+    )
+    return cursor.fetchone() is not None
+
+
+# Partitions known to exist, so the write path only issues DDL once per
+# process for each month
+_ensured_partitions = set()
+
+
+def reset_partition_cache():
+    """Forget known partitions (after switching database files)"""
+    _ensured_partitions.clear()
+
+
+def ensure_partition(cursor, name, schema='main'):
+    """Create a partition table and its indexes if missing"""
+    if (schema, name) in _ensured_partitions:
+        return
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS {schema}.{name} ({PARTITION_SCHEMA})')
+    for suffix, columns in PARTITION_INDEXES:
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {schema}.idx_{name}_{suffix} ON {name} ({columns})'
+        )
+    _ensured_partitions.add((schema, name))
+
+
+def list_partitions(cursor, schema='main'):
+    """Partition table names in a schema, newest month first"""
+    cursor.execute(
+        f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table' AND name LIKE 'complaints\\_%' ESCAPE '\\'"
+    )
+    names = [row[0] for row in cursor.fetchall() if _PARTITION_RE.match(row[0])]
+    return sorted(names, reverse=True)
+
+
+def route(cursor, start=None, end=None, include_archive=True):
+    """
+    Qualified partition tables a time range needs, newest month first
+    start/end are datetimes (end exclusive); None leaves that side open
+    """
+    schemas = ['main', ARCHIVE_SCHEMA] if include_archive else ['main']
+    tables = []
+    for schema in schemas:
+        for name in list_partitions(cursor, schema):
+            month = _month_start(_PARTITION_RE.match(name).group(1))
+            if end is not None and month >= end:
+                continue
+            if start is not None and _next_month(month) <= start:
+                continue
+            tables.append((month, schema, f'{schema}.{name}'))
+    tables.sort(key=lambda t: (t[0], t[1] == 'main'), reverse=True)
+    return [qualified for _, _, qualified in tables]
+
+
+def union_sql(tables, columns=None, where=''):
+    """
+    Build a UNION ALL over partition tables
+    The WHERE clause is repeated per partition, so its parameters must be
+    repeated len(tables) times by the caller (see union_params)
+    """
+    column_list = ', '.join(columns or COMPLAINT_COLUMNS)
+    clause = f' WHERE {where}' if where else ''
+    return ' UNION ALL '.join(
+        f'SELECT {column_list} FROM {table}{clause}' for table in tables
+    )
+
+
+def union_params(tables, params):
+    """Repeat WHERE parameters once per partition in a union_sql query"""
+    return tuple(params) * len(tables)
+
+
+def range_filter(start=None, end=None):
+    """WHERE clause and parameters for a timestamp range"""
+    clauses = []
+    params = []
+    if start is not None:
+        clauses.append('timestamp >= ?')
+        params.append(start)
+    if end is not None:
+        clauses.append('timestamp < ?')
+        params.append(end)
+    return ' AND '.join(clauses), params
+
+
+def locate_complaint(cursor, complaint_id):
+    """
+    Find the qualified partition table holding a complaint
+    Uses the date embedded in the ID; falls back to checking every
+    partition for IDs without one
+    """
+    name = partition_for_id(complaint_id)
+    if name:
+        candidates = [f'{schema}.{name}' for schema in ('main', ARCHIVE_SCHEMA)
+                      if table_exists(cursor, name, schema)]
+    else:
+        candidates = route(cursor)
+
+    for table in candidates:
+        cursor.execute(f'SELECT 1 FROM {table} WHERE id = ?', (complaint_id,))
+        if cursor.fetchone():
+            return table
+    return None
+
+
+def rebuild_by_partition(conn, target, reset, rebuild_partition, include_archive=True):
+    """
+    Rebuild a table derived from the complaints, one month per transaction
+    reset(cursor) empties it; rebuild_partition(cursor, tables) adds the
+    complaints of one month's qualified partition tables. Until a month is
+    done, writers must leave its complaints to the rebuild (rebuild_pending),
+    so nothing is lost or counted twice between transactions. Readers see a
+    partial table while the rebuild runs.
+    """
+    from database import get_db_connection, write_transaction
+
+    own_connection = conn is None
+    if own_connection:
+        conn = get_db_connection()
+    schemas = ['main', ARCHIVE_SCHEMA] if include_archive else ['main']
+    try:
+        with write_transaction(conn) as cursor:
+            cursor.execute(REBUILD_SCHEMA)
+            reset(cursor)
+            names = sorted({name for schema in schemas for name in list_partitions(cursor, schema)})
+            cursor.execute('DELETE FROM partition_rebuilds WHERE target = ?', (target,))
+            cursor.executemany('INSERT INTO partition_rebuilds (target, partition) VALUES (?, ?)',
+                               [(target, name) for name in names])
+
+        for name in names:
+            with write_transaction(conn) as cursor:
+                tables = [f'{schema}.{name}' for schema in schemas if table_exists(cursor, name, schema)]
+                rebuild_partition(cursor, tables)
+                cursor.execute('DELETE FROM partition_rebuilds WHERE target = ? AND partition = ?',
+                               (target, name))
+            time.sleep(REBUILD_PAUSE_SECONDS)
+    finally:
+        if own_connection:
+            conn.close()
+
+
+def rebuild_pending(cursor, target, table):
+    """True while a rebuild of `target` has yet to reach the partition `table`"""
+    cursor.execute('SELECT 1 FROM partition_rebuilds WHERE target = ? AND partition = ?',
+                   (target, table.rsplit('.', 1)[-1]))
+    return cursor.fetchone() is not None
+
+
+def _copy_rows(cursor, source, target, where, params):
+    column_list = ', '.join(COMPLAINT_COLUMNS)
+    cursor.execute(
+        f'INSERT OR REPLACE INTO {target} ({column_list}) SELECT {column_list} FROM {source} WHERE {where}',
+        params
+    )
+
+
+def drop_archived_copies(cursor, name, complaint_id=None):
+    """Delete archive rows of partition `name` that are also in the hot partition (the hot copy wins)"""
+    only = 'AND id = ?' if complaint_id else ''
+    cursor.execute(f'''
+        DELETE FROM {ARCHIVE_SCHEMA}.{name} WHERE id IN (SELECT id FROM main.{name}) {only}
+    ''', (complaint_id,) if complaint_id else ())
+
+
+def unshadowed(cursor, table):
+    """SQL condition on `table` leaving out archive rows whose hot copy still exists"""
+    schema, name = table.split('.', 1)
+    if schema != ARCHIVE_SCHEMA or not table_exists(cursor, name):
+        return '1'
+    return f'id NOT IN (SELECT id FROM main.{name})'
+
+
+def restore_from_archive(cursor, complaint_id):
+    """
+    Copy a complaint back into its hot partition (e.g. when reopened)
+    Only the hot database is written, so this is atomic inside the caller's
+    transaction; drop the archive copy with drop_archived_copies once it
+    has committed.
+    """
+    name = partition_for_id(complaint_id)
+    if not name or not table_exists(cursor, name, ARCHIVE_SCHEMA):
+        return None
+    ensure_partition(cursor, name)
+    _copy_rows(cursor, f'{ARCHIVE_SCHEMA}.{name}', f'main.{name}', 'id = ?', (complaint_id,))
+    return f'main.{name}'
+
+
+def archive_resolved_complaints(older_than_days=None):
+    """
+    Move resolved complaints older than the configured age into archive
+    partitions. Emptied hot partitions are kept (they are cheap) so that
+    processes caching known partitions never write to a dropped table.
+    A hot row is only deleted once an identical archive copy has committed;
+    stale archive copies (the complaint changed in between) are dropped.
+    """
+    from database import get_db_connection, write_transaction
+
+    if older_than_days is None:
+        older_than_days = Config.ARCHIVE_AFTER_DAYS
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    where = "status = 'Resolved' AND resolved_at < ?"
+    identical = ' AND '.join(f'a.{column} IS h.{column}' for column in COMPLAINT_COLUMNS)
+
+    conn = get_db_connection()
+    moved = 0
+    try:
+        for name in list_partitions(conn.cursor()):
+            with write_transaction(conn) as cursor:
+                ensure_partition(cursor, name, ARCHIVE_SCHEMA)
+                _copy_rows(cursor, f'main.{name}', f'{ARCHIVE_SCHEMA}.{name}', where, (cutoff,))
+            with write_transaction(conn) as cursor:
+                cursor.execute(f'''
+                    DELETE FROM main.{name} AS h WHERE {where}
+                      AND EXISTS (SELECT 1 FROM {ARCHIVE_SCHEMA}.{name} AS a WHERE {identical})
+                ''', (cutoff,))
+                moved += cursor.rowcount
+                drop_archived_copies(cursor, name)
+    finally:
+        conn.close()
+
+    print(f"📦 Archived {moved} resolved complaints older than {older_than_days} days")
+    return moved
+
+
+def migrate_legacy_table(cursor):
+    """Split a pre-partitioning `complaints` table into monthly partitions"""
+    if not table_exists(cursor, 'complaints'):
+        return 0
+
+    # Same rule as save_complaint: month from the ID, else from the timestamp
+    month_expr = """
+        CASE WHEN id GLOB 'CMP[0-9][0-9][0-9][0-9][0-9][0-9]*' THEN substr(id, 4, 6)
+             ELSE replace(substr(timestamp, 1, 7), '-', '') END
+    """
+    cursor.execute(f'SELECT DISTINCT {month_expr} FROM complaints')
+    months = [row[0] for row in cursor.fetchall()]
+    # The legacy table predates later columns (e.g. ward); copy the shared ones
+    cursor.execute('PRAGMA main.table_info(complaints)')
+    legacy_columns = {row[1] for row in cursor.fetchall()}
+    column_list = ', '.join(column for column in COMPLAINT_COLUMNS if column in legacy_columns)
+    fallback = partition_key(datetime.now())
+
+    for month in months:
+        key = month if month and re.match(r'^\d{6}$', month) else fallback
+        ensure_partition(cursor, f'{PARTITION_PREFIX}{key}')
+        cursor.execute(
+            f'INSERT OR IGNORE INTO {PARTITION_PREFIX}{key} ({column_list}) '
+            f'SELECT {column_list} FROM complaints WHERE {month_expr} IS ?',
+            (month,)
+        )
+
+    cursor.execute('SELECT COUNT(*) FROM complaints')
+    count = cursor.fetchone()[0]
+    cursor.execute('DROP TABLE complaints')
+    print(f"🔀 Migrated {count} complaints into {len(months)} monthly partitions")
+    return count
+
+
+if __name__ == '__main__':
+    import sys
+
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    archive_resolved_complaints(days)
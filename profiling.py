@@ -0,0 +1,290 @@
+"""
+Opt-in request profiling and slow-request capture for the Flask apps
+
+Controlled at runtime by a small JSON file (PROFILING_CONTROL_FILE,
+default profiling.json next to this module), re-read at most once a
+second, so it can be switched on and off without a restart:
+
+    python profiling.py on --sample-every 100 --slow-ms 500
+    python profiling.py off
+
+When enabled:
+- 1 in `sample_every` requests, and every request slower than `slow_ms`,
+  is profiled by a statistical sampler (one thread reading the stacks of
+  in-flight requests every `interval_ms`). Each profile is written to
+  <output_dir>/profiles/ in collapsed-stack format and appended to
+  <output_dir>/aggregate.folded, which flamegraph.pl and speedscope read.
+- Requests slower than `slow_ms` are logged to <output_dir>/slow-requests.jsonl
+  with their route, the timing of each @traced helper call and the SQL
+  statements they issued.
+
+When disabled (no control file, or "enabled": false) a request costs one
+cached settings lookup and each @traced call one thread-local read.
+"""
+
+import collections
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+CONTROL_FILE = os.environ.get('PROFILING_CONTROL_FILE', os.path.join(_HERE, 'profiling.json'))
+
+DEFAULTS = {
+    'enabled': False,
+    'sample_every': 0,     # profile 1 in N requests (0: off)
+    'slow_ms': 0,          # log and profile requests slower than this (0: off)
+    'interval_ms': 5,      # sampler period
+    'sql': True,           # record SQL statements of slow requests
+    'output_dir': os.path.join(_HERE, 'profiles'),
+}
+
+# Bounds on what one request may accumulate
+MAX_CALLS = 500
+MAX_STATEMENTS = 500
+
+_settings = dict(DEFAULTS)
+_settings_checked = 0.0
+_settings_mtime = None
+_local = threading.local()
+_active = {}  # thread id -> trace of requests being sampled
+_sampler = None
+_sampler_lock = threading.Lock()
+_write_lock = threading.Lock()
+_request_counter = itertools.count(1)
+_profile_counter = itertools.count(1)
+
+
+def settings():
+    """Current settings, re-reading the control file at most once a second"""
+    global _settings, _settings_checked, _settings_mtime
+    now = time.monotonic()
+    if now - _settings_checked < 1.0:
+        return _settings
+    _settings_checked = now
+    try:
+        mtime = os.stat(CONTROL_FILE).st_mtime
+    except OSError:
+        mtime = None
+    if mtime != _settings_mtime:
+        _settings_mtime = mtime
+        loaded = dict(DEFAULTS)
+        if mtime is not None:
+            try:
+                with open(CONTROL_FILE) as f:
+                    loaded.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Error reading {CONTROL_FILE}: {str(e)}")
+        _settings = loaded
+    return _settings
+
+
+class _Trace:
+    __slots__ = ('started', 'calls', 'sql', 'stacks', 'sampled')
+
+    def __init__(self, sampled, record_sql, profile):
+        self.started = time.perf_counter()
+        self.calls = []
+        self.sql = [] if record_sql else None
+        self.stacks = collections.Counter() if profile else None
+        self.sampled = sampled
+
+
+# ==================== INSTRUMENTATION ====================
+
+def traced(fn):
+    """Time calls of fn while the current request is being traced"""
+    name = f'{fn.__module__}.{fn.__qualname__}'
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        trace = getattr(_local, 'trace', None)
+        if trace is None:
+            return fn(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if len(trace.calls) < MAX_CALLS:
+                trace.calls.append((name, started - trace.started, time.perf_counter() - started))
+    return wrapper
+
+
+def trace_sql(conn):
+    """Record the statements `conn` runs if the current request is traced"""
+    trace = getattr(_local, 'trace', None)
+    if trace is None or trace.sql is None:
+        return
+
+    def record(statement):
+        if len(trace.sql) < MAX_STATEMENTS:
+            trace.sql.append((time.perf_counter() - trace.started, statement))
+    conn.set_trace_callback(record)
+
+
+# ==================== SAMPLER ====================
+
+def _stack(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def _sample_loop():
+    global _sampler
+    while True:
+        current = settings()
+        if not current['enabled']:
+            with _sampler_lock:
+                _sampler = None
+            return
+        time.sleep(max(current['interval_ms'], 1) / 1000)
+        frames = sys._current_frames()
+        for thread_id, trace in list(_active.items()):
+            frame = frames.get(thread_id)
+            if frame is not None:
+                trace.stacks[_stack(frame)] += 1
+
+
+def _ensure_sampler():
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name='profiling-sampler', daemon=True)
+            _sampler.start()
+
+
+# ==================== OUTPUT ====================
+
+def _write_profile(output_dir, app_name, label, stacks):
+    profiles = os.path.join(output_dir, 'profiles')
+    os.makedirs(profiles, exist_ok=True)
+    path = os.path.join(profiles, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{label}.folded")
+    lines = ''.join(f'{app_name};{stack} {count}\n' for stack, count in stacks.most_common())
+    with open(path, 'w') as f:
+        f.write(lines)
+    with _write_lock, open(os.path.join(output_dir, 'aggregate.folded'), 'a') as f:
+        f.write(lines)
+    return path
+
+
+def _finish(trace, current, app_name, method, path, endpoint, status):
+    duration = time.perf_counter() - trace.started
+    slow = current['slow_ms'] and duration * 1000 >= current['slow_ms']
+    if not (slow or trace.sampled):
+        return
+
+    output_dir = current['output_dir']
+    number = next(_profile_counter)
+    profile = None
+    if trace.stacks:
+        profile = _write_profile(output_dir, app_name, f'{number}', trace.stacks)
+    if not slow:
+        return
+
+    entry = {
+        'at': datetime.now().isoformat(),
+        'app': app_name,
+        'pid': os.getpid(),
+        'method': method,
+        'path': path,
+        'endpoint': endpoint,
+        'status': status,
+        'duration_ms': round(duration * 1000, 3),
+        'calls': [{'name': name, 'start_ms': round(start * 1000, 3), 'ms': round(elapsed * 1000, 3)}
+                  for name, start, elapsed in trace.calls],
+        'sql': [{'at_ms': round(at * 1000, 3), 'statement': statement}
+                for at, statement in (trace.sql or [])],
+        'profile': profile,
+    }
+    with _write_lock, open(os.path.join(output_dir, 'slow-requests.jsonl'), 'a') as f:
+        f.write(json.dumps(entry, default=str) + '\n')
+
+
+# ==================== FLASK ====================
+
+def init_app(app):
+    """Install the request hooks; they do nothing until enabled"""
+    from flask import g, request
+
+    app_name = app.import_name
+
+    @app.before_request
+    def _start_trace():
+        current = settings()
+        if not current['enabled']:
+            return None
+        sampled = bool(current['sample_every']) and next(_request_counter) % current['sample_every'] == 0
+        if not (sampled or current['slow_ms']):
+            return None
+        trace = _Trace(sampled, current['sql'] and bool(current['slow_ms']), current['interval_ms'] > 0)
+        _local.trace = trace
+        if trace.stacks is not None:
+            _active[threading.get_ident()] = trace
+            _ensure_sampler()
+        return None
+
+    @app.after_request
+    def _note_status(response):
+        if getattr(_local, 'trace', None) is not None:
+            g.profiling_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _end_trace(exc):
+        trace = getattr(_local, 'trace', None)
+        if trace is None:
+            return
+        _local.trace = None
+        _active.pop(threading.get_ident(), None)
+        try:
+            os.makedirs(settings()['output_dir'], exist_ok=True)
+            _finish(trace, settings(), app_name, request.method, request.path,
+                    request.endpoint, g.get('profiling_status', 500))
+        except Exception as e:
+            print(f"Error writing request profile: {str(e)}")
+
+
+# ==================== CONTROL ====================
+
+def write_control(**values):
+    """Update the control file; running processes pick it up within a second"""
+    current = {}
+    if os.path.exists(CONTROL_FILE):
+        with open(CONTROL_FILE) as f:
+            current = json.load(f)
+    current.update({key: value for key, value in values.items() if value is not None})
+    tmp = f'{CONTROL_FILE}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(current, f, indent=2)
+    os.replace(tmp, CONTROL_FILE)
+    return current
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Switch request profiling on or off at runtime')
+    parser.add_argument('state', choices=['on', 'off', 'status'])
+    parser.add_argument('--sample-every', type=int, help='profile 1 in N requests (0: off)')
+    parser.add_argument('--slow-ms', type=float, help='log requests slower than this (0: off)')
+    parser.add_argument('--interval-ms', type=float, help='sampler period (0: no profiles)')
+    parser.add_argument('--no-sql', dest='sql', action='store_false', default=None)
+    parser.add_argument('--output-dir')
+    args = parser.parse_args()
+
+    if args.state == 'status':
+        print(json.dumps(settings(), indent=2))
+    else:
+        values = write_control(enabled=args.state == 'on', sample_every=args.sample_every,
+                               slow_ms=args.slow_ms, interval_ms=args.interval_ms,
+                               sql=args.sql, output_dir=args.output_dir)
+        print(f"✅ Profiling {args.state}: {json.dumps(values)}")
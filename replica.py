@@ -0,0 +1,235 @@
+"""
+Snapshot read replica for heavy admin reads
+
+SQLite has a single writer, and long dashboard scans on the live files
+compete with complaint intake. With READ_REPLICA_ENABLED, a background
+thread copies the primary and archive databases with the sqlite3 backup
+API every READ_REPLICA_REFRESH_SECONDS into <database>.replica files. Both
+copies come from one read transaction, so they form a consistent
+snapshot, and each is swapped in with an atomic rename. Endpoints listed
+in READ_REPLICA_ENDPOINTS then read from the replica (opened read-only and
+immutable, so it takes no locks) and report its freshness in the
+X-Data-Source, X-Data-Snapshot and X-Data-Age response headers.
+
+A replica older than READ_REPLICA_MAX_AGE_SECONDS is never used; those
+reads fall back to the primary.
+
+    python replica.py    # refresh the replica once
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+import database
+import profiling
+from config import Config
+
+SUFFIX = '.replica'
+
+_local = threading.local()
+_settings = {'max_age': Config.READ_REPLICA_MAX_AGE_SECONDS}
+
+
+def replica_path(source):
+    return source + SUFFIX
+
+
+def _signature(path):
+    """Changes whenever the database or its WAL is written"""
+    result = []
+    for name in (path, f'{path}-wal'):
+        try:
+            stat = os.stat(name)
+            result.append(f'{stat.st_mtime_ns}:{stat.st_size}')
+        except OSError:
+            result.append('-')
+    return ','.join(result)
+
+
+def _copy(source_conn, schema, target, snapshot_at):
+    tmp = f'{target}.tmp'
+    if os.path.exists(tmp):
+        os.unlink(tmp)
+    dest = sqlite3.connect(tmp)
+    try:
+        source_conn.backup(dest, name=schema)
+        dest.execute('PRAGMA journal_mode = DELETE')  # readers open it immutable
+    finally:
+        dest.close()
+    os.utime(tmp, (snapshot_at, snapshot_at))
+    os.replace(tmp, target)
+
+
+def refresh_replica():
+    """
+    Copy the primary and archive databases into the replica files
+    Copies are skipped for files unchanged since the last refresh (their
+    replica is only re-stamped). Returns the snapshot time.
+    """
+    main_target = replica_path(database.DATABASE_NAME)
+    archive_target = replica_path(database.ARCHIVE_DATABASE_NAME)
+
+    sources = (('archive', database.ARCHIVE_DATABASE_NAME, archive_target),
+               ('main', database.DATABASE_NAME, main_target))
+    before = {schema: _signature(source) for schema, source, _ in sources}
+
+    conn = database.get_db_connection()
+    conn.isolation_level = None  # explicit BEGIN/COMMIT below
+    try:
+        # Pin one snapshot of both files for the two copies
+        conn.execute('BEGIN')
+        conn.execute('SELECT COUNT(*) FROM main.sqlite_master').fetchone()
+        conn.execute('SELECT COUNT(*) FROM archive.sqlite_master').fetchone()
+        snapshot_at = time.time()
+
+        for schema, source, target in sources:
+            # Unchanged only if nothing was written from the last copy
+            # through this snapshot
+            signature = before[schema]
+            marker = f'{target}.signature'
+            try:
+                with open(marker) as f:
+                    unchanged = (f.read() == signature == _signature(source)
+                                 and os.path.exists(target))
+            except OSError:
+                unchanged = False
+            if unchanged:
+                os.utime(target, (snapshot_at, snapshot_at))
+                continue
+            _copy(conn, schema, target, snapshot_at)
+            with open(marker, 'w') as f:
+                f.write(signature)
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+    return snapshot_at
+
+
+def _try_lock(path):
+    """Non-blocking exclusive lock so only one worker refreshes at a time"""
+    handle = open(path, 'a+')
+    try:
+        import fcntl
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except ImportError:
+        pass  # no fcntl (Windows): development runs a single process
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def refresh_if_stale(interval):
+    """Refresh unless another worker did so within `interval` seconds"""
+    target = replica_path(database.DATABASE_NAME)
+    try:
+        if time.time() - os.stat(target).st_mtime < interval:
+            return False
+    except OSError:
+        pass
+    handle = _try_lock(f'{target}.lock')
+    if handle is None:
+        return False
+    try:
+        refresh_replica()
+        return True
+    finally:
+        handle.close()
+
+
+def start_refresher(interval=None):
+    """Keep the replica fresh from a daemon thread (safe to start in every worker)"""
+    interval = interval or Config.READ_REPLICA_REFRESH_SECONDS
+    stop = threading.Event()
+
+    def loop():
+        while True:
+            try:
+                refresh_if_stale(interval)
+            except Exception as e:
+                print(f"Error refreshing read replica: {str(e)}")
+            if stop.wait(interval / 2):
+                return
+
+    threading.Thread(target=loop, name='replica-refresher', daemon=True).start()
+    return stop
+
+
+# ==================== READS ====================
+
+def _replica_snapshot():
+    """Snapshot time of a usable replica, or None"""
+    try:
+        snapshot_at = os.stat(replica_path(database.DATABASE_NAME)).st_mtime
+        os.stat(replica_path(database.ARCHIVE_DATABASE_NAME))
+    except OSError:
+        return None
+    if time.time() - snapshot_at > _settings['max_age']:
+        return None
+    return snapshot_at
+
+
+def get_read_connection():
+    """
+    Connection for heavy reads
+    The replica inside requests routed to it (when it is fresh enough),
+    the primary database otherwise.
+    """
+    if getattr(_local, 'routed', False):
+        snapshot_at = _replica_snapshot()
+        if snapshot_at is not None:
+            conn = sqlite3.connect(f'file:{replica_path(database.DATABASE_NAME)}?mode=ro&immutable=1',
+                                   uri=True)
+            conn.row_factory = sqlite3.Row
+            conn.execute('ATTACH DATABASE ? AS archive',
+                         (f'file:{replica_path(database.ARCHIVE_DATABASE_NAME)}?mode=ro&immutable=1',))
+            profiling.trace_sql(conn)
+            _local.snapshot_at = min(snapshot_at, getattr(_local, 'snapshot_at', None) or snapshot_at)
+            return conn
+        _local.primary = True
+    return database.get_db_connection()
+
+
+def init_app(app):
+    """Route the configured endpoints to the replica and add freshness headers"""
+    if not app.config['READ_REPLICA_ENABLED']:
+        return
+    from flask import request
+
+    endpoints = set(app.config['READ_REPLICA_ENDPOINTS'])
+    _settings['max_age'] = app.config['READ_REPLICA_MAX_AGE_SECONDS']
+
+    @app.before_request
+    def _route_reads():
+        _local.routed = request.endpoint in endpoints
+        _local.snapshot_at = None
+        _local.primary = False
+
+    @app.after_request
+    def _freshness_headers(response):
+        if not getattr(_local, 'routed', False):
+            return response
+        # Streamed responses open their connection later; report the
+        # replica they will read
+        snapshot_at = _local.snapshot_at
+        if snapshot_at is None and not _local.primary:
+            snapshot_at = _replica_snapshot()
+        if snapshot_at is None or _local.primary:
+            response.headers['X-Data-Source'] = 'primary'
+            response.headers['X-Data-Age'] = '0'
+        else:
+            response.headers['X-Data-Source'] = 'replica'
+            response.headers['X-Data-Snapshot'] = datetime.fromtimestamp(snapshot_at).isoformat(timespec='seconds')
+            response.headers['X-Data-Age'] = str(max(0, int(time.time() - snapshot_at)))
+        return response
+
+    @app.teardown_request
+    def _end_routing(exc):
+        _local.routed = False
+
+
+if __name__ == '__main__':
+    snapshot = refresh_replica()
+    print(f"✅ Read replica refreshed at {datetime.fromtimestamp(snapshot).isoformat(timespec='seconds')}")
@@ -0,0 +1,96 @@
+"""
+Response encoding for the API: fast JSON, compression and ETags
+
+- JSON is serialised with orjson when it is installed (stdlib otherwise)
+- GET responses carry an ETag and answer If-None-Match with 304
+- Bodies above COMPRESS_MIN_SIZE are compressed with br or gzip,
+  whichever the client accepts (br needs the optional brotli package)
+
+Streamed responses (exports) are passed through untouched.
+"""
+
+import gzip
+import hashlib
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/csv', 'application/x-ndjson', 'text/plain', 'text/html'}
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that uses orjson for dumps when available"""
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick br or gzip from an Accept-Encoding header, or None"""
+    if brotli is not None and accept_encoding['br']:
+        return 'br'
+    if accept_encoding['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(body, quality=min(level, 11))
+    return gzip.compress(body, compresslevel=level)
+
+
+def _finalize(response, app):
+    if response.direct_passthrough or response.is_streamed:
+        return response
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+
+    body = response.get_data()
+    compressible = (response.mimetype in COMPRESSIBLE_MIMETYPES
+                    and len(body) >= app.config['COMPRESS_MIN_SIZE'])
+    encoding = negotiate_encoding(request.accept_encodings) if compressible else None
+    if compressible:
+        response.vary.add('Accept-Encoding')
+
+    if request.method in ('GET', 'HEAD'):
+        # One validator per representation, so a cached gzip body is never
+        # confused with a br or identity one
+        etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        response.set_etag(f'{etag}-{encoding}' if encoding else etag)
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+
+    if encoding:
+        response.set_data(compress(body, encoding, app.config['COMPRESS_LEVEL']))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    """Install the JSON provider and the ETag/compression hook"""
+    app.json = FastJSONProvider(app)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+    app.after_request(lambda response: _finalize(response, app))
@@ -0,0 +1,171 @@
+"""
+SLA escalation for stale complaints
+
+Every open complaint has a deadline from its priority (Config.SLA_HOURS),
+optionally overridden per department (Config.SLA_DEPARTMENT_HOURS). The
+scanner finds complaints past their deadline with range reads on the
+per-partition (status, priority, timestamp) index and records each one
+once in sla_escalations, optionally notifying via send_whatsapp_reply.
+
+Scans are incremental: sla_scan_state keeps, per (priority, department),
+the complaint timestamp up to which everything has been examined, so the
+next scan starts where the last one stopped. Each scan step runs inside
+one BEGIN IMMEDIATE transaction, so several workers running the scheduler
+serialize on it and never escalate the same complaint twice.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from config import Config
+from database import DEPARTMENTS, department_category_filter, get_db_connection, write_transaction
+from replica import get_read_connection
+from partitions import route
+
+OPEN_STATUSES = ('Submitted', 'In Progress')
+
+SLA_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS sla_escalations (
+        complaint_id TEXT PRIMARY KEY,
+        priority TEXT,
+        department TEXT NOT NULL,
+        status TEXT,
+        complaint_timestamp DATETIME,
+        deadline_hours REAL NOT NULL,
+        escalated_at DATETIME NOT NULL,
+        notified INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_sla_escalations_escalated_at
+    ON sla_escalations (escalated_at)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS sla_scan_state (
+        priority TEXT NOT NULL,
+        department TEXT NOT NULL,
+        high_water DATETIME NOT NULL,
+        updated_at DATETIME NOT NULL,
+        PRIMARY KEY (priority, department)
+    )
+    ''',
+]
+
+
+def deadline_hours(priority, department):
+    """SLA for a priority, with any per-department override"""
+    overrides = Config.SLA_DEPARTMENT_HOURS.get(department, {})
+    return overrides.get(priority, Config.SLA_HOURS[priority])
+
+
+def _scan_step(conn, priority, department, now):
+    """Escalate one (priority, department) range; returns new escalations"""
+    hours = deadline_hours(priority, department)
+    cutoff = now - timedelta(hours=hours)
+    category_sql, category_params = department_category_filter(department)
+
+    with write_transaction(conn) as cursor:
+        cursor.execute(
+            'SELECT high_water FROM sla_scan_state WHERE priority = ? AND department = ?',
+            (priority, department)
+        )
+        row = cursor.fetchone()
+        high_water = datetime.fromisoformat(row['high_water']) if row else None
+        if high_water is not None and high_water >= cutoff:
+            return []
+
+        escalated = []
+        for table in route(cursor, high_water, cutoff, include_archive=False):
+            for status in OPEN_STATUSES:
+                lower = 'AND timestamp > ?' if high_water else ''
+                cursor.execute(f'''
+                    SELECT id, status, timestamp FROM {table}
+                    WHERE status = ? AND priority = ? {lower} AND timestamp <= ?
+                      AND {category_sql}
+                ''', (status, priority, *([high_water] if high_water else []), cutoff, *category_params))
+                for complaint in cursor.fetchall():
+                    inserted = conn.execute('''
+                        INSERT OR IGNORE INTO sla_escalations
+                        (complaint_id, priority, department, status, complaint_timestamp,
+                         deadline_hours, escalated_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', (complaint['id'], priority, department, complaint['status'],
+                          complaint['timestamp'], hours, now))
+                    if inserted.rowcount == 1:
+                        escalated.append(dict(complaint, department=department, hours=hours))
+
+        cursor.execute('''
+            INSERT INTO sla_scan_state (priority, department, high_water, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (priority, department) DO UPDATE SET
+                high_water = excluded.high_water, updated_at = excluded.updated_at
+        ''', (priority, department, cutoff, now))
+    return escalated
+
+
+def notify(escalations):
+    """Send escalation notices and mark them as notified"""
+    if not Config.SLA_NOTIFY_NUMBER or not escalations:
+        return
+    from helpers import send_whatsapp_reply
+
+    sent = []
+    for escalation in escalations:
+        message = (f"⚠️ SLA breached: complaint {escalation['id']} ({escalation['department']}) "
+                   f"is still '{escalation['status']}' after {escalation['hours']:g} hours")
+        if send_whatsapp_reply(Config.SLA_NOTIFY_NUMBER, message):
+            sent.append((escalation['id'],))
+
+    conn = get_db_connection()
+    conn.executemany('UPDATE sla_escalations SET notified = 1 WHERE complaint_id = ?', sent)
+    conn.commit()
+    conn.close()
+
+
+def run_scan(now=None):
+    """One pass over every priority and department; returns escalations made"""
+    now = now or datetime.now()
+    conn = get_db_connection()
+    conn.execute('PRAGMA busy_timeout = 5000')
+    escalated = []
+    try:
+        for priority in Config.SLA_HOURS:
+            for department in DEPARTMENTS:
+                escalated.extend(_scan_step(conn, priority, department, now))
+    finally:
+        conn.close()
+
+    if escalated:
+        print(f"⏰ Escalated {len(escalated)} complaints past their SLA")
+    notify(escalated)
+    return escalated
+
+
+def get_escalations(limit=100):
+    """Most recent escalations for the admin dashboard"""
+    conn = get_read_connection()
+    rows = conn.execute(
+        'SELECT * FROM sla_escalations ORDER BY escalated_at DESC LIMIT ?', (limit,)
+    ).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def start_scheduler(interval=None):
+    """Run run_scan every `interval` seconds in a daemon thread"""
+    interval = interval or Config.SLA_SCAN_INTERVAL_SECONDS
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            try:
+                run_scan()
+            except Exception as e:
+                print(f"Error running SLA scan: {str(e)}")
+
+    threading.Thread(target=loop, name='sla-scheduler', daemon=True).start()
+    return stop
+
+
+if __name__ == '__main__':
+    run_scan()
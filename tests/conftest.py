@@ -0,0 +1,14 @@
+import pytest
+
+import database
+import migrations
+
+
+@pytest.fixture
+def fresh_db(tmp_path):
+    """An empty database at the latest schema version"""
+    old = (database.DATABASE_NAME, database.ARCHIVE_DATABASE_NAME)
+    database.configure(str(tmp_path / 'complaints.db'), str(tmp_path / 'complaints_archive.db'))
+    migrations.migrate()
+    yield
+    database.configure(*old)
@@ -0,0 +1,34 @@
+"""Complaint status updates through the API"""
+
+import pytest
+
+import database
+from config import Config
+
+
+@pytest.fixture
+def client(fresh_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DATABASE_NAME', database.DATABASE_NAME)
+    monkeypatch.setattr(Config, 'ARCHIVE_DATABASE_NAME', database.ARCHIVE_DATABASE_NAME)
+    monkeypatch.setattr(Config, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    monkeypatch.setattr(Config, 'TEXT_MODEL_PATH', str(tmp_path / 'models' / 'text_classifier.npy'))
+    from api import create_app
+
+    return create_app('default').test_client()
+
+
+def test_update_status_of_unknown_complaint_is_404(client):
+    response = client.put('/api/complaints/CMP20250101NOSUCH01/status', json={'status': 'Resolved'})
+
+    assert response.status_code == 404
+    assert response.get_json()['success'] is False
+
+
+def test_update_status(client):
+    created = client.post('/api/complaints', data={'description': 'urgent pothole', 'location': 'Main road'})
+    complaint_id = created.get_json()['complaint_id']
+
+    response = client.put(f'/api/complaints/{complaint_id}/status', json={'status': 'In Progress'})
+
+    assert response.status_code == 200
+    assert client.get(f'/api/complaints/{complaint_id}').get_json()['complaint']['status'] == 'In Progress'
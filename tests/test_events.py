@@ -0,0 +1,113 @@
+"""Department counters and stage totals kept incrementally from the status history"""
+
+from datetime import datetime
+
+import database
+import events
+from helpers import save_complaint, update_complaint_status
+from partitions import route
+
+
+def _save(complaint_id, category, timestamp):
+    assert save_complaint({
+        'id': complaint_id,
+        'description': f'{category} complaint',
+        'image_path': None,
+        'category': category,
+        'priority': 'Medium',
+        'location': '12.97,77.59',
+        'status': 'Submitted',
+        'timestamp': timestamp,
+        'anonymous': False,
+        'ward': None,
+    })
+
+
+def _counters():
+    conn = database.get_db_connection()
+    try:
+        rows = conn.execute('''
+            SELECT name, total_complaints, complaints_resolved FROM departments
+            WHERE total_complaints OR complaints_resolved
+        ''').fetchall()
+        return {row['name']: (row['total_complaints'], row['complaints_resolved']) for row in rows}
+    finally:
+        conn.close()
+
+
+def _recount():
+    conn = database.get_db_connection()
+    try:
+        counts = {}
+        for table in route(conn.cursor()):
+            for row in conn.execute(f'SELECT category, status FROM {table}'):
+                department = database.get_department_by_category(row['category'])
+                total, resolved = counts.get(department, (0, 0))
+                counts[department] = (total + 1, resolved + (row['status'] == 'Resolved'))
+        return counts
+    finally:
+        conn.close()
+
+
+def _stage_durations_from_history():
+    conn = database.get_db_connection()
+    try:
+        rows = conn.execute('''
+            WITH stages AS (
+                SELECT complaint_id,
+                       MAX(department) AS department,
+                       julianday(MIN(CASE WHEN new_status = 'Submitted' THEN occurred_at END)) AS submitted,
+                       julianday(MIN(CASE WHEN new_status = 'In Progress' THEN occurred_at END)) AS in_progress,
+                       julianday(MIN(CASE WHEN new_status = 'Resolved' THEN occurred_at END)) AS resolved
+                FROM complaint_events GROUP BY complaint_id
+            )
+            SELECT department,
+                   ROUND(AVG((in_progress - submitted) * 24), 2) AS submitted_to_in_progress_hours,
+                   ROUND(AVG((resolved - in_progress) * 24), 2) AS in_progress_to_resolved_hours,
+                   ROUND(AVG((resolved - submitted) * 24), 2) AS submitted_to_resolved_hours,
+                   COUNT(resolved) AS resolved
+            FROM stages WHERE department IS NOT NULL
+            GROUP BY department ORDER BY department
+        ''').fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def _change_statuses():
+    _save('CMP20250105AAAA0001', 'Pothole', datetime(2025, 1, 5, 9))
+    _save('CMP20250106BBBB0002', 'Pothole', datetime(2025, 1, 6, 9))
+    _save('CMP20250210CCCC0003', 'Garbage', datetime(2025, 2, 10, 9))
+    _save('CMP20250211DDDD0004', 'Water', datetime(2025, 2, 11, 9))
+
+    for complaint_id, status in [
+        ('CMP20250105AAAA0001', 'In Progress'),
+        ('CMP20250105AAAA0001', 'Resolved'),
+        ('CMP20250105AAAA0001', 'Resolved'),      # repeated
+        ('CMP20250106BBBB0002', 'Resolved'),
+        ('CMP20250106BBBB0002', 'In Progress'),   # reopened
+        ('CMP20250106BBBB0002', 'Resolved'),
+        ('CMP20250210CCCC0003', 'Resolved'),
+        ('CMP20250210CCCC0003', 'Submitted'),     # reopened back to the queue
+        ('CMP20250211DDDD0004', 'In Progress'),
+    ]:
+        assert update_complaint_status(complaint_id, status)
+
+
+def test_counters_match_recount(fresh_db):
+    _change_statuses()
+
+    assert _counters() == _recount()
+    events.rebuild_counters()
+    assert _counters() == _recount()
+
+
+def test_stage_totals_match_history(fresh_db):
+    _change_statuses()
+
+    assert events.stage_durations() == _stage_durations_from_history()
+    events.rebuild_stages()
+    assert events.stage_durations() == _stage_durations_from_history()
+    assert events.stage_durations('Water Supply') == [
+        row for row in _stage_durations_from_history() if row['department'] == 'Water Supply'
+    ]
@@ -0,0 +1,66 @@
+"""Schema migrations on databases created before the migration series"""
+
+import sqlite3
+
+import pytest
+
+import database
+import migrations
+
+LEGACY_SCHEMA = '''
+    CREATE TABLE complaints (
+        id TEXT PRIMARY KEY,
+        description TEXT NOT NULL,
+        image_path TEXT,
+        category TEXT,
+        priority TEXT,
+        location TEXT,
+        status TEXT DEFAULT 'Submitted',
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        anonymous BOOLEAN DEFAULT 0,
+        resolved_at DATETIME
+    )
+'''
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    path = str(tmp_path / 'complaints.db')
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_SCHEMA)
+    conn.executemany('''
+        INSERT INTO complaints (id, description, category, priority, location, status, timestamp, resolved_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        ('CMP20250105AAAA01', 'Pothole near school', 'Pothole', 'High', '12.97,77.59',
+         'Submitted', '2025-01-05 09:00:00', None),
+        ('CMP20250210BBBB02', 'Garbage not collected', 'Garbage', 'Low', 'Market road',
+         'Resolved', '2025-02-10 10:00:00', '2025-02-12 10:00:00'),
+    ])
+    conn.commit()
+    conn.close()
+
+    old = (database.DATABASE_NAME, database.ARCHIVE_DATABASE_NAME)
+    database.configure(path, str(tmp_path / 'complaints_archive.db'))
+    yield path
+    database.configure(*old)
+
+
+def test_legacy_database_migrates_to_latest(legacy_db):
+    applied = migrations.migrate()
+
+    assert applied == list(range(1, migrations.latest_version() + 1))
+    assert migrations.latest_version() >= 9
+
+    conn = database.get_db_connection()
+    try:
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'complaints'").fetchone() is None
+        for name in ('complaints_202501', 'complaints_202502'):
+            columns = [row[1] for row in conn.execute(f'PRAGMA table_info({name})')]
+            assert 'ward' in columns
+        row = conn.execute('SELECT category, ward FROM complaints_202501').fetchone()
+        assert row['category'] == 'Pothole'
+        assert row['ward'] is None
+        assert conn.execute('SELECT resolved_at FROM complaints_202502').fetchone()[0] is not None
+    finally:
+        conn.close()
@@ -0,0 +1,81 @@
+"""Moving complaints between the hot and archive databases"""
+
+from datetime import datetime
+
+import database
+import partitions
+from helpers import get_complaint_by_id, get_complaint_stats, save_complaint, update_complaint_status
+
+COMPLAINT_ID = 'CMP20250105AAAA0001'
+
+
+def _copies():
+    conn = database.get_db_connection()
+    try:
+        return [schema for schema in ('main', partitions.ARCHIVE_SCHEMA)
+                if conn.execute(f'SELECT 1 FROM {schema}.complaints_202501 WHERE id = ?',
+                                (COMPLAINT_ID,)).fetchone()]
+    finally:
+        conn.close()
+
+
+def _resolved_complaint():
+    assert save_complaint({
+        'id': COMPLAINT_ID,
+        'description': 'Pothole near school',
+        'image_path': None,
+        'category': 'Pothole',
+        'priority': 'High',
+        'location': '12.97,77.59',
+        'status': 'Submitted',
+        'timestamp': datetime(2025, 1, 5, 9),
+        'anonymous': False,
+        'ward': None,
+    })
+    assert update_complaint_status(COMPLAINT_ID, 'Resolved')
+
+
+def test_archive_then_reopen_leaves_one_copy(fresh_db):
+    _resolved_complaint()
+
+    assert partitions.archive_resolved_complaints(older_than_days=-1) == 1
+    assert _copies() == ['archive']
+
+    assert update_complaint_status(COMPLAINT_ID, 'In Progress')
+    assert _copies() == ['main']
+    assert get_complaint_by_id(COMPLAINT_ID)['status'] == 'In Progress'
+
+
+def test_interrupted_archive_is_finished_by_the_next_run(fresh_db):
+    _resolved_complaint()
+
+    # Only the copy step committed
+    conn = database.get_db_connection()
+    partitions.ensure_partition(conn.cursor(), 'complaints_202501', partitions.ARCHIVE_SCHEMA)
+    partitions._copy_rows(conn.cursor(), 'main.complaints_202501', 'archive.complaints_202501',
+                          'id = ?', (COMPLAINT_ID,))
+    conn.commit()
+    conn.close()
+
+    assert _copies() == ['main', 'archive']
+    assert get_complaint_stats()['total'] == 1
+
+    assert partitions.archive_resolved_complaints(older_than_days=-1) == 1
+    assert _copies() == ['archive']
+    assert get_complaint_stats() == {'total': 1, 'submitted': 0, 'in_progress': 0, 'resolved': 1}
+
+
+def test_stale_archive_copy_is_dropped(fresh_db):
+    _resolved_complaint()
+    partitions.archive_resolved_complaints(older_than_days=-1)
+    assert update_complaint_status(COMPLAINT_ID, 'In Progress')
+
+    # An archive copy left behind by an interrupted restore
+    conn = database.get_db_connection()
+    partitions._copy_rows(conn.cursor(), 'main.complaints_202501', 'archive.complaints_202501',
+                          'id = ?', (COMPLAINT_ID,))
+    conn.commit()
+    conn.close()
+
+    assert partitions.archive_resolved_complaints(older_than_days=-1) == 0
+    assert _copies() == ['main']
@@ -0,0 +1,50 @@
+"""Import time, time-to-ready and per-worker memory of the production server"""
+
+import os
+import socket
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import startup  # noqa: E402
+
+# Several times what a warm run measures, so only regressions trip them
+MAX_IMPORT_SECONDS = 3.0
+MAX_READY_SECONDS = 15.0
+# Private memory of a forked worker after serving requests; importing a
+# heavy module or loading the model per worker instead of in the
+# preloaded master shows up here
+MAX_WORKER_USS_KB = 32 * 1024
+
+pytestmark = pytest.mark.skipif(not os.path.exists('/proc/self/smaps_rollup'),
+                                reason='needs Linux /proc/<pid>/smaps_rollup')
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope='module')
+def measured():
+    pytest.importorskip('gunicorn')
+    return startup.run(workers=2, port=_free_port(), timeout=MAX_READY_SECONDS * 2)
+
+
+def test_import_time(measured):
+    assert measured['import_api_s'] < MAX_IMPORT_SECONDS
+    assert measured['import_wsgi_s'] < MAX_IMPORT_SECONDS
+
+
+def test_time_to_ready(measured):
+    assert measured['ready_s'] < MAX_READY_SECONDS
+
+
+def test_worker_memory_after_fork(measured):
+    assert len(measured['workers']) == 2
+    for worker in measured['workers']:
+        assert worker['uss_kb'] < MAX_WORKER_USS_KB, worker
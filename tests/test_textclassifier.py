@@ -0,0 +1,56 @@
+"""Batch scoring, the default model and the per-path model cache"""
+
+import numpy as np
+import pytest
+
+import textclassifier
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    return str(tmp_path / 'models' / 'text_classifier.npy')
+
+
+def _reference_proba(model, text):
+    """Per-text scoring the batch product must reproduce"""
+    indices, counts = textclassifier.hash_features(text)
+    if not len(indices):
+        return None
+    values = textclassifier._tfidf(counts, model.idf[indices])
+    scores = model.log_prior + model.log_likelihood[:, indices] @ values
+    scores = np.exp(scores - scores.max())
+    return scores / scores.sum()
+
+
+def test_default_model_is_trained_on_first_load(model_path):
+    model = textclassifier.load_model(model_path)
+
+    assert model.predict_batch(['urgent pothole'], min_confidence=0.5) == ['Pothole']
+    assert textclassifier.load_model(model_path) is model
+
+
+def test_cache_is_keyed_by_path(tmp_path, model_path):
+    other = str(tmp_path / 'other' / 'text_classifier.npy')
+    labels, weights = textclassifier.train([('water tanker never came', 'Water Tanker')])
+    textclassifier.save(labels, weights, other)
+
+    assert 'Water Tanker' not in textclassifier.load_model(model_path).labels
+    assert 'Water Tanker' in textclassifier.load_model(other).labels
+
+
+def test_batch_matches_per_text_scoring(model_path):
+    model = textclassifier.load_model(model_path)
+    texts = ['urgent pothole', '', 'street lamp broken near the park', '!!!',
+             'garbage everywhere and the drain is blocked', 'no water since monday']
+
+    proba, has_tokens = model._batch_proba(texts)
+    for text, row, scored in zip(texts, proba, has_tokens):
+        expected = _reference_proba(model, text)
+        assert scored == (expected is not None)
+        if expected is not None:
+            np.testing.assert_allclose(row, expected, rtol=1e-5, atol=1e-7)
+
+    expected = [_reference_proba(model, text) for text in texts]
+    assert model.predict_batch(texts) == [
+        model.labels[int(p.argmax())] if p is not None else 'Uncategorized' for p in expected
+    ]
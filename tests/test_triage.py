@@ -0,0 +1,85 @@
+"""Triage queue leases and rebuilds"""
+
+import threading
+import time
+from datetime import datetime
+
+import database
+import triage
+from helpers import save_complaint, update_complaint_status
+
+
+def _save(complaint_id, timestamp, location='12.9716,77.5946', priority='Medium'):
+    assert save_complaint({
+        'id': complaint_id,
+        'description': 'Pothole on the main road',
+        'image_path': None,
+        'category': 'Pothole',
+        'priority': priority,
+        'location': location,
+        'status': 'Submitted',
+        'timestamp': timestamp,
+        'anonymous': False,
+        'ward': None,
+    })
+
+
+def _queue():
+    conn = database.get_db_connection()
+    try:
+        rows = conn.execute('''
+            SELECT complaint_id, cluster, cluster_size, urgency_key FROM triage_queue ORDER BY complaint_id
+        ''').fetchall()
+        return [(row[0], row[1], row[2], round(row[3], 6)) for row in rows]
+    finally:
+        conn.close()
+
+
+def _seed(count):
+    ids = [f'CMP202501{day:02d}AAAA{day:04d}' for day in range(1, count + 1)]
+    for day, complaint_id in enumerate(ids, start=1):
+        _save(complaint_id, datetime(2025, 1, day, 9))
+    return ids
+
+
+def test_concurrent_claims_never_share_a_complaint(fresh_db):
+    ids = _seed(6)
+    barrier = threading.Barrier(2)
+    claimed = {}
+
+    def claim(officer):
+        barrier.wait()
+        claimed[officer] = [item['id'] for item in triage.claim(officer, limit=4)]
+
+    threads = [threading.Thread(target=claim, args=(officer,)) for officer in ('alice', 'bob')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not set(claimed['alice']) & set(claimed['bob'])
+    assert sorted(claimed['alice'] + claimed['bob']) == sorted(ids)
+    assert triage.claim('carol') == []
+
+
+def test_expired_lease_is_reclaimed(fresh_db, monkeypatch):
+    _seed(2)
+    first = [item['id'] for item in triage.claim('alice', limit=2, lease_seconds=60)]
+    assert triage.claim('bob') == []
+
+    later = time.time() + 61
+    monkeypatch.setattr(triage.time, 'time', lambda: later)
+    assert sorted(item['id'] for item in triage.claim('bob')) == sorted(first)
+    assert triage.claim('alice') == []
+
+
+def test_rebuild_matches_incremental_queue(fresh_db):
+    ids = _seed(3)
+    _save('CMP20250215BBBB0001', datetime(2025, 2, 15, 9), priority='High')
+    _save('CMP20250216BBBB0002', datetime(2025, 2, 16, 9), location='13.05,77.70')
+    update_complaint_status(ids[0], 'In Progress')
+
+    incremental = _queue()
+    assert len(incremental) == 4
+    triage.rebuild_queue()
+    assert _queue() == incremental
@@ -0,0 +1,239 @@
+"""
+Text classifier for complaint descriptions
+
+Hashed TF-IDF features with a multinomial Naive Bayes model, implemented
+with NumPy. The model is trained offline from labelled complaints
+(python textclassifier.py train) and saved as one float32 array:
+
+    rows 0..C-1, columns 0..F-1   log P(feature | class)
+    rows 0..C-1, column F         log P(class)
+    row C,       columns 0..F-1   idf weights
+
+plus a small JSON file with the class labels. At startup the array is
+memory-mapped, so workers forked from a preloaded master share its pages.
+When no model has been trained yet, one is trained from SEED_EXAMPLES
+alone and saved, so text classification works from the first start.
+"""
+
+import json
+import os
+import re
+import tempfile
+import zlib
+import numpy as np
+from config import Config
+
+N_FEATURES = 2 ** 16
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Phrases added to every training run so a model exists even before there
+# are many labelled complaints
+SEED_EXAMPLES = {
+    'Pothole': ['pothole on the road', 'big hole in the street', 'potholes causing accidents'],
+    'Road Damage': ['road surface damaged', 'broken road and cracks', 'road caved in'],
+    'Garbage': ['garbage not collected', 'trash piled up on street', 'garbage bin overflowing'],
+    'Waste': ['waste dumped in open plot', 'construction waste on footpath', 'plastic waste burning'],
+    'Streetlight': ['streetlight not working', 'street lamp broken', 'lights off at night on street'],
+    'Water': ['no water supply', 'water pipe leaking', 'dirty drinking water from tap'],
+    'Drainage': ['drain blocked', 'sewage overflowing', 'drainage water on road after rain'],
+    'Health': ['mosquito breeding', 'dead animal rotting', 'dengue cases in area'],
+}
+
+# Loaded models by path
+_models = {}
+
+
+def tokenize(text):
+    """Lowercase word unigrams and bigrams"""
+    words = _TOKEN_RE.findall((text or '').lower())
+    return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+
+def hash_features(text):
+    """Sparse term counts of a text: (feature indices, counts)"""
+    tokens = tokenize(text)
+    if not tokens:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    hashed = np.fromiter((zlib.crc32(token.encode('utf-8')) for token in tokens),
+                         dtype=np.int64, count=len(tokens)) % N_FEATURES
+    indices, counts = np.unique(hashed, return_counts=True)
+    return indices, counts.astype(np.float32)
+
+
+def _tfidf(counts, idf_values):
+    return np.log1p(counts) * idf_values
+
+
+# ==================== TRAINING ====================
+
+def train(samples, alpha=0.1):
+    """
+    Fit the model from (description, category) pairs
+    Returns (labels, weights) in the on-disk layout described above.
+    """
+    samples = list(samples)
+    for category, phrases in SEED_EXAMPLES.items():
+        samples.extend((phrase, category) for phrase in phrases)
+
+    labels = sorted({category for _, category in samples})
+    label_index = {label: i for i, label in enumerate(labels)}
+    documents = [(hash_features(text), label_index[category]) for text, category in samples]
+
+    # Document frequency -> smoothed idf
+    df = np.zeros(N_FEATURES, dtype=np.float64)
+    for (indices, _), _ in documents:
+        df[indices] += 1
+    idf = np.log((1 + len(documents)) / (1 + df)) + 1
+
+    feature_weight = np.zeros((len(labels), N_FEATURES), dtype=np.float64)
+    class_count = np.zeros(len(labels), dtype=np.float64)
+    for (indices, counts), label in documents:
+        np.add.at(feature_weight[label], indices, _tfidf(counts, idf[indices]))
+        class_count[label] += 1
+
+    feature_weight += alpha
+    log_likelihood = np.log(feature_weight / feature_weight.sum(axis=1, keepdims=True))
+    log_prior = np.log(class_count / class_count.sum())
+
+    weights = np.zeros((len(labels) + 1, N_FEATURES + 1), dtype=np.float32)
+    weights[:-1, :-1] = log_likelihood
+    weights[:-1, -1] = log_prior
+    weights[-1, :-1] = idf
+    return labels, weights
+
+
+def labelled_complaints():
+    """
+    (description, category) of stored complaints with a real category
+    Complaints with a photo are skipped while categorize_image is a mock
+    (USE_AI_CLASSIFICATION off): their category is random, not a label.
+    """
+    from helpers import iter_complaints, PENDING_CATEGORY
+
+    skip = {None, '', 'Uncategorized', 'Other', PENDING_CATEGORY}
+    for rows in iter_complaints(fields=['description', 'category', 'image_path']):
+        for row in rows:
+            if row['category'] in skip or not row['description']:
+                continue
+            if row['image_path'] and not Config.USE_AI_CLASSIFICATION:
+                continue
+            yield row['description'], row['category']
+
+
+def _replace(path, write):
+    """Write a file under a temporary name, then rename it into place"""
+    directory = os.path.dirname(path) or '.'
+    handle, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def save(labels, weights, path=None):
+    """
+    Save a model; each file is replaced atomically, the labels first, so
+    the weights only appear once the model is complete
+    """
+    path = path or Config.TEXT_MODEL_PATH
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    meta = json.dumps({'labels': labels, 'n_features': N_FEATURES}).encode('utf-8')
+    _replace(_labels_path(path), lambda f: f.write(meta))
+    _replace(path, lambda f: np.save(f, weights))
+
+
+def _labels_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+
+# ==================== PREDICTION ====================
+
+class TextClassifier:
+    """Memory-mapped model; predictions only touch the columns a text uses"""
+
+    def __init__(self, path):
+        with open(_labels_path(path)) as f:
+            meta = json.load(f)
+        if meta['n_features'] != N_FEATURES:
+            raise ValueError(f"{path} was trained with {meta['n_features']} features")
+        self.labels = meta['labels']
+        self.weights = np.load(path, mmap_mode='r')
+        self.log_likelihood = self.weights[:-1, :-1]
+        self.log_prior = np.asarray(self.weights[:-1, -1])
+        self.idf = self.weights[-1, :-1]
+
+    def _batch_proba(self, texts):
+        """
+        Posteriors of a batch as a (texts x labels) array, with a mask of
+        the texts that had any tokens (the other rows are meaningless)
+        Scores every text with one matrix product over the union of the
+        features the batch uses.
+        """
+        features = [hash_features(text) for text in texts]
+        lengths = np.fromiter((len(indices) for indices, _ in features), dtype=np.int64, count=len(features))
+        has_tokens = lengths > 0
+        if not has_tokens.any():
+            return np.zeros((len(texts), len(self.labels))), has_tokens
+
+        indices = np.concatenate([indices for indices, _ in features])
+        counts = np.concatenate([counts for _, counts in features])
+        rows = np.repeat(np.arange(len(texts)), lengths)
+        columns, positions = np.unique(indices, return_inverse=True)
+
+        tfidf = np.zeros((len(texts), len(columns)), dtype=np.float32)
+        tfidf[rows, positions] = _tfidf(counts, self.idf[indices])
+        scores = self.log_prior + tfidf @ self.log_likelihood[:, columns].T
+        scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+        return scores / scores.sum(axis=1, keepdims=True), has_tokens
+
+    def predict_proba(self, text):
+        """Posterior over labels, or None for texts without any tokens"""
+        proba, has_tokens = self._batch_proba([text])
+        return proba[0] if has_tokens[0] else None
+
+    def predict_batch(self, texts, min_confidence=0.0, default='Uncategorized'):
+        """Category per text; low-confidence or empty texts get `default`"""
+        texts = list(texts)
+        if not texts:
+            return []
+        proba, has_tokens = self._batch_proba(texts)
+        best = proba.argmax(axis=1)
+        confident = has_tokens & (proba[np.arange(len(texts)), best] >= min_confidence)
+        return [self.labels[label] if ok else default for label, ok in zip(best, confident)]
+
+
+def train_default(path=None):
+    """Train and save a model from SEED_EXAMPLES alone"""
+    path = path or Config.TEXT_MODEL_PATH
+    labels, weights = train([])
+    save(labels, weights, path)
+    print(f"🤖 Trained a default text classifier from seed phrases -> {path} "
+          f"(retrain on stored complaints with python textclassifier.py train)")
+
+
+def load_model(path=None):
+    """Load (once per process and path) the model, training a default one if there is none"""
+    path = path or Config.TEXT_MODEL_PATH
+    if path not in _models:
+        if not os.path.exists(path):
+            train_default(path)
+        _models[path] = TextClassifier(path)
+    return _models[path]
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    if sys.argv[1:2] != ['train']:
+        sys.exit('usage: python textclassifier.py train [model_path]')
+    path = sys.argv[2] if len(sys.argv) > 2 else Config.TEXT_MODEL_PATH
+
+    started = time.perf_counter()
+    samples = list(labelled_complaints())
+    labels, weights = train(samples)
+    save(labels, weights, path)
+    print(f"✅ Trained text classifier on {len(samples)} complaints "
+          f"({len(labels)} categories) in {time.perf_counter() - started:.1f}s -> {path}")
@@ -0,0 +1,201 @@
+"""
+Triage work queue for officers working the Admin dashboard
+
+Every Submitted complaint has a row in triage_queue. claim() hands out the
+most urgent unleased complaints and leases them to the calling officer for
+TRIAGE_LEASE_SECONDS, in one write transaction, so two officers never get
+the same complaint. A lease simply expires; moving the complaint out of
+Submitted (update_complaint_status) removes it from the queue.
+
+Urgency, in hours, is
+
+    priority weight + duplicate weight * (cluster size - 1) + age in hours
+
+where a cluster is the open Submitted complaints of the same category in
+the same ~75 m map cell. Age grows at the same rate for every complaint,
+so the queue stores urgency minus the current time (`urgency_key`) and
+the order never changes as time passes; claims walk an index on it
+instead of scoring and sorting every complaint.
+
+    python triage.py rebuild    # recompute the queue, one month per transaction
+"""
+
+import time
+from datetime import datetime
+from config import Config
+from database import get_db_connection, write_transaction
+from heatmap import cells_for, parse_location
+from partitions import rebuild_by_partition, rebuild_pending
+
+# Zoom level whose grid cells (~75 m) define duplicate clusters
+CLUSTER_ZOOM = 14
+
+# partition_rebuilds target of rebuild_queue
+REBUILD_TARGET = 'triage'
+
+TRIAGE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS triage_queue (
+        complaint_id TEXT PRIMARY KEY,
+        base_key REAL NOT NULL,
+        cluster TEXT,
+        cluster_size INTEGER NOT NULL DEFAULT 1,
+        urgency_key REAL NOT NULL,
+        lease_owner TEXT,
+        lease_expires REAL NOT NULL DEFAULT 0
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_triage_queue_urgency ON triage_queue (urgency_key DESC)',
+    'CREATE INDEX IF NOT EXISTS idx_triage_queue_cluster ON triage_queue (cluster)',
+    'CREATE INDEX IF NOT EXISTS idx_triage_queue_owner ON triage_queue (lease_owner)',
+]
+
+
+def _hours(when):
+    if isinstance(when, str):
+        when = datetime.fromisoformat(when)
+    return when.timestamp() / 3600
+
+
+def cluster_of(location, category):
+    """Duplicate-cluster key of a complaint, or None without coordinates"""
+    point = parse_location(location)
+    if point is None:
+        return None
+    for zoom, tile_x, tile_y, cell in cells_for(*point):
+        if zoom == CLUSTER_ZOOM:
+            return f'{category}|{tile_x}|{tile_y}|{cell}'
+
+
+def _resize_cluster(cursor, cluster, delta):
+    cursor.execute('''
+        UPDATE triage_queue
+        SET cluster_size = cluster_size + ?, urgency_key = urgency_key + ?
+        WHERE cluster = ?
+    ''', (delta, delta * Config.TRIAGE_DUPLICATE_WEIGHT_HOURS, cluster))
+
+
+def _base_key(priority, timestamp):
+    return Config.TRIAGE_PRIORITY_WEIGHT_HOURS.get(priority, 0) - _hours(timestamp)
+
+
+def enqueue(cursor, table, complaint_id, priority, timestamp, location, category):
+    """Add a Submitted complaint of partition `table` to the queue (inside the caller's transaction)"""
+    if rebuild_pending(cursor, REBUILD_TARGET, table):
+        return
+    _dequeue(cursor, complaint_id)
+    base_key = _base_key(priority, timestamp)
+    cluster = cluster_of(location, category)
+    size = 1
+    if cluster is not None:
+        _resize_cluster(cursor, cluster, 1)
+        cursor.execute('SELECT COUNT(*) FROM triage_queue WHERE cluster = ?', (cluster,))
+        size += cursor.fetchone()[0]
+    cursor.execute('''
+        INSERT INTO triage_queue (complaint_id, base_key, cluster, cluster_size, urgency_key)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (complaint_id, base_key, cluster, size,
+          base_key + (size - 1) * Config.TRIAGE_DUPLICATE_WEIGHT_HOURS))
+
+
+def dequeue(cursor, table, complaint_id):
+    """Remove a complaint of partition `table` that left Submitted (inside the caller's transaction)"""
+    if not rebuild_pending(cursor, REBUILD_TARGET, table):
+        _dequeue(cursor, complaint_id)
+
+
+def _dequeue(cursor, complaint_id):
+    cursor.execute('SELECT cluster FROM triage_queue WHERE complaint_id = ?', (complaint_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return
+    cursor.execute('DELETE FROM triage_queue WHERE complaint_id = ?', (complaint_id,))
+    if row[0] is not None:
+        _resize_cluster(cursor, row[0], -1)
+
+
+def _reset_queue(cursor):
+    cursor.execute('DELETE FROM triage_queue')
+
+
+def _rebuild_partition(cursor, tables):
+    """Queue one month's Submitted complaints, then resize the clusters they joined"""
+    rows = []
+    for table in tables:
+        cursor.execute(f"SELECT id, priority, timestamp, location, category FROM {table} WHERE status = 'Submitted'")
+        rows += [(row['id'], _base_key(row['priority'], row['timestamp']),
+                  cluster_of(row['location'], row['category'])) for row in cursor.fetchall()]
+    cursor.executemany('''
+        INSERT INTO triage_queue (complaint_id, base_key, cluster, cluster_size, urgency_key)
+        VALUES (?, ?, ?, 1, ?)
+    ''', [(complaint_id, base_key, cluster, base_key) for complaint_id, base_key, cluster in rows])
+    cursor.executemany('''
+        UPDATE triage_queue
+        SET cluster_size = (SELECT COUNT(*) FROM triage_queue WHERE cluster = ?1),
+            urgency_key = base_key + ((SELECT COUNT(*) FROM triage_queue WHERE cluster = ?1) - 1) * ?2
+        WHERE cluster = ?1
+    ''', [(cluster, Config.TRIAGE_DUPLICATE_WEIGHT_HOURS)
+          for cluster in {cluster for _, _, cluster in rows if cluster is not None}])
+
+
+def rebuild_queue(conn=None):
+    """Recompute the queue from the Submitted complaints, one month per write transaction"""
+    rebuild_by_partition(conn, REBUILD_TARGET, _reset_queue, _rebuild_partition, include_archive=False)
+    print("📋 Triage queue rebuilt")
+
+
+def claim(officer, limit=5, lease_seconds=None):
+    """
+    Lease the `limit` most urgent complaints not leased by another officer
+    The officer's own live leases are included and renewed. Returns
+    [{'id', 'urgency_hours', 'lease_expires'}] most urgent first.
+    """
+    lease_seconds = lease_seconds or Config.TRIAGE_LEASE_SECONDS
+    with write_transaction() as cursor:
+        now = time.time()
+        expires = now + lease_seconds
+        cursor.execute('''
+            SELECT complaint_id, urgency_key FROM triage_queue INDEXED BY idx_triage_queue_urgency
+            WHERE lease_expires < ? OR lease_owner = ?
+            ORDER BY urgency_key DESC LIMIT ?
+        ''', (now, officer, limit))
+        rows = cursor.fetchall()
+        cursor.executemany(
+            'UPDATE triage_queue SET lease_owner = ?, lease_expires = ? WHERE complaint_id = ?',
+            [(officer, expires, row['complaint_id']) for row in rows]
+        )
+
+    now_hours = now / 3600
+    return [{
+        'id': row['complaint_id'],
+        'urgency_hours': round(row['urgency_key'] + now_hours, 2),
+        'lease_expires': datetime.fromtimestamp(expires).isoformat(timespec='seconds'),
+    } for row in rows]
+
+
+def release(officer, complaint_ids=None):
+    """Give back an officer's leases (all of them, or just `complaint_ids`)"""
+    conn = get_db_connection()
+    try:
+        if complaint_ids is None:
+            cursor = conn.execute('''
+                UPDATE triage_queue SET lease_owner = NULL, lease_expires = 0 WHERE lease_owner = ?
+            ''', (officer,))
+        else:
+            cursor = conn.executemany('''
+                UPDATE triage_queue SET lease_owner = NULL, lease_expires = 0
+                WHERE lease_owner = ? AND complaint_id = ?
+            ''', [(officer, complaint_id) for complaint_id in complaint_ids])
+        released = cursor.rowcount
+        conn.commit()
+        return released
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    import sys
+
+    if sys.argv[1:2] != ['rebuild']:
+        sys.exit('usage: python triage.py rebuild')
+    rebuild_queue()
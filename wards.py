@@ -0,0 +1,236 @@
+"""
+Offline ward resolution from complaint coordinates
+
+Ward boundaries are read from a local GeoJSON file (WARDS_GEOJSON, a
+FeatureCollection of Polygon/MultiPolygon features named by the
+WARDS_NAME_PROPERTY property) into a uniform grid laid over their extent.
+Each grid cell lists the polygons whose bounding box touches it, and each
+polygon keeps its edges bucketed by grid row, so a lookup is one cell
+read plus an exact even-odd point-in-polygon test on a handful of edges
+of the few candidate polygons. No geocoding service is involved.
+
+save_complaint tags every complaint with its ward; existing rows are
+tagged in batches with:
+
+    python wards.py backfill [--all]    # --all re-tags already tagged rows
+    python wards.py resolve 12.9716 77.5946
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from config import Config
+from database import get_db_connection, write_transaction
+from heatmap import parse_location
+from partitions import route
+
+# Grid cells per polygon; more cells mean fewer candidates per lookup
+CELLS_PER_POLYGON = 4
+
+
+class WardIndex:
+    """Grid index over ward polygons"""
+
+    def __init__(self, features):
+        # features: [(name, [polygon, ...])], polygon = [ring, ...],
+        # ring = [(lng, lat), ...]
+        self.names = []
+        self.boxes = []
+        rings_of = []
+        for name, polygons in features:
+            for polygon in polygons:
+                rings = [ring for ring in polygon if len(ring) >= 3]
+                if not rings:
+                    continue
+                xs = [x for ring in rings for x, _ in ring]
+                ys = [y for ring in rings for _, y in ring]
+                self.names.append(name)
+                self.boxes.append((min(xs), min(ys), max(xs), max(ys)))
+                rings_of.append(rings)
+
+        self.count = len(self.names)
+        self.cells = {}
+        self.edges = []
+        if not self.count:
+            return
+
+        self.min_x = min(box[0] for box in self.boxes)
+        self.min_y = min(box[1] for box in self.boxes)
+        width = max(max(box[2] for box in self.boxes) - self.min_x, 1e-9)
+        height = max(max(box[3] for box in self.boxes) - self.min_y, 1e-9)
+        size = math.sqrt(width * height / (self.count * CELLS_PER_POLYGON))
+        self.columns = max(1, math.ceil(width / size))
+        self.rows = max(1, math.ceil(height / size))
+        self.cell_width = width / self.columns
+        self.cell_height = height / self.rows
+
+        for polygon, (box, rings) in enumerate(zip(self.boxes, rings_of)):
+            first_column, first_row = self._cell(box[0], box[1])
+            last_column, last_row = self._cell(box[2], box[3])
+            for row in range(first_row, last_row + 1):
+                for column in range(first_column, last_column + 1):
+                    self.cells.setdefault(row * self.columns + column, []).append(polygon)
+
+            # (y1, y2, x1, dx/dy) of every non-horizontal edge, by grid row
+            by_row = {}
+            for ring in rings:
+                for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+                    if y1 == y2:
+                        continue
+                    edge = (y1, y2, x1, (x2 - x1) / (y2 - y1))
+                    low = self._row(min(y1, y2))
+                    high = self._row(max(y1, y2))
+                    for row in range(low, high + 1):
+                        by_row.setdefault(row, []).append(edge)
+            self.edges.append(by_row)
+
+    def _column(self, x):
+        return min(max(int((x - self.min_x) / self.cell_width), 0), self.columns - 1)
+
+    def _row(self, y):
+        return min(max(int((y - self.min_y) / self.cell_height), 0), self.rows - 1)
+
+    def _cell(self, x, y):
+        return self._column(x), self._row(y)
+
+    def lookup(self, lat, lng):
+        """Name of the ward containing the point, or None"""
+        if not self.count:
+            return None
+        x, y = lng, lat
+        column = int((x - self.min_x) / self.cell_width)
+        row = int((y - self.min_y) / self.cell_height)
+        if column < 0 or row < 0 or column > self.columns or row > self.rows:
+            return None
+        column, row = min(column, self.columns - 1), min(row, self.rows - 1)
+
+        for polygon in self.cells.get(row * self.columns + column, ()):
+            min_x, min_y, max_x, max_y = self.boxes[polygon]
+            if not (min_x <= x <= max_x and min_y <= y <= max_y):
+                continue
+            inside = False
+            for y1, y2, x1, slope in self.edges[polygon].get(row, ()):
+                if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * slope:
+                    inside = not inside
+            if inside:
+                return self.names[polygon]
+        return None
+
+
+def read_geojson(path, name_property=None):
+    """[(ward name, polygons)] from a GeoJSON FeatureCollection"""
+    name_property = name_property or Config.WARDS_NAME_PROPERTY
+    with open(path, encoding='utf-8') as f:
+        collection = json.load(f)
+
+    features = []
+    for number, feature in enumerate(collection.get('features', [])):
+        geometry = feature.get('geometry') or {}
+        properties = feature.get('properties') or {}
+        name = properties.get(name_property) or feature.get('id') or f'ward-{number + 1}'
+        if geometry.get('type') == 'Polygon':
+            polygons = [geometry['coordinates']]
+        elif geometry.get('type') == 'MultiPolygon':
+            polygons = geometry['coordinates']
+        else:
+            continue
+        # Drop the closing vertex and any altitude
+        features.append((str(name), [
+            [[(point[0], point[1]) for point in ring[:-1] if len(point) >= 2] for ring in polygon]
+            for polygon in polygons
+        ]))
+    return features
+
+
+_index = None
+_index_mtime = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """The ward index, reloaded when the GeoJSON file changes; None without one"""
+    global _index, _index_mtime
+    try:
+        mtime = os.stat(Config.WARDS_GEOJSON).st_mtime
+    except OSError:
+        return None
+    if mtime != _index_mtime:
+        with _index_lock:
+            if mtime != _index_mtime:
+                started = time.perf_counter()
+                _index = WardIndex(read_geojson(Config.WARDS_GEOJSON))
+                _index_mtime = mtime
+                print(f"🏛️ Loaded {_index.count} ward polygons in "
+                      f"{(time.perf_counter() - started) * 1000:.0f} ms")
+    return _index
+
+
+def resolve(lat, lng):
+    """Ward containing (lat, lng), or None"""
+    index = get_index()
+    if index is None:
+        return None
+    return index.lookup(lat, lng)
+
+
+def ward_for_location(location):
+    """Ward of a "lat, lng" location string, or None"""
+    point = parse_location(location)
+    if point is None:
+        return None
+    return resolve(*point)
+
+
+def backfill_wards(retag=False, batch_size=500):
+    """
+    Tag existing complaints with their ward, one write transaction per
+    batch of rows; returns the number of complaints tagged
+    Only untagged rows are visited unless `retag` (after a boundary change).
+    """
+    index = get_index()
+    if index is None:
+        raise FileNotFoundError(f'No ward boundaries at {Config.WARDS_GEOJSON}')
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    where = 'location IS NOT NULL' if retag else 'location IS NOT NULL AND ward IS NULL'
+    tagged = 0
+    try:
+        for table in route(cursor):
+            last_rowid = -1
+            while True:
+                rows = cursor.execute(f'''
+                    SELECT rowid, id, location, ward FROM {table}
+                    WHERE rowid > ? AND {where} ORDER BY rowid LIMIT ?
+                ''', (last_rowid, batch_size)).fetchall()
+                if not rows:
+                    break
+                last_rowid = rows[-1]['rowid']
+
+                updates = []
+                for row in rows:
+                    point = parse_location(row['location'])
+                    ward = index.lookup(*point) if point else None
+                    if ward != row['ward']:
+                        updates.append((ward, row['id']))
+                if updates:
+                    with write_transaction(conn) as batch:
+                        batch.executemany(f'UPDATE {table} SET ward = ? WHERE id = ?', updates)
+                    tagged += len(updates)
+    finally:
+        conn.close()
+    print(f"🏛️ Tagged {tagged} complaints with their ward")
+    return tagged
+
+
+if __name__ == '__main__':
+    import sys
+
+    if sys.argv[1:2] == ['backfill']:
+        backfill_wards(retag='--all' in sys.argv[2:])
+    elif sys.argv[1:2] == ['resolve'] and len(sys.argv) == 4:
+        print(resolve(float(sys.argv[2]), float(sys.argv[3])) or 'No ward')
+    else:
+        sys.exit('usage: python wards.py backfill [--all] | resolve LAT LNG')
@@ -4,12 +4,22 @@ import os
 from dotenv import load_dotenv
 import logging
 import json
+import sys
+import threading
+import time
 
 # Load .env from parent directory
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 
+# Shared request profiling and ward lookup live in the parent directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import profiling
+from profiling import traced
+import wards
+
 # Initialize Flask app
 app = Flask(__name__)
+profiling.init_app(app)  # inactive until switched on (python profiling.py on)
 
 # Configure logging
 logging.basicConfig(
@@ -24,8 +34,16 @@ PHONE_NUMBER_ID = os.getenv('PHONE_NUMBER_ID')
 VERIFY_TOKEN = os.getenv('VERIFY_TOKEN')
 VERSION = os.getenv('VERSION', 'v21.0')
 
+# Graph API base URL (point it at a local stand-in for load tests)
+GRAPH_API_BASE = os.getenv('GRAPH_API_BASE', 'https://graph.facebook.com').rstrip('/')
+
 # WhatsApp API URL
-WHATSAPP_API_URL = f"https://graph.facebook.com/{VERSION}/{PHONE_NUMBER_ID}/messages"
+WHATSAPP_API_URL = f"{GRAPH_API_BASE}/{VERSION}/{PHONE_NUMBER_ID}/messages"
+
+# Opt-in: append every incoming webhook payload to this JSONL file
+# (replay it with benchmarks/whatsapp_replay.py)
+WEBHOOK_RECORD_FILE = os.getenv('WEBHOOK_RECORD_FILE')
+_record_lock = threading.Lock()
 
 
 # Headers for API requests
@@ -35,6 +53,17 @@ HEADERS = {
 }
 
 
+def record_webhook(data):
+    """Append a webhook payload and its arrival time to WEBHOOK_RECORD_FILE"""
+    line = json.dumps({"received_at": time.time(), "payload": data}, separators=(',', ':'))
+    try:
+        # One write per line in append mode, so workers never interleave
+        with _record_lock, open(WEBHOOK_RECORD_FILE, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+    except OSError as e:
+        logger.error(f"❌ Failed to record webhook: {str(e)}")
+
+
 @app.route('/')
 def home():
     return jsonify({"status": "active", "message": "Bot running!"}), 200
@@ -76,6 +105,8 @@ def webhook():
     try:
         # Get the raw data
         data = request.get_json()
+        if WEBHOOK_RECORD_FILE:
+            record_webhook(data)
         
         logger.info("="*50)
         logger.info(f"📨 INCOMING WEBHOOK DATA:")
@@ -109,6 +140,7 @@ def webhook():
 # MESSAGE PROCESSING
 # ============================================================================
 
+@traced
 def process_message(message, value):
     """Process incoming message"""
     try:
@@ -153,6 +185,7 @@ def process_message(message, value):
     except Exception as e:
         logger.error(f"Error processing message: {str(e)}")
 
+@traced
 def handle_text_message(from_number, text, message_id):
     """Handle incoming text messages with command routing"""
     text_lower = text.lower().strip()
@@ -256,6 +289,7 @@ Type *help* to see available commands or *complaint* to file a new complaint."""
         
         send_text_message(from_number, response)
 
+@traced
 def handle_image_message(from_number, image_data, message_id):
     """Handle incoming image messages"""
     image_id = image_data.get("id")
@@ -284,6 +318,7 @@ Your complaint will be registered shortly!"""
     
     send_text_message(from_number, response)
 
+@traced
 def handle_location_message(from_number, location_data, message_id):
     """Handle incoming location messages"""
     latitude = location_data.get("latitude")
@@ -293,6 +328,13 @@ def handle_location_message(from_number, location_data, message_id):
     
     logger.info(f"Location: {latitude}, {longitude}")
     
+    # Offline lookup against the local ward boundaries
+    ward = None
+    try:
+        ward = wards.resolve(float(latitude), float(longitude))
+    except (TypeError, ValueError) as e:
+        logger.error(f"❌ Could not resolve ward: {str(e)}")
+    
     # Send reaction
     send_reaction(from_number, message_id, "📍")
     
@@ -304,6 +346,7 @@ Longitude: {longitude}
 
 📌 *Location:* {name if name else 'Location captured'}
 🏠 *Address:* {address if address else 'Nearby area'}
+🏛️ *Ward:* {ward if ward else 'Not found'}
 
 *Almost done!*
 Please send a brief *text description* of the issue to complete your complaint.
@@ -325,6 +368,7 @@ def process_status_update(statuses):
 # WHATSAPP API FUNCTIONS
 # ============================================================================
 
+@traced
 def send_text_message(to, message_text):
     """Send a text message via WhatsApp Cloud API"""
     payload = {
@@ -354,6 +398,7 @@ def send_text_message(to, message_text):
             logger.error(f"Response: {e.response.text}")
         return None
 
+@traced
 def send_reaction(to, message_id, emoji):
     """React to a message with an emoji"""
     payload = {
@@ -381,6 +426,7 @@ def send_reaction(to, message_id, emoji):
         logger.error(f"❌ Failed to send reaction: {str(e)}")
         return None
 
+@traced
 def mark_as_read(message_id):
     """Mark a message as read"""
     payload = {
@@ -403,9 +449,10 @@ def mark_as_read(message_id):
         logger.error(f"❌ Failed to mark as read: {str(e)}")
         return None
 
+@traced
 def download_media(media_id):
     """Download media from WhatsApp (images, documents, etc.)"""
-    media_url = f"https://graph.facebook.com/{VERSION}/{media_id}"
+    media_url = f"{GRAPH_API_BASE}/{VERSION}/{media_id}"
     
     try:
         # Get media URL
@@ -0,0 +1,119 @@
+"""
+Group-commit writer for complaint inserts and status updates
+
+Committing each write on its own costs one fsync per complaint, which caps
+throughput at the disk's sync rate. With GROUP_COMMIT_ENABLED, request
+threads hand their write to a single writer thread instead. It runs every
+write collected within GROUP_COMMIT_MAX_DELAY_MS (or up to
+GROUP_COMMIT_MAX_BATCH writes) in one transaction, each in its own
+savepoint, so a failing write is rolled back alone. Callers block on a
+future that resolves only after the transaction has committed, so a
+complaint ID is never confirmed before it is durable.
+
+There is one writer per process (it is created lazily, so forked workers
+get their own).
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import database
+from config import Config
+from partitions import reset_partition_cache
+
+
+class GroupCommitWriter:
+    """Single thread that batches write operations into shared transactions"""
+
+    def __init__(self, max_delay=None, max_batch=None):
+        self.max_delay = (max_delay if max_delay is not None
+                          else Config.GROUP_COMMIT_MAX_DELAY_MS / 1000)
+        self.max_batch = max_batch or Config.GROUP_COMMIT_MAX_BATCH
+        self.database_name = database.DATABASE_NAME
+        self.pid = os.getpid()
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, operation, *args):
+        """
+        Queue operation(cursor, *args) for the next group transaction
+        Returns a Future with the operation's result or exception.
+        """
+        future = Future()
+        self.queue.put((operation, args, future))
+        return future
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = database.get_db_connection()
+        conn.isolation_level = None  # explicit BEGIN/COMMIT below
+        cursor = conn.cursor()
+        while True:
+            batch = self._collect()
+            outcomes = []
+            try:
+                cursor.execute('BEGIN IMMEDIATE')
+                for operation, args, _ in batch:
+                    cursor.execute('SAVEPOINT op')
+                    try:
+                        outcomes.append((True, operation(cursor, *args)))
+                    except Exception as e:
+                        cursor.execute('ROLLBACK TO op')
+                        # The rolled back write may have created a partition
+                        reset_partition_cache()
+                        outcomes.append((False, e))
+                    cursor.execute('RELEASE op')
+                cursor.execute('COMMIT')
+            except Exception as e:
+                if conn.in_transaction:
+                    cursor.execute('ROLLBACK')
+                reset_partition_cache()
+                outcomes = [(False, e)] * len(batch)
+
+            for (_, _, future), (ok, value) in zip(batch, outcomes):
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """The writer for this process and database, started on first use"""
+    global _writer
+    with _writer_lock:
+        if (_writer is None or _writer.pid != os.getpid()
+                or _writer.database_name != database.DATABASE_NAME):
+            _writer = GroupCommitWriter()
+        return _writer
+
+
+def run_write(operation, *args):
+    """
+    Run operation(cursor, *args) and commit
+    Goes through the group-commit writer when it is enabled, otherwise uses
+    a connection and transaction of its own. Exceptions propagate.
+    """
+    if Config.GROUP_COMMIT_ENABLED:
+        return get_writer().submit(operation, *args).result()
+
+    with database.write_transaction() as cursor:
+        return operation(cursor, *args)
@@ -0,0 +1,22 @@
+"""
+Production entry point for a pre-fork server
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app the master imports this module once: the app is built,
+pending schema migrations are applied and models/matchers are loaded before forking,
+so every worker shares those pages copy-on-write.
+"""
+
+import gc
+from api import create_app
+from migrations import ensure_schema
+from helpers import warm_up
+
+app = create_app('production')
+ensure_schema()
+warm_up()
+
+# Move everything loaded so far out of the GC's tracked generations so
+# collections in the workers don't touch (and un-share) those pages
+gc.freeze()